@@ -382,6 +382,10 @@ class MainWindowActions(AttrDict):
             checkable=True, shortcut='F4' if self.shortcuts else "",
             statustip='Show/hide the macro panel')
 
+        self.toggle_profiler_dock = Action(
+            self.parent, "Profiler panel", self.parent.on_toggle_profiler_dock,
+            checkable=True, statustip='Show/hide the cell evaluation profiler')
+
         self.goto_cell = Action(self.parent, "Go to cell",
                                 self.parent.workflows.view_goto_cell,
                                 icon=Icon.goto_cell,
@@ -449,6 +453,12 @@ class MainWindowActions(AttrDict):
                    statustip='Apply format from the clipboard to the selected '
                              'cells')
 
+        self.compact_format = \
+            Action(self.parent, "Compact formats",
+                   self.parent.workflows.format_compact_attributes,
+                   statustip='Rewrite cell formats into fewer layers for '
+                             'faster lookups')
+
         self.font = Action(self.parent, "&Font...",
                            self.parent.grid. on_font_dialog,
                            icon=Icon.font_dialog,
@@ -566,6 +576,12 @@ class MainWindowActions(AttrDict):
                                   checkable=True,
                                   statustip='Merge/unmerge selected cells')
 
+        self.spill_cells = Action(self.parent, "Spill cells",
+                                  self.parent.grid.on_spill_pressed,
+                                  checkable=True,
+                                  statustip='Lay out the result of the top '
+                                            'left cell over the selection')
+
         self.rotate_0 = Action(self.parent, "0°",
                                self.parent.grid.on_rotate_0,
                                icon=Icon.rotate_0,
@@ -97,5 +97,11 @@ class PyspreadArgumentParser(ArgumentParser):
                           help='start with default settings and save them on '
                                'exit')
 
+        self.add_argument('--profile', type=Path, default=None,
+                          metavar='REPORT',
+                          help='evaluate all cells of file without GUI and '
+                               'write a profile report in csv or json format')
+
         self.add_argument('file', type=Path, nargs='?', default=None,
-                          help='open pyspread file in pys or pysu format')
+                          help='open pyspread file in pys, pysu or pysb '
+                               'format')
@@ -87,14 +87,9 @@ class SetGridSize(QUndoCommand):
         model = self.grid.model
         code_array = model.code_array
 
-        rows, columns, tables = self.new_shape
-        shapeselection = Selection([(0, 0)], [(rows-1, columns-1)], [], [], [])
-
-        for row, column, table in code_array.keys():
-            if not (table < tables and (row, column) in shapeselection):
-                # Code outside grid shape. Delete it and store cell data
-                key = row, column, table
-                self.deleted_cells[key] = code_array.pop(key)
+        for key in code_array.dict_grid.keys_beyond(self.new_shape):
+            # Code outside grid shape. Delete it and store cell data
+            self.deleted_cells[key] = code_array.pop(key)
 
         # Now change the shape
         self.grid.model.shape = self.new_shape
@@ -143,9 +138,9 @@ class PasteSelectedCellData(QUndoCommand):
         code_array = self.model.code_array
         shape = self.model.shape
         table = self.grid.table
-        selection = self.selection
+        selection = self.selection.compile()
 
-        (top, left), (bottom, right) = selection.get_grid_bbox(shape)
+        (top, left), (bottom, right) = self.selection.get_grid_bbox(shape)
 
         paste_gen = (line.split("\t") for line in self.data.split("\n"))
         for row, line in enumerate(cycle(paste_gen)):
@@ -437,8 +432,9 @@ class DeleteSelectedCellData(QUndoCommand):
         """Redo cell data deletion, updates screen"""
 
         self.old_code = {}
-        for key in self.selection.cell_generator(self.model.shape,
-                                                 self.grid.table):
+        for key in self.selection.filled_cell_generator(
+                self.model.code_array.dict_grid, self.model.shape,
+                self.grid.table):
             if not self.model.code_array.cell_attributes[key]['locked']:
                 try:
                     self.old_code[key] = self.model.code_array.pop(key)
@@ -491,10 +487,10 @@ class InsertRows(QUndoCommand):
         no_rows = self.model.shape[0]
         rows = list(range(no_rows-self.count, no_rows+1))
         selection = Selection([], [], rows, [], [])
-        for key in selection.cell_generator(self.model.shape, self.grid.table):
-            old_code = self.model.code_array(key)
-            if old_code is not None:
-                self.old_code[key] = old_code
+        for key in selection.filled_cell_generator(
+                self.model.code_array.dict_grid, self.model.shape,
+                self.grid.table):
+            self.old_code[key] = self.model.code_array(key)
 
         with self.model.inserting_rows(self.index, self.first, self.last):
             self.model.insertRows(self.row, self.count)
@@ -551,7 +547,9 @@ class DeleteRows(QUndoCommand):
         self.old_code = {}
         rows = list(range(self.first, self.last+1))
         selection = Selection([], [], rows, [], [])
-        for key in selection.cell_generator(self.model.shape, self.grid.table):
+        for key in selection.filled_cell_generator(
+                self.model.code_array.dict_grid, self.model.shape,
+                self.grid.table):
             self.old_code[key] = self.model.code_array(key)
 
         with self.model.removing_rows(self.index, self.first, self.last):
@@ -612,10 +610,10 @@ class InsertColumns(QUndoCommand):
         no_columns = self.model.shape[1]
         columns = list(range(no_columns-self.count, no_columns+1))
         selection = Selection([], [], [], columns, [])
-        for key in selection.cell_generator(self.model.shape, self.grid.table):
-            old_code = self.model.code_array(key)
-            if old_code is not None:
-                self.old_code[key] = old_code
+        for key in selection.filled_cell_generator(
+                self.model.code_array.dict_grid, self.model.shape,
+                self.grid.table):
+            self.old_code[key] = self.model.code_array(key)
 
         with self.model.inserting_columns(self.index, self.first, self.last):
             self.model.insertColumns(self.column, self.count)
@@ -674,7 +672,9 @@ class DeleteColumns(QUndoCommand):
         self.old_code = {}
         columns = list(range(self.first, self.last+1))
         selection = Selection([], [], [], columns, [])
-        for key in selection.cell_generator(self.model.shape, self.grid.table):
+        for key in selection.filled_cell_generator(
+                self.model.code_array.dict_grid, self.model.shape,
+                self.grid.table):
             self.old_code[key] = self.model.code_array(key)
 
         with self.model.removing_columns(self.index, self.first, self.last):
@@ -726,9 +726,9 @@ class InsertTable(QUndoCommand):
         self.old_col_widths = copy(self.model.code_array.col_widths)
         self.old_cell_attributes = copy(self.model.code_array.cell_attributes)
         self.old_code = {}
-        for key in self.model.code_array:
-            if key[2] == self.model.shape[2] - 1:
-                self.old_code[key] = self.model.code_array(key)
+        last_table = self.model.shape[2] - 1
+        for key in self.model.code_array.dict_grid.table_keys(last_table):
+            self.old_code[key] = self.model.code_array(key)
 
         with self.grid.undo_resizing_row():
             with self.grid.undo_resizing_column():
@@ -781,9 +781,8 @@ class DeleteTable(QUndoCommand):
         self.old_col_widths = copy(self.model.code_array.col_widths)
         self.old_cell_attributes = copy(self.model.code_array.cell_attributes)
         self.old_code = {}
-        for key in self.model.code_array:
-            if key[2] == self.table:
-                self.old_code[key] = self.model.code_array(key)
+        for key in self.model.code_array.dict_grid.table_keys(self.table):
+            self.old_code[key] = self.model.code_array(key)
 
         with self.grid.undo_resizing_row():
             with self.grid.undo_resizing_column():
@@ -875,6 +874,62 @@ class SetCellMerge(SetCellFormat):
         self.model.dataChanged.emit(QModelIndex(), QModelIndex())
 
 
+class SetCellSpill(SetCellFormat):
+    """Sets spill areas of spill formula cells in grid"""
+
+    def redo(self):
+        """Redo setting the spill area"""
+
+        self.model.code_array.result_cache.clear()
+        super().redo()
+
+    def undo(self):
+        """Undo setting the spill area"""
+
+        self.model.code_array.result_cache.clear()
+        super().undo()
+
+
+class CompactCellAttributes(QUndoCommand):
+    """Replaces all cell attributes with an equivalent compacted version"""
+
+    def __init__(self, model: QAbstractTableModel, description: str):
+        """
+        :param model: Model of the grid object
+        :param description: Command description
+
+        """
+
+        super().__init__(description)
+
+        self.model = model
+        self.old_cell_attributes = list(model.code_array.cell_attributes)
+        self.new_cell_attributes = \
+            list(model.code_array.cell_attributes.compacted())
+
+    def _set_layers(self, cell_attributes: List[CellAttribute]):
+        """Sets cell attribute layers and updates grids
+
+        :param cell_attributes: Cell attribute layers to be set
+
+        """
+
+        self.model.code_array.cell_attributes.set_layers(cell_attributes)
+        for grid in self.model.main_window.grids:
+            grid.update_cell_spans()
+        self.model.dataChanged.emit(QModelIndex(), QModelIndex())
+
+    def redo(self):
+        """Redo cell attribute compaction"""
+
+        self._set_layers(self.new_cell_attributes)
+
+    def undo(self):
+        """Undo cell attribute compaction"""
+
+        self._set_layers(self.old_cell_attributes)
+
+
 class SetCellTextAlignment(SetCellFormat):
     """Sets cell text alignment in grid"""
 
@@ -911,7 +966,7 @@ class FreezeCell(QUndoCommand):
 
             # Add frozen cache content
             res_obj = self.model.code_array[cell]
-            self.model.code_array.frozen_cache[repr(cell)] = res_obj
+            self.model.code_array.frozen_cache[tuple(cell)] = res_obj
 
             # Set the frozen state
             selection = Selection([], [], [], [], [(row, column)])
@@ -924,7 +979,7 @@ class FreezeCell(QUndoCommand):
         """Undo cell freezing"""
 
         for cell in reversed(self.cells):
-            self.model.code_array.frozen_cache.pop(repr(cell))
+            self.model.code_array.frozen_cache.pop(tuple(cell))
             self.model.code_array.cell_attributes.pop()
             self.model.dataChanged.emit(QModelIndex(), QModelIndex())
 
@@ -940,10 +995,10 @@ class ThawCell(FreezeCell):
         for cell in self.cells:
             row, column, table = cell
 
-            if repr(cell) in self.model.code_array.frozen_cache:
+            if tuple(cell) in self.model.code_array.frozen_cache:
                 # Remove and store frozen cache content
                 self.res_objs.append(
-                    self.model.code_array.frozen_cache.pop(repr(cell)))
+                    self.model.code_array.frozen_cache.pop(tuple(cell)))
 
                 # Remove the frozen state
                 selection = Selection([], [], [], [], [(row, column)])
@@ -957,7 +1012,7 @@ class ThawCell(FreezeCell):
 
         for cell, res_obj in zip(reversed(self.cells),
                                  reversed(self.res_objs)):
-            self.model.code_array.frozen_cache[repr(cell)] = res_obj
+            self.model.code_array.frozen_cache[tuple(cell)] = res_obj
             self.model.code_array.cell_attributes.pop()
             self.model.dataChanged.emit(QModelIndex(), QModelIndex())
 
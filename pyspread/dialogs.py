@@ -515,14 +515,25 @@ class PreferencesDialog(DataEntryDialog):
         groupbox_title = "Global settings"
         labels = ["Signature key for files", "Cell calculation timeout [ms]",
                   "Frozen cell refresh period [ms]", "Number of recent files",
-                  "Show sum in statusbar"]
+                  "Show sum in statusbar",
+                  "Parallel recalculation (cells without S)",
+                  "Result cache size [MB]", "Compact formats on save",
+                  "Columnar number storage (after restart)",
+                  "Parallel save compression", "Autosave journal",
+                  "Journal size for compaction [MB]"]
         self.keys = ["signature_key", "timeout", "refresh_timeout",
-                     "max_file_history", "show_statusbar_sum"]
-        self.mappers = [str, int, int, int, bool]
+                     "max_file_history", "show_statusbar_sum",
+                     "parallel_recalculation", "result_cache_size",
+                     "compact_attributes_on_save", "columnar_storage",
+                     "parallel_save_compression", "autosave_journal",
+                     "journal_max_size"]
+        self.mappers = [str, int, int, int, bool, bool, int, bool, bool, bool,
+                        bool, int]
         data = [getattr(parent.settings, key) for key in self.keys]
         validator = QIntValidator()
         validator.setBottom(0)  # Do not allow negative values
-        validators = [None, validator, validator, validator, bool]
+        validators = [None, validator, validator, validator, bool, bool,
+                      validator, bool, bool, bool, bool, validator]
         super().__init__(parent, title, labels, data, groupbox_title,
                          validators)
 
@@ -603,7 +614,8 @@ class FileDialogBase:
 
     filters_list = [
         "Pyspread un-compressed (*.pysu)",
-        "Pyspread compressed (*.pys)"
+        "Pyspread compressed (*.pys)",
+        "Pyspread binary (*.pysb)"
     ]
     selected_filter = None
 
@@ -617,9 +629,8 @@ class FileDialogBase:
     def suffix(self) -> str:
         """Suffix for filepath"""
 
-        if self.filters_list.index(self.selected_filter):
-            return ".pys"
-        return ".pysu"
+        suffixes = [".pysu", ".pys", ".pysb"]
+        return suffixes[self.filters_list.index(self.selected_filter)]
 
     def __init__(self, main_window: QMainWindow):
         """
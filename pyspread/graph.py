@@ -147,6 +147,16 @@ class Graph(QWebEngineView):
         self.xValues = []
         self.yValues = []
 
+        xValues = self.get_column_values(colIndexX)
+        yValues = self.get_column_values(colIndexY)
+
+        if xValues is not None and yValues is not None:
+            # numeric columns are read from the result cache in one go
+            length = min(len(xValues), len(yValues))
+            self.xValues = xValues[:length].tolist()
+            self.yValues = yValues[:length].tolist()
+            inc = max
+
         while inc < max :
             x = self.model.index(inc,colIndexX).data()
             y = self.model.index(inc,colIndexY).data()
@@ -166,6 +176,36 @@ class Graph(QWebEngineView):
             self.data_curve(parameters,colIndexX,colIndexY)
 
 
+    def get_column_values(self, colIndex: int):
+        """
+        Returns the numbers of a column from row 1 up to the first empty cell
+        as float array, None if the column contains other results
+        """
+        code_array = self.model.code_array
+        table = self.parent.grid.table
+
+        # Cells below the last cell with code are empty
+        rows = code_array.dict_grid.column_rows(colIndex, table, 1,
+                                                self.model.shape[0])
+        if not rows:
+            return np.zeros(0)
+
+        # The range result is not cached, so that edits need no invalidation
+        values = code_array.evaluate_range((slice(1, rows[-1] + 1), colIndex,
+                                            table))
+
+        if not isinstance(values, np.ndarray) \
+           or values.dtype.kind not in "iuf":
+            return
+
+        if isinstance(values, np.ma.MaskedArray):
+            empty = np.flatnonzero(np.ma.getmaskarray(values))
+            if len(empty):
+                values = values[:empty[0]]
+            values = np.ma.getdata(values)
+
+        return values.astype(float)
+
     def rebuild(self):
 
         self.fig = go.Figure()#redefining the figure
@@ -34,10 +34,12 @@ Pyspread's main grid
 
 """
 
-from ast import literal_eval
+from collections import deque
 from contextlib import contextmanager
 from io import BytesIO
-from typing import Any, Iterable, List, Tuple, Union
+from itertools import product
+from time import perf_counter
+from typing import Any, Callable, Iterable, List, Tuple, Union
 
 import numpy
 
@@ -53,7 +55,7 @@ from PyQt6.QtGui \
 from PyQt6.QtCore \
     import (Qt, QAbstractTableModel, QModelIndex, QVariant, QEvent, QSize,
             QRect, QRectF, QItemSelectionModel, QObject, QAbstractItemModel,
-            QByteArray, pyqtSignal)
+            QByteArray, QTimer, pyqtSignal)
 
 from PyQt6.QtSvg import QSvgRenderer
 
@@ -653,8 +655,8 @@ class Grid(QTableView):
             self.main_window.statusBar().clearMessage()
             return
 
-        selected_cell_list = list(selection.cell_generator(self.model.shape,
-                                                           self.table))
+        selected_cell_list = list(selection.filled_cell_generator(
+            code_array.dict_grid, self.model.shape, self.table))
 
         res_gen = (code_array[key] for key in selected_cell_list
                    if code_array(key))
@@ -749,7 +751,7 @@ class Grid(QTableView):
     def _refresh_frozen_cell(self, key: Tuple[int, int, int]):
         """Refreshes the frozen cell key
 
-        Does neither emit dataChanged nor clear _attr_cache or _table_cache.
+        Does neither emit dataChanged nor clear cell attribute caches.
 
         :param key: Key of cell to be refreshed
 
@@ -758,7 +760,7 @@ class Grid(QTableView):
         if self.model.code_array.cell_attributes[key].frozen:
             code = self.model.code_array(key)
             result = self.model.code_array._eval_cell(key, code)
-            self.model.code_array.frozen_cache[repr(key)] = result
+            self.model.code_array.frozen_cache[tuple(key)] = result
 
     def refresh_frozen_cells(self):
         """Refreshes all frozen cells"""
@@ -766,8 +768,7 @@ class Grid(QTableView):
         frozen_cache = self.model.code_array.frozen_cache
         cell_attributes = self.model.code_array.cell_attributes
 
-        for repr_key in frozen_cache:
-            key = literal_eval(repr_key)
+        for key in frozen_cache:
             self._refresh_frozen_cell(key)
 
         self.model.dataChanged.emit(QModelIndex(), QModelIndex())
@@ -778,8 +779,7 @@ class Grid(QTableView):
         for idx in self.selected_idx:
             self._refresh_frozen_cell((idx.row(), idx.column(), self.table))
 
-        self.model.code_array.cell_attributes._attr_cache.clear()
-        self.model.code_array.cell_attributes._table_cache.clear()
+        self.model.code_array.cell_attributes._clear_caches()
         self.model.code_array.result_cache.clear()
         self.model.dataChanged.emit(QModelIndex(), QModelIndex())
 
@@ -1227,14 +1227,9 @@ class Grid(QTableView):
 
         spans = {}  # Dict of (top, left): (bottom, right)
 
-        for _, table, attrs in self.model.code_array.cell_attributes:
-            if table == self.table:
-                try:
-                    if "merge_area" in attrs and attrs.merge_area is not None:
-                        top, left, bottom, right = attrs["merge_area"]
-                        spans[(top, left)] = bottom, right
-                except (KeyError, TypeError):
-                    pass
+        merge_areas = self.model.code_array.cell_attributes.merge_areas
+        for top, left, bottom, right in merge_areas(self.table):
+            spans[(top, left)] = bottom, right
 
         for top, left in spans:
             try:
@@ -1362,6 +1357,42 @@ class Grid(QTableView):
 
         grid.current = top, left
 
+    def on_spill_pressed(self):
+        """Spill cells button pressed event handler
+
+        The result of the top left cell of the selection is laid out over the
+        selection. If the top left cell is a spill formula cell already then
+        the spill area is removed.
+
+        """
+
+        shape = list(self.model.shape)
+        shape[0] -= 1
+        shape[1] -= 1
+        bbox = self.selection.get_grid_bbox(shape)
+        (top, left), (bottom, right) = bbox
+
+        spill_shape = self.model.code_array.cell_attributes[
+            top, left, self.table].spill_shape
+
+        selection = Selection([], [], [], [], [(top, left)])
+
+        if spill_shape is not None:
+            attr_dict = AttrDict([("spill_shape", None)])
+            description = f"Remove spill area of cell {(top, left)}"
+        elif bottom > top or right > left:
+            spill_shape = bottom - top + 1, right - left + 1
+            attr_dict = AttrDict([("spill_shape", spill_shape)])
+            description = f"Spill cell {(top, left)} into {spill_shape}"
+        else:
+            # A single cell is no spill area
+            return
+
+        attr = CellAttribute(selection, self.table, attr_dict)
+        command = commands.SetCellSpill(attr, self.model, self.currentIndex(),
+                                        self.selected_idx, description)
+        self.main_window.undo_stack.push(command)
+
     def on_quote(self):
         """Quote cells event handler"""
 
@@ -1387,7 +1418,8 @@ class Grid(QTableView):
         no_rows = self.model.shape[0]
         rows = list(range(no_rows-count, no_rows+1))
         selection = Selection([], [], rows, [], [])
-        sel_cell_gen = selection.cell_generator(self.model.shape, self.table)
+        sel_cell_gen = selection.filled_cell_generator(
+            self.model.code_array.dict_grid, self.model.shape, self.table)
         return any(self.model.code_array(key) is not None
                    for key in sel_cell_gen)
 
@@ -1401,7 +1433,8 @@ class Grid(QTableView):
         no_columns = self.model.shape[1]
         columns = list(range(no_columns-count, no_columns+1))
         selection = Selection([], [], [], columns, [])
-        sel_cell_gen = selection.cell_generator(self.model.shape, self.table)
+        sel_cell_gen = selection.filled_cell_generator(
+            self.model.code_array.dict_grid, self.model.shape, self.table)
         return any(self.model.code_array(key) is not None
                    for key in sel_cell_gen)
 
@@ -1608,6 +1641,207 @@ class GridHeaderView(QHeaderView):
                     self.resizeSection(section, int(size * self.grid.zoom))
 
 
+class RecalculationScheduler(QObject):
+    """Evaluates uncached cells in time-sliced batches from the event loop
+
+    Cells that are visible in one of the grids are evaluated first. Cells
+    that have not been loaded from a file are queued when they are loaded.
+    Cells that are pending are displayed with a placeholder. With parallel
+    recalculation, independent cells are submitted to the process pool of
+    the code array, and their results are stored when they are done.
+
+    """
+
+    placeholder = "…"
+    """Display text for cells with pending evaluation"""
+
+    time_slice = 50
+    """Maximum duration of one evaluation batch in milliseconds"""
+
+    restart_delay = 250
+    """Delay in milliseconds after an edit, before recalculation restarts"""
+
+    poll_interval = 20
+    """Interval in milliseconds, in which process pool results are polled"""
+
+    def __init__(self, model: QAbstractTableModel):
+        """
+        :param model: Grid model, for which cells are evaluated
+
+        """
+
+        super().__init__()
+
+        self.model = model
+
+        self.pending = deque()
+        self.pending_keys = set()
+        self.futures = {}  # key: Future of cell in process pool
+
+        self.batch_timer = QTimer(self)
+        self.batch_timer.timeout.connect(self.on_batch_timer)
+
+        self.restart_timer = QTimer(self)
+        self.restart_timer.setSingleShot(True)
+        self.restart_timer.timeout.connect(self.start)
+
+    @property
+    def code_array(self) -> CodeArray:
+        """Code array of the model"""
+
+        return self.model.code_array
+
+    def visible_keys(self) -> List[Tuple[int, int, int]]:
+        """Returns keys of non-empty cells that are visible in any grid"""
+
+        keys = []
+        dict_grid = self.code_array.dict_grid
+        rows, columns, _ = self.code_array.shape
+
+        def last_painted(first: int, count: int, position: Callable,
+                         end: int) -> int:
+            """Returns last row or column that starts in the viewport"""
+
+            last = first
+            while last + 1 < count and position(last + 1) <= end:
+                last += 1
+            return last
+
+        for grid in self.model.main_window.grids:
+            if not grid.isVisible():
+                continue
+
+            rect = grid.viewport().rect()
+
+            top = max(grid.rowAt(rect.top()), 0)
+            bottom = grid.rowAt(rect.bottom())
+            if bottom < 0:
+                # Viewport extends beyond the last row
+                bottom = last_painted(top, rows, grid.rowViewportPosition,
+                                      rect.bottom())
+            left = max(grid.columnAt(rect.left()), 0)
+            right = grid.columnAt(rect.right())
+            if right < 0:
+                right = last_painted(left, columns,
+                                     grid.columnViewportPosition,
+                                     rect.right())
+
+            visible_area = product(range(top, bottom + 1),
+                                   range(left, right + 1), [grid.table])
+            keys.extend(key for key in visible_area if key in dict_grid)
+
+        return keys
+
+    def is_pending(self, key: Tuple[int, int, int]) -> bool:
+        """True if the cell is waiting for evaluation
+
+        :param key: Key of cell to be checked
+
+        """
+
+        return (key in self.pending_keys
+                and key not in self.code_array.result_cache)
+
+    def start(self):
+        """Queues all loaded uncached cells, visible cells first, and starts
+
+        Cells that are loaded later are queued by :meth:`add`.
+
+        """
+
+        self.cancel()
+
+        if self.code_array.safe_mode:
+            return
+
+        dict_grid = self.code_array.dict_grid
+
+        visible_keys = self.visible_keys()
+        keys = visible_keys + list(set(dict_grid.loaded_keys())
+                                   - set(visible_keys))
+
+        dict_grid.on_load = self.add
+        self.add(keys)
+
+    def add(self, keys: Iterable[Tuple[int, int, int]]):
+        """Queues uncached cells that are not pending and starts
+
+        :param keys: Keys of cells to be queued
+
+        """
+
+        result_cache = self.code_array.result_cache
+
+        keys = [key for key in keys
+                if key not in self.pending_keys and key not in result_cache]
+
+        if self.code_array.settings.parallel_recalculation:
+            self.futures.update(self.code_array.submit_parallel(keys))
+
+        keys = [key for key in keys if key not in result_cache]
+        self.pending.extend(keys)
+        self.pending_keys.update(keys)
+
+        if keys and not self.batch_timer.isActive():
+            self.batch_timer.start(0)
+
+    def cancel(self):
+        """Stops recalculation and discards all pending cells"""
+
+        self.code_array.dict_grid.on_load = None
+        self.batch_timer.stop()
+        self.restart_timer.stop()
+        self.pending.clear()
+        self.pending_keys.clear()
+
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+
+    def restart(self):
+        """Cancels stale work and restarts after :attr:`restart_delay`"""
+
+        self.cancel()
+        self.restart_timer.start(self.restart_delay)
+
+    def on_batch_timer(self):
+        """Evaluates pending cells until the time slice is used up"""
+
+        deadline = perf_counter() + self.time_slice / 1000
+        dict_grid = self.code_array.dict_grid
+
+        running = []  # Keys of cells that are evaluated in the process pool
+
+        with self.code_array.watchdog.batch():
+            while self.pending and perf_counter() < deadline:
+                key = self.pending.popleft()
+                future = self.futures.get(key)
+                if future is not None:
+                    if not future.done():
+                        running.append(key)
+                        continue
+                    del self.futures[key]
+                    if self.code_array.store_parallel_result(key, future):
+                        self.pending_keys.discard(key)
+                        continue
+                self.pending_keys.discard(key)
+                if key in dict_grid:
+                    self.code_array[key]
+
+        self.pending.extend(running)
+
+        if not self.pending:
+            self.batch_timer.stop()
+        elif len(running) == len(self.pending):
+            # Only waiting for the process pool
+            self.batch_timer.start(self.poll_interval)
+        else:
+            self.batch_timer.start(0)
+
+        for grid in self.model.main_window.grids:
+            grid.viewport().update()
+
+
 class GridTableModel(QAbstractTableModel):
     """QAbstractTableModel for Grid"""
 
@@ -1625,6 +1859,7 @@ class GridTableModel(QAbstractTableModel):
 
         self.main_window = main_window
         self.code_array = CodeArray(shape, main_window.settings)
+        self.recalculation = RecalculationScheduler(self)
 
     @contextmanager
     def model_reset(self):
@@ -1867,8 +2102,20 @@ class GridTableModel(QAbstractTableModel):
 
         key = self.current(index)
 
+        if role in (Qt.ItemDataRole.DisplayRole,
+                    Qt.ItemDataRole.ToolTipRole,
+                    Qt.ItemDataRole.DecorationRole) \
+           and self.recalculation.is_pending(key):
+            if role == Qt.ItemDataRole.DecorationRole:
+                return QVariant()
+            return self.recalculation.placeholder
+
         if role == Qt.ItemDataRole.DisplayRole:
-            value = self.code_array[key]
+            if self.code_array.cell_attributes[key].spill_shape is not None:
+                # Spill formula cells show the first element of their result
+                value = self.code_array.spill_element(key, key)
+            else:
+                value = self.code_array[key]
             renderer = self.code_array.cell_attributes[key].renderer
             if renderer == "image" or value is None:
                 return ""
@@ -1952,6 +2199,9 @@ class GridTableModel(QAbstractTableModel):
             else:
                 key = index.row(), index.column(), table
 
+            if self.recalculation.pending:
+                self.recalculation.restart()
+
             if raw:
                 if value is None:
                     try:
@@ -2007,6 +2257,9 @@ class GridTableModel(QAbstractTableModel):
         """Deletes all grid data including undo data"""
 
         with self.model_reset():
+            # Stop background recalculation
+            self.recalculation.cancel()
+
             # Clear cells
             self.code_array.dict_grid.clear()
 
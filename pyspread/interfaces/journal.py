@@ -0,0 +1,499 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+This file contains the journal that records unsaved changes next to a save
+file, so that they can be recovered after pyspread has been killed.
+
+The journal is an append-only text file with the suffix `.journal` that is
+appended to the name of the save file. Each line is a record that consists
+of a signature and of the repr of a Python literal. The first record
+describes the base of the journal, i.e. the size and the modification time
+of the save file and the signature of a checkpoint if there is one. Each
+further record contains a list of changes:
+
+ * Changes of cells and of the shape as recorded by `DictGrid.journal`
+ * ("attributes", start, layers): Cell attribute layers from start on
+ * ("row_heights", changed items, removed keys)
+ * ("col_widths", changed items, removed keys)
+ * ("macros", macros)
+
+A checkpoint is a full save of the grid with the suffix `.checkpoint` that
+replaces the save file as base when the journal is compacted.
+
+**Provides**
+
+ * :class:`Journal`
+
+"""
+
+import ast
+import bz2
+import os
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any, Iterable, List, Optional, Tuple
+
+try:
+    from pyspread.interfaces.pys import PysReader, PysWriter
+    from pyspread.lib.attrdict import AttrDict
+    from pyspread.lib.compression import Bz2Writer
+    from pyspread.lib.hashing import sign, verify
+    from pyspread.lib.selection import Selection
+    from pyspread.model.model import CellAttribute, DataArray
+except ImportError:
+    from interfaces.pys import PysReader, PysWriter
+    from lib.attrdict import AttrDict
+    from lib.compression import Bz2Writer
+    from lib.hashing import sign, verify
+    from lib.selection import Selection
+    from model.model import CellAttribute, DataArray
+
+
+class Journal:
+    """Append-only journal of the changes of a grid since its last save
+
+    :meth:`attach` starts recording changes of a data array.
+    :meth:`start` begins a journal file for the state of the save file.
+    :meth:`flush` appends the changes since the last record.
+    :meth:`write_checkpoint` and :meth:`finish_checkpoint` compact the
+    journal into a full save.
+    :meth:`recover` replays a journal that has been left over.
+
+    """
+
+    version = 1
+
+    flush_interval = 2000
+    """Interval between flushes in milliseconds"""
+
+    def __init__(self, filepath: Path, signature_key: bytes):
+        """
+        :param filepath: Path of the save file
+        :param signature_key: Key for signing records
+
+        """
+
+        self.signature_key = signature_key
+        self.data_array = None
+        self.recovered = False  # True if changes have been recovered
+
+        self._file = None
+        self._set_paths(filepath)
+
+    def _set_paths(self, filepath: Path):
+        """Sets the paths of save file, journal and checkpoint
+
+        :param filepath: Path of the save file
+
+        """
+
+        self.filepath = Path(filepath)
+        self.path = self.filepath.with_suffix(self.filepath.suffix
+                                              + ".journal")
+        self.checkpoint_path = self.filepath.with_suffix(
+            self.filepath.suffix + ".checkpoint")
+
+    @property
+    def started(self) -> bool:
+        """True if a journal file is open"""
+
+        return self._file is not None
+
+    @property
+    def size(self) -> int:
+        """Size of the journal file in bytes"""
+
+        return self._file.tell() if self._file is not None else 0
+
+    # Recording
+
+    def attach(self, data_array: DataArray):
+        """Starts recording the changes of data_array
+
+        The current state of data_array is regarded as recorded.
+
+        :param data_array: Data array that is recorded
+
+        """
+
+        self.data_array = data_array
+        data_array.dict_grid.journal = []
+        self._mark()
+
+    def detach(self):
+        """Stops recording changes"""
+
+        if self.data_array is not None:
+            self.data_array.dict_grid.journal = None
+            self.data_array = None
+
+    def _mark(self):
+        """Remembers the state of the parts that are compared in changes"""
+
+        dict_grid = self.data_array.dict_grid
+
+        self._attributes = dict_grid.cell_attributes
+        self._generation = self._attributes.generation
+        self._layers = list(self._attributes)
+        self._row_heights = dict(dict_grid.row_heights)
+        self._col_widths = dict(dict_grid.col_widths)
+        self._macros = dict_grid.macros
+
+    @staticmethod
+    def _encode_layer(cell_attribute: CellAttribute) -> tuple:
+        """Returns cell attribute as literal
+
+        :param cell_attribute: Cell attribute layer
+
+        """
+
+        selection, table, attr = cell_attribute
+        return ((selection.block_tl, selection.block_br, selection.rows,
+                 selection.columns, selection.cells),
+                table, list(attr.items()))
+
+    @staticmethod
+    def _decode_layer(layer: tuple) -> CellAttribute:
+        """Returns cell attribute from literal
+
+        :param layer: Literal from :meth:`_encode_layer`
+
+        """
+
+        selection_data, table, attr_items = layer
+        return CellAttribute(Selection(*selection_data), table,
+                             AttrDict(attr_items))
+
+    @staticmethod
+    def _size_changes(old: dict, new: dict) -> Optional[tuple]:
+        """Returns (changed items, removed keys) or None if old equals new
+
+        :param old: Row heights or column widths of the last record
+        :param new: Current row heights or column widths
+
+        """
+
+        if old == new:
+            return
+
+        changed = [(key, value) for key, value in new.items()
+                   if key not in old or old[key] != value]
+        removed = [key for key in old if key not in new]
+        return changed, removed
+
+    def changes(self) -> List[tuple]:
+        """Returns and marks the changes since the last call"""
+
+        dict_grid = self.data_array.dict_grid
+
+        changes = dict_grid.journal
+        dict_grid.journal = []
+
+        attributes = dict_grid.cell_attributes
+        if attributes is not self._attributes \
+           or attributes.generation != self._generation:
+            layers = list(attributes)
+            start = 0
+            for start, (old, new) in enumerate(zip(self._layers, layers)):
+                if old is not new:
+                    break
+            else:
+                start = min(len(self._layers), len(layers))
+            changes.append(("attributes", start,
+                            list(map(self._encode_layer, layers[start:]))))
+
+        for name, old in (("row_heights", self._row_heights),
+                          ("col_widths", self._col_widths)):
+            size_changes = self._size_changes(old, getattr(dict_grid, name))
+            if size_changes is not None:
+                changes.append((name, *size_changes))
+
+        if dict_grid.macros != self._macros:
+            changes.append(("macros", dict_grid.macros))
+
+        self._mark()
+
+        return changes
+
+    # Journal file
+
+    def _record(self, payload: Any) -> bytes:
+        """Returns signed journal line for payload
+
+        :param payload: Python literal
+
+        """
+
+        data = repr(payload).encode("utf-8")
+        return sign(data, self.signature_key) + b"\t" + data + b"\n"
+
+    def _base(self, checkpoint_signature: Optional[bytes]) -> tuple:
+        """Returns header payload
+
+        :param checkpoint_signature: Signature of checkpoint, None if there
+                                     is no checkpoint
+
+        """
+
+        stat = self.filepath.stat()
+        return ("journal", self.version, stat.st_size, stat.st_mtime_ns,
+                checkpoint_signature)
+
+    def start(self, checkpoint_signature: Optional[bytes] = None):
+        """Replaces the journal file with an empty one for the save file
+
+        Changes that have not been flushed are kept for the next record.
+
+        :param checkpoint_signature: Signature of checkpoint, None if the
+                                     save file is the base
+
+        """
+
+        header = self._record(self._base(checkpoint_signature))
+
+        self.close()
+
+        with NamedTemporaryFile(dir=self.path.parent, delete=False) as tmp:
+            tmp.write(header)
+        os.replace(tmp.name, self.path)
+
+        if checkpoint_signature is None:
+            self.recovered = False
+
+        if checkpoint_signature is None and self.checkpoint_path.exists():
+            os.remove(self.checkpoint_path)
+
+        self._file = open(self.path, "ab")
+
+    def resume(self):
+        """Appends to the existing journal file, e.g. after recovery"""
+
+        self.close()
+        self._file = open(self.path, "ab")
+
+    def move(self, filepath: Path):
+        """Removes the journal files and uses the ones of filepath
+
+        Changes that have not been flushed are kept for the next record.
+
+        :param filepath: Path of the new save file
+
+        """
+
+        self.close()
+        self._remove_files()
+        self._set_paths(filepath)
+
+    def flush(self) -> int:
+        """Appends a record of the changes if any, returns journal size"""
+
+        changes = self.changes()
+        if changes:
+            self._file.write(self._record(changes))
+            self._file.flush()
+
+        return self.size
+
+    def close(self):
+        """Closes the journal file without removing it"""
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _remove_files(self):
+        """Removes journal file and checkpoint"""
+
+        for path in self.path, self.checkpoint_path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def discard(self):
+        """Stops recording and removes journal file and checkpoint"""
+
+        self.detach()
+        self.close()
+        self._remove_files()
+
+    # Compaction
+
+    def write_checkpoint(self, pys_writer: PysWriter
+                         ) -> Tuple[str, bytes]:
+        """Writes a checkpoint to a temporary file
+
+        Does not change the journal, so that it can run in a worker thread.
+        Returns temporary file name and checkpoint signature.
+
+        :param pys_writer: Writer for a snapshot of the grid
+
+        """
+
+        with NamedTemporaryFile(dir=self.path.parent, delete=False) as tmp:
+            try:
+                with Bz2Writer(tmp) as outfile:
+                    for line in pys_writer:
+                        outfile.write(bytes(line, "utf-8"))
+            except BaseException:
+                tmp.close()
+                os.remove(tmp.name)
+                raise
+
+        with open(tmp.name, "rb") as infile:
+            signature = sign(infile.read(), self.signature_key)
+
+        return tmp.name, signature
+
+    def finish_checkpoint(self, filename: str, signature: bytes):
+        """Makes the checkpoint the base of a new journal
+
+        Must be called before further changes are flushed.
+
+        :param filename: Temporary file from :meth:`write_checkpoint`
+        :param signature: Checkpoint signature
+
+        """
+
+        os.replace(filename, self.checkpoint_path)
+        self.start(signature)
+
+    # Recovery
+
+    def _records(self) -> Iterable[Tuple[Any, bool]]:
+        """Yields payloads and if they are signed correctly
+
+        Stops at the first incomplete or malformed record.
+
+        """
+
+        with open(self.path, "rb") as infile:
+            for line in infile:
+                if not line.endswith(b"\n"):
+                    return
+                signature, _, data = line[:-1].partition(b"\t")
+                try:
+                    payload = ast.literal_eval(data.decode("utf-8"))
+                except (SyntaxError, ValueError, UnicodeDecodeError,
+                        MemoryError, RecursionError):
+                    return
+                yield payload, verify(data, signature, self.signature_key)
+
+    def _header(self) -> Optional[tuple]:
+        """Returns header payload if it matches the save file else None"""
+
+        try:
+            header, _ = next(iter(self._records()))
+            stat = self.filepath.stat()
+        except (OSError, StopIteration):
+            return
+
+        if isinstance(header, tuple) and len(header) == 5 \
+           and header[:4] == ("journal", self.version, stat.st_size,
+                              stat.st_mtime_ns):
+            return header
+
+    def recoverable(self) -> bool:
+        """True if a journal for the current save file has been left over"""
+
+        return self._header() is not None
+
+    def recover(self, data_array: DataArray) -> bool:
+        """Replays the journal on data_array that contains the save file
+
+        If the journal has a checkpoint then data_array is replaced by it.
+        Returns False if a record or the checkpoint is not signed correctly.
+
+        :param data_array: Data array with the content of the save file
+
+        """
+
+        header = self._header()
+        if header is None:
+            return False
+
+        records = iter(self._records())
+        _, valid = next(records)
+
+        checkpoint_signature = header[4]
+        if checkpoint_signature is not None:
+            with open(self.checkpoint_path, "rb") as infile:
+                valid &= verify(infile.read(), checkpoint_signature,
+                                self.signature_key)
+
+            dict_grid = data_array.dict_grid
+            dict_grid.clear()
+            dict_grid.cell_attributes.clear()
+            dict_grid.row_heights.clear()
+            dict_grid.col_widths.clear()
+            dict_grid.macros = ""
+            with bz2.open(self.checkpoint_path, "rb") as infile:
+                for _ in PysReader(infile, data_array):
+                    pass
+
+        for changes, signed in records:
+            valid &= signed
+            self._apply(data_array, changes)
+
+        self.recovered = True
+
+        return valid
+
+    def _apply(self, data_array: DataArray, changes: List[tuple]):
+        """Applies the changes of a record to data_array
+
+        :param data_array: Target data array
+        :param changes: Changes of a record
+
+        """
+
+        dict_grid = data_array.dict_grid
+
+        for change in changes:
+            kind, *args = change
+            if kind == "set":
+                key, code = args
+                dict_grid[key] = code
+            elif kind == "del":
+                dict_grid.pop(args[0], None)
+            elif kind == "clear":
+                dict_grid.clear()
+            elif kind == "insert":
+                dict_grid.insert(*args)
+            elif kind == "delete":
+                dict_grid.delete(*args)
+            elif kind == "shape":
+                dict_grid.shape = args[0]
+            elif kind == "attributes":
+                start, layers = args
+                dict_grid.cell_attributes.set_layers(
+                    list(dict_grid.cell_attributes)[:start]
+                    + list(map(self._decode_layer, layers)))
+            elif kind in ("row_heights", "col_widths"):
+                sizes = getattr(dict_grid, kind)
+                changed, removed = args
+                sizes.update(changed)
+                for key in removed:
+                    sizes.pop(key, None)
+            elif kind == "macros":
+                dict_grid.macros = args[0]
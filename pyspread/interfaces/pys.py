@@ -49,6 +49,7 @@ from builtins import str, map, object
 import ast
 from base64 import b64decode, b85encode
 from collections import OrderedDict
+from copy import copy
 from typing import Any, BinaryIO, Callable, Iterable, Tuple
 
 try:
@@ -556,12 +557,12 @@ class PysWriter(object):
 
         """
 
-        for key in self.code_array:
+        for key, code in self.code_array.dict_grid.items():
             key_str = u"\t".join(repr(ele) for ele in key)
             if self.version <= 1.0:
-                code_str = self.code_array(key)
+                code_str = code
             else:
-                code_str = repr(self.code_array(key))
+                code_str = repr(code)
             out_str = key_str + u"\t" + code_str + u"\n"
 
             yield out_str
@@ -574,16 +575,22 @@ class PysWriter(object):
 
         """
 
+        cell_attributes = self.code_array.cell_attributes
+        if self.code_array.settings.compact_attributes_on_save:
+            cell_attributes = cell_attributes.compacted()
+
         # Remove doublettes
         purged_cell_attributes = []
         purged_cell_attributes_keys = []
-        for selection, tab, attr_dict in self.code_array.cell_attributes:
+        for selection, tab, attr_dict in cell_attributes:
             if purged_cell_attributes_keys and \
                (selection, tab) == purged_cell_attributes_keys[-1]:
                 purged_cell_attributes[-1][2].update(attr_dict)
             else:
                 purged_cell_attributes_keys.append((selection, tab))
-                purged_cell_attributes.append([selection, tab, attr_dict])
+                # Copy attr_dict because it is updated for doublettes
+                purged_cell_attributes.append([selection, tab,
+                                               copy(attr_dict)])
 
         for selection, tab, attr_dict in purged_cell_attributes:
             if not attr_dict:
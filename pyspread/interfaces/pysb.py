@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+This file contains interfaces to the indexed binary pysb file format.
+
+A pysb file is memory-mapped when it is opened. Only its meta data is read
+immediately. Cell code is stored in chunks of rows that are loaded into the
+grid when a cell of the chunk is accessed.
+
+File layout (all numbers are unsigned little endian integers):
+
+ * Magic `PYSB\\r\\n\\x1a\\n`
+ * Sections, each referenced from the section table:
+    * `cells`: Chunks of cells. A chunk of n cells of one table consists of
+      2n 32 bit keys (row, column), n + 1 32 bit character offsets of the
+      code of each cell and the UTF-8 encoded code of all cells.
+    * `index`: One entry per chunk, sorted by table and row, with the 32 bit
+      table, first row, last row and number of cells and the 64 bit file
+      offset and size of the chunk.
+    * `globals`: 32 bit row, column and table of each cell whose code may
+      assign globals. These cells are loaded before the macros are
+      executed. Files without this section are loaded completely then.
+    * `meta`: Shape, cell attributes, row heights, column widths and macros
+      in pys format
+ * Section table: 8 byte name, 64 bit offset and 64 bit size of each section
+ * Trailer: 64 bit offset of the section table, 32 bit number of sections,
+   32 bit format version and the magic
+
+**Provides**
+
+ * :class:`PysbReader`
+ * :class:`PysbWriter`
+ * :class:`PysbLoader`
+
+"""
+
+from bisect import bisect_right
+from io import BytesIO
+import mmap
+from struct import Struct
+from typing import BinaryIO, Dict, Iterable, List, Tuple, Union
+
+try:
+    from pyspread.interfaces.pys import PysReader, PysWriter
+    from pyspread.model.model import CodeArray, DictGrid
+except ImportError:
+    from interfaces.pys import PysReader, PysWriter
+    from model.model import CodeArray, DictGrid
+
+MAGIC = b"PYSB\r\n\x1a\n"
+VERSION = 1
+
+SECTION = Struct("<8sQQ")
+INDEX_ENTRY = Struct("<IIIIQQ")
+GLOBAL_KEY = Struct("<III")
+TRAILER = Struct("<QII8s")
+
+
+class PysbLoader:
+    """Loads chunks of cells from a pysb file into a grid on access
+
+    Instances are used as :attr:`model.model.DictGrid.loader`.
+
+    """
+
+    def __init__(self, buffer: Union[mmap.mmap, bytes], dict_grid: DictGrid,
+                 index: Iterable[Tuple[int, int, int, int, int, int]],
+                 global_keys: List[Tuple[int, int, int]] = None):
+        """
+        :param buffer: Memory-mapped pysb file
+        :param dict_grid: Grid that the cells are loaded into
+        :param index: Index entries of the chunks sorted by table and row
+        :param global_keys: Keys of cells that may assign globals or None
+
+        """
+
+        self.buffer = buffer
+        self.dict_grid = dict_grid
+        self.pending = 0  # Number of cells that have not been loaded
+        self.global_keys = global_keys
+
+        # table: (first rows, index entries or None if loaded)
+        self._chunks: Dict[int, Tuple[List[int], List[tuple]]] = {}
+
+        for entry in index:
+            table, first_row, _, count, _, _ = entry
+            first_rows, entries = self._chunks.setdefault(table, ([], []))
+            first_rows.append(first_row)
+            entries.append(entry)
+            self.pending += count
+
+    def load(self, key: Tuple[int, int, int]):
+        """Loads the chunk of the cell key if it has not been loaded
+
+        :param key: Cell key
+
+        """
+
+        row, _, table = key
+
+        try:
+            first_rows, entries = self._chunks[table]
+        except KeyError:
+            return
+
+        pos = bisect_right(first_rows, row) - 1
+        if pos >= 0 and entries[pos] is not None \
+           and row <= entries[pos][2]:
+            self._load_chunk(entries, pos)
+
+    def load_table(self, table: int):
+        """Loads all chunks of table
+
+        :param table: Table of the chunks
+
+        """
+
+        if table in self._chunks:
+            entries = self._chunks[table][1]
+            for pos, entry in enumerate(entries):
+                if entry is not None:
+                    self._load_chunk(entries, pos)
+
+    def load_all(self):
+        """Loads all chunks"""
+
+        for table in list(self._chunks):
+            self.load_table(table)
+
+    def _load_chunk(self, entries: List[tuple], pos: int):
+        """Decodes a chunk and adds its cells to the grid
+
+        :param entries: Index entries of the table of the chunk
+        :param pos: Position of the chunk in entries
+
+        """
+
+        table, _, _, count, offset, size = entries[pos]
+        entries[pos] = None
+        self.pending -= count
+
+        keys = Struct(f"<{2 * count}I").unpack_from(self.buffer, offset)
+        offset += 8 * count
+        positions = Struct(f"<{count + 1}I").unpack_from(self.buffer, offset)
+        offset += 4 * (count + 1)
+        text = self.buffer[offset:offset + size - 12 * count - 4]
+        text = text.decode("utf-8")
+
+        self.dict_grid.add_loaded(
+            ((keys[2 * i], keys[2 * i + 1], table),
+             text[positions[i]:positions[i + 1]]) for i in range(count))
+
+    def close(self):
+        """Releases the file"""
+
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.buffer = None
+        self._chunks.clear()
+        self.pending = 0
+        self.global_keys = None
+
+
+class PysbReader(PysReader):
+    """Reads pysb file into a code_array
+
+    The meta data is read when iterating, and a :class:`PysbLoader` is set
+    as loader of the cells.
+
+    """
+
+    def __init__(self, pysb_file: BinaryIO, code_array: CodeArray):
+        """
+        :param pysb_file: The pysb file to be read
+        :param code_array: Target code_array
+
+        """
+
+        try:
+            self.buffer = mmap.mmap(pysb_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            # No file descriptor or empty file
+            pysb_file.seek(0)
+            self.buffer = pysb_file.read()
+
+        self.sections = self._read_sections()
+
+        super().__init__(BytesIO(self._section(b"meta")), code_array)
+
+    def _read_sections(self) -> Dict[bytes, Tuple[int, int]]:
+        """Returns {name: (offset, size)} from the section table"""
+
+        size = len(self.buffer)
+
+        if size < len(MAGIC) + TRAILER.size \
+           or self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError("File is not a pysb file.")
+
+        table_offset, number, version, magic = \
+            TRAILER.unpack_from(self.buffer, size - TRAILER.size)
+
+        if magic != MAGIC:
+            raise ValueError("File is not a pysb file.")
+
+        if version > VERSION:
+            msg = f"pysb file version {version} unsupported (> {VERSION})."
+            raise ValueError(msg)
+
+        if table_offset + number * SECTION.size > size - TRAILER.size:
+            raise ValueError("pysb file is truncated.")
+
+        sections = {}
+        for i in range(number):
+            name, offset, length = SECTION.unpack_from(
+                self.buffer, table_offset + i * SECTION.size)
+            if offset + length > size:
+                raise ValueError("pysb file is truncated.")
+            sections[name.rstrip(b"\0")] = offset, length
+
+        return sections
+
+    def _section(self, name: bytes) -> bytes:
+        """Returns content of section
+
+        :param name: Section name
+
+        """
+
+        try:
+            offset, size = self.sections[name]
+        except KeyError:
+            raise ValueError(f"pysb file has no {name.decode()} section.")
+
+        return self.buffer[offset:offset + size]
+
+    def __iter__(self):
+        """Reads the meta data and sets the cell loader"""
+
+        yield from super().__iter__()
+
+        index = self._section(b"index")
+        entries = [INDEX_ENTRY.unpack_from(index, offset)
+                   for offset in range(0, len(index), INDEX_ENTRY.size)]
+
+        if b"globals" in self.sections:
+            data = self._section(b"globals")
+            global_keys = [GLOBAL_KEY.unpack_from(data, offset)
+                           for offset in range(0, len(data), GLOBAL_KEY.size)]
+        else:
+            global_keys = None
+
+        dict_grid = self.code_array.dict_grid
+        if entries:
+            dict_grid.set_loader(PysbLoader(self.buffer, dict_grid, entries,
+                                            global_keys))
+        elif isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+
+class PysbWriter(PysWriter):
+    """Interface between code_array and pysb file data
+
+    Iterating over it yields blocks of pysb file data. Progress is measured
+    in cells that have been written, see :attr:`progress`.
+
+    """
+
+    chunk_size = 4096
+    """Minimum number of cells in a chunk, rows are not split"""
+
+    def __init__(self, code_array: CodeArray):
+        """
+        :param code_array: The code_array object data structure
+
+        """
+
+        super().__init__(code_array)
+
+        self.progress = 0
+
+    def __len__(self) -> int:
+        """Returns the number of cells"""
+
+        return len(self.code_array.dict_grid)
+
+    def _code2pys(self) -> Iterable[str]:
+        """Cell code is stored in chunks instead of the meta data"""
+
+        return iter(())
+
+    def _chunks(self) -> Iterable[Tuple[int, int, int, List[tuple]]]:
+        """Yields (table, first row, last row, sorted items) of chunks"""
+
+        items = sorted(self.code_array.dict_grid.items(),
+                       key=lambda item: (item[0][2], item[0][0], item[0][1]))
+
+        start = 0
+        while start < len(items):
+            table = items[start][0][2]
+            stop = min(start + self.chunk_size, len(items))
+            # Chunks do not span tables
+            while items[stop - 1][0][2] != table:
+                stop -= 1
+            # Extend chunk to the end of the row of its last cell
+            last_row = items[stop - 1][0][0]
+            while stop < len(items) and items[stop][0][2] == table \
+                    and items[stop][0][0] == last_row:
+                stop += 1
+            chunk = items[start:stop]
+            yield table, chunk[0][0][0], chunk[-1][0][0], chunk
+            start = stop
+
+    def __iter__(self) -> Iterable[bytes]:
+        """Yields a pysb file in blocks"""
+
+        self.progress = 0
+
+        yield MAGIC
+        position = len(MAGIC)
+
+        index = []
+        global_keys = []
+        for table, first_row, last_row, chunk in self._chunks():
+            keys = []
+            positions = [0]
+            codes = []
+            for (row, column, _), code in chunk:
+                keys.append(row)
+                keys.append(column)
+                codes.append(code)
+                positions.append(positions[-1] + len(code))
+                if CodeArray._writes_globals(code):
+                    global_keys.append(GLOBAL_KEY.pack(row, column, table))
+
+            data = b"".join((Struct(f"<{len(keys)}I").pack(*keys),
+                             Struct(f"<{len(positions)}I").pack(*positions),
+                             "".join(codes).encode("utf-8")))
+
+            index.append(INDEX_ENTRY.pack(table, first_row, last_row,
+                                          len(chunk), position, len(data)))
+            yield data
+            self.progress += len(chunk)
+
+            position += len(data)
+
+        sections = [(b"cells", len(MAGIC), position - len(MAGIC))]
+
+        for name, data in ((b"index", b"".join(index)),
+                           (b"globals", b"".join(global_keys)),
+                           (b"meta", "".join(super().__iter__())
+                            .encode("utf-8"))):
+            yield data
+            sections.append((name, position, len(data)))
+            position += len(data)
+
+        yield b"".join(SECTION.pack(*section) for section in sections)
+        yield TRAILER.pack(position, len(sections), VERSION, MAGIC)
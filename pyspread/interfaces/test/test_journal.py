@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+
+"""
+test_journal
+============
+
+Unit tests for journal.py
+
+"""
+
+import bz2
+from os.path import abspath, dirname, join
+import sys
+
+import pytest
+
+pyspread_path = abspath(join(dirname(__file__) + "/../.."))
+sys.path.insert(0, pyspread_path)
+
+from interfaces.journal import Journal
+from interfaces.pys import PysReader, PysWriter
+from model.model import CellAttribute, DataArray
+
+from lib.attrdict import AttrDict
+from lib.selection import Selection
+sys.path.pop(0)
+
+KEY = b"journal test key"
+
+
+class Settings:
+    """Simulates settings class"""
+
+    compact_attributes_on_save = False
+    columnar_storage = False
+
+
+def load(filepath):
+    """Returns DataArray with the content of a pys file"""
+
+    data_array = DataArray((1, 1, 1), Settings())
+    with bz2.open(filepath, "rb") as infile:
+        for _ in PysReader(infile, data_array):
+            pass
+    return data_array
+
+
+def save(data_array, filepath):
+    """Saves data_array to a pys file"""
+
+    with bz2.open(filepath, "wb") as outfile:
+        for line in PysWriter(data_array):
+            outfile.write(line.encode("utf-8"))
+
+
+def state(data_array):
+    """Returns comparable content of data_array"""
+
+    return (data_array.shape, dict(data_array.dict_grid.items()),
+            list(data_array.cell_attributes), dict(data_array.row_heights),
+            dict(data_array.col_widths), data_array.macros)
+
+
+def edit(data_array, step):
+    """Changes all parts of data_array that are recorded"""
+
+    data_array[step, 1, 0] = repr(step)
+    data_array[step, 2, 1] = "'text'"
+    data_array[step, 4, 0] = "None"
+    data_array.pop((step, 4, 0))
+    data_array.insert(1, 2, 0, 0)
+    data_array.delete(0, 1, 1, 1)
+    data_array.shape = (40 + step, 10, 2)
+    data_array.cell_attributes.append(
+        CellAttribute(Selection([], [], [], [], [(step, 1)]), 0,
+                      AttrDict([("bgcolor", (step, 0, 0))])))
+    data_array.set_row_height(step, 0, 30.0 + step)
+    data_array.set_col_width(1, 1, 50.0 + step)
+    data_array.macros += f"a{step} = {step}\n"
+
+
+@pytest.fixture
+def saved(tmp_path):
+    """Returns data array and path of its save file"""
+
+    data_array = DataArray((40, 10, 2), Settings())
+    for row in range(5):
+        data_array[row, 1, 0] = repr(row)
+        data_array[row, 3, 1] = repr(row * 2)
+    data_array.set_row_height(3, 0, 20.0)
+    data_array.macros = "x = 1\n"
+
+    filepath = tmp_path / "test.pys"
+    save(data_array, filepath)
+
+    return data_array, filepath
+
+
+def test_recover(saved):
+    """Replaying the journal reproduces the grid"""
+
+    data_array, filepath = saved
+
+    journal = Journal(filepath, KEY)
+    journal.attach(data_array)
+    journal.start()
+    assert not journal.flush() > journal.size
+
+    for step in range(3):
+        edit(data_array, step)
+        journal.flush()
+    data_array.cell_attributes.pop(0)
+    data_array.dict_grid.row_heights.clear()
+    journal.flush()
+    journal.close()
+
+    recovered = load(filepath)
+    journal = Journal(filepath, KEY)
+    assert journal.recoverable()
+    assert journal.recover(recovered)
+    assert state(recovered) == state(data_array)
+
+
+def test_recover_checkpoint(saved):
+    """Replaying a compacted journal reproduces the grid"""
+
+    data_array, filepath = saved
+
+    journal = Journal(filepath, KEY)
+    journal.attach(data_array)
+    journal.start()
+    edit(data_array, 0)
+    size = journal.flush()
+
+    filename, signature = journal.write_checkpoint(
+        PysWriter(data_array.snapshot()))
+    journal.finish_checkpoint(filename, signature)
+    assert journal.size < size
+
+    edit(data_array, 1)
+    journal.flush()
+    journal.close()
+
+    recovered = load(filepath)
+    assert Journal(filepath, KEY).recover(recovered)
+    assert state(recovered) == state(data_array)
+
+
+def test_recover_damaged(saved):
+    """Incomplete records are ignored and wrong signatures are reported"""
+
+    data_array, filepath = saved
+
+    journal = Journal(filepath, KEY)
+    journal.attach(data_array)
+    journal.start()
+    edit(data_array, 0)
+    journal.flush()
+    expected = state(data_array)
+    edit(data_array, 1)
+    journal.flush()
+    journal.close()
+
+    with open(journal.path, "rb") as infile:
+        lines = infile.readlines()
+    with open(journal.path, "wb") as outfile:
+        outfile.writelines(lines[:-1])
+        outfile.write(lines[-1][:-10])
+
+    recovered = load(filepath)
+    assert Journal(filepath, KEY).recover(recovered)
+    assert state(recovered) == expected
+
+    recovered = load(filepath)
+    assert not Journal(filepath, b"other key").recover(recovered)
+    assert state(recovered) == expected
+
+
+def test_recoverable(saved):
+    """Journals are only recovered for the save file they belong to"""
+
+    data_array, filepath = saved
+
+    journal = Journal(filepath, KEY)
+    assert not journal.recoverable()
+
+    journal.attach(data_array)
+    journal.start()
+    assert journal.recoverable()
+
+    data_array[0, 0, 0] = "1"
+    save(data_array, filepath)
+    assert not journal.recoverable()
+
+    journal.start()
+    assert journal.recoverable()
+
+    journal.discard()
+    assert not journal.path.exists()
+    assert data_array.dict_grid.journal is None
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+
+"""
+test_pysb
+=========
+
+Unit tests for pysb.py
+
+"""
+
+from io import BytesIO
+from os.path import abspath, dirname, join
+import sys
+
+import pytest
+
+pyspread_path = abspath(join(dirname(__file__) + "/../.."))
+sys.path.insert(0, pyspread_path)
+
+from interfaces.pysb import PysbReader, PysbWriter
+from model.model import CellAttribute, CodeArray, DataArray
+
+from lib.attrdict import AttrDict
+from lib.selection import Selection
+sys.path.pop(0)
+
+
+class Settings:
+    """Simulates settings class"""
+
+    compact_attributes_on_save = False
+    columnar_storage = False
+
+
+class ColumnarSettings(Settings):
+    """Simulates settings class with columnar storage"""
+
+    columnar_storage = True
+
+
+class CodeArraySettings(Settings):
+    """Simulates settings class for evaluating cells"""
+
+    timeout = 1000
+    parallel_recalculation = False
+    result_cache_size = 1024
+
+
+def write(data_array, chunk_size=4):
+    """Returns pysb file content of data_array"""
+
+    writer = PysbWriter(data_array)
+    writer.chunk_size = chunk_size
+    data = b"".join(writer)
+    assert writer.progress == len(writer) == len(data_array.dict_grid)
+    return data
+
+
+def read(pysb_file, settings=Settings()):
+    """Returns DataArray that is read from pysb_file"""
+
+    data_array = DataArray((1, 1, 1), settings)
+    for _ in PysbReader(pysb_file, data_array):
+        pass
+    return data_array
+
+
+@pytest.fixture
+def data_array():
+    """Returns DataArray with code in 3 tables"""
+
+    data_array = DataArray((100, 10, 3), Settings())
+    for row in range(20):
+        for column in range(3):
+            data_array[row, column, row % 3] = repr(row * column)
+    data_array[50, 9, 1] = "'Ünïcode' + '€'"
+    data_array.cell_attributes.append(
+        CellAttribute(Selection([], [], [], [], [(1, 1)]), 0,
+                      AttrDict([("bgcolor", (0, 0, 255))])))
+    data_array.row_heights[(3, 0)] = 40.0
+    data_array.col_widths[(2, 1)] = 80.0
+    data_array.macros = "a = 1\n"
+    return data_array
+
+
+@pytest.mark.parametrize("settings", [Settings(), ColumnarSettings()])
+def test_round_trip(data_array, settings):
+    """Written data is read back"""
+
+    loaded = read(BytesIO(write(data_array)), settings)
+
+    assert loaded.shape == data_array.shape
+    assert len(loaded.dict_grid) == len(data_array.dict_grid)
+    assert dict(loaded.dict_grid.items()) == \
+        dict(data_array.dict_grid.items())
+    assert list(loaded.cell_attributes) == list(data_array.cell_attributes)
+    assert loaded.row_heights == data_array.row_heights
+    assert loaded.col_widths == data_array.col_widths
+    assert loaded.macros == data_array.macros
+    assert loaded.dict_grid.loader is None
+
+
+def test_lazy_loading(data_array, tmp_path):
+    """Chunks are loaded on access"""
+
+    filepath = tmp_path / "test.pysb"
+    filepath.write_bytes(write(data_array))
+
+    with open(filepath, "rb") as pysb_file:
+        loaded = read(pysb_file)
+
+    dict_grid = loaded.dict_grid
+    assert dict_grid.loader.pending == len(dict_grid) == 61
+    assert dict.__len__(dict_grid) == 0
+
+    # Chunks have at least 4 cells, rows are not split
+    assert loaded[3, 1, 0] == "3"
+    assert dict.__len__(dict_grid) == 6
+    assert (0, 2, 0) in dict_grid
+    assert dict.__len__(dict_grid) == 6
+    assert (6, 2, 0) in dict_grid
+    assert dict.__len__(dict_grid) == 12
+    assert (8, 2, 0) not in dict_grid
+    assert dict_grid.get((50, 9, 1)) == "'Ünïcode' + '€'"
+    assert dict.__len__(dict_grid) == 16
+
+    # Changes in chunks that have not been loaded are kept
+    loaded[4, 1, 1] = "'changed'"
+    dict_grid.pop((7, 0, 1))
+    assert dict_grid.bbox(2) == (2, 0, 17, 2)
+
+    # Structural changes load all cells
+    loaded.insert(0, 1, 0, None)
+    assert dict_grid.loader is None
+    assert len(dict_grid) == dict.__len__(dict_grid) == 60
+    assert loaded[5, 1, 1] == "'changed'"
+    assert (8, 0, 1) not in dict_grid
+
+
+def test_execute_macros(data_array):
+    """Only cells that may assign globals are loaded for executing macros"""
+
+    data_array[50, 0, 2] = "answer = 42"
+    data = write(data_array)
+
+    code_array = CodeArray((1, 1, 1), CodeArraySettings())
+    for _ in PysbReader(BytesIO(data), code_array):
+        pass
+
+    dict_grid = code_array.dict_grid
+    assert dict_grid.loader.global_keys == [(50, 0, 2)]
+
+    code_array.execute_macros()
+
+    assert dict_grid.loaded_keys() == [(50, 0, 2)]
+    assert dict_grid.loader.pending == 61
+
+    loaded_keys = []
+    dict_grid.on_load = loaded_keys.extend
+    code_array[1, 0, 0] = "answer"
+
+    assert code_array[1, 0, 0] == 42
+    assert (3, 1, 0) in loaded_keys
+    assert dict_grid.loader.pending == 55
+
+
+def test_execute_macros_no_globals_section(data_array):
+    """Files without globals section are loaded for executing macros"""
+
+    data_array.macros = ""
+    data = write(data_array)
+
+    code_array = CodeArray((1, 1, 1), CodeArraySettings())
+    for _ in PysbReader(BytesIO(data.replace(b"globals", b"ignored")),
+                        code_array):
+        pass
+
+    assert code_array.dict_grid.loader.global_keys is None
+
+    code_array.execute_macros()
+
+    assert code_array.dict_grid.loader is None
+
+
+def test_journal(data_array):
+    """Loaded cells are not journaled"""
+
+    loaded = read(BytesIO(write(data_array)))
+    loaded.dict_grid.journal = []
+
+    loaded[0, 0, 0] = "1"
+    list(loaded.dict_grid.keys())
+
+    assert loaded.dict_grid.journal == [("set", (0, 0, 0), "1")]
+
+
+def test_empty():
+    """Grids without cells are written and read"""
+
+    data_array = DataArray((10, 10, 1), Settings())
+
+    loaded = read(BytesIO(write(data_array)))
+
+    assert loaded.shape == (10, 10, 1)
+    assert not loaded.dict_grid
+    assert loaded.dict_grid.loader is None
+
+
+@pytest.mark.parametrize("data", [b"", b"[shape]\n1\t1\t1\n",
+                                  b"PYSB\r\n\x1a\n" * 5])
+def test_invalid(data):
+    """Files that are no pysb files raise ValueError"""
+
+    with pytest.raises(ValueError):
+        read(BytesIO(data))
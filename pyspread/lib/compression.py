@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Streaming bz2 compression for save files
+
+With one thread, all data is compressed into a single bz2 stream. With
+more threads, data is split into blocks that are compressed in parallel
+into independent bz2 streams. The streams are written in order, so that
+the file can be read with `bz2.open` and `bz2.decompress`, which support
+multiple streams. The bz2 module releases the GIL while compressing.
+
+**Provides**
+
+ * :class:`Bz2Writer` - Binary file wrapper that compresses written data
+
+"""
+
+import bz2
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO
+
+
+class Bz2Writer:
+    """Writes bz2 compressed data to a binary file
+
+    Data is buffered until `buffer_size` bytes are collected in the single
+    stream mode or until `block_size` bytes are collected in the parallel
+    mode. At most two blocks per thread are compressed or waiting to be
+    written at any time.
+
+    The file is not closed by :meth:`close`.
+
+    """
+
+    buffer_size = 2**16
+    block_size = 900 * 1024  # Size of a bz2 block at compression level 9
+
+    def __init__(self, file: BinaryIO, threads: int = 1,
+                 compresslevel: int = 9):
+        """
+        :param file: Binary file that compressed data is written to
+        :param threads: Number of compression threads, 1: single stream
+        :param compresslevel: bz2 compression level from 1 to 9
+
+        """
+
+        self.file = file
+        self.threads = max(threads, 1)
+        self.compresslevel = compresslevel
+
+        self._buffer = []
+        self._buffered = 0  # Number of bytes in _buffer
+
+        if self.threads > 1:
+            self._compressor = None
+            self._executor = ThreadPoolExecutor(self.threads)
+            self._pending = deque()  # Futures of compressed blocks
+        else:
+            self._compressor = bz2.BZ2Compressor(compresslevel)
+            self._executor = None
+
+    def __enter__(self) -> "Bz2Writer":
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, data: bytes):
+        """Compresses data and writes it to file
+
+        :param data: Uncompressed data
+
+        """
+
+        self._buffer.append(data)
+        self._buffered += len(data)
+
+        if self._compressor is None:
+            if self._buffered >= self.block_size:
+                self._submit()
+        elif self._buffered >= self.buffer_size:
+            self.file.write(self._compressor.compress(self._pop_buffer()))
+
+    def _pop_buffer(self) -> bytes:
+        """Returns and empties buffered data"""
+
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        self._buffered = 0
+        return data
+
+    def _submit(self):
+        """Compresses buffered data in blocks in the thread pool"""
+
+        data = self._pop_buffer()
+
+        for start in range(0, len(data), self.block_size):
+            block = data[start:start + self.block_size]
+            self._pending.append(self._executor.submit(
+                bz2.compress, block, self.compresslevel))
+
+            while len(self._pending) > 2 * self.threads:
+                self.file.write(self._pending.popleft().result())
+
+    def close(self):
+        """Writes remaining data and ends compression"""
+
+        if self._compressor is None:
+            if self._executor is None:
+                return
+            if self._buffered:
+                self._submit()
+            while self._pending:
+                self.file.write(self._pending.popleft().result())
+            self._executor.shutdown()
+            self._executor = None
+
+        else:
+            self.file.write(self._compressor.compress(self._pop_buffer()))
+            self.file.write(self._compressor.flush())
+            self._compressor = None
+
+    def abort(self):
+        """Discards remaining data and stops compression threads"""
+
+        self._buffer.clear()
+        self._buffered = 0
+        self._compressor = None
+
+        if self._executor is not None:
+            for future in self._pending:
+                future.cancel()
+            self._pending.clear()
+            self._executor.shutdown()
+            self._executor = None
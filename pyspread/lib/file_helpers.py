@@ -31,6 +31,7 @@
 
 from contextlib import contextmanager
 from functools import partial
+import os
 from typing import BinaryIO, ContextManager, Generator, IO, Tuple
 
 from PyQt6.QtCore import Qt
@@ -85,29 +86,38 @@ def linecount(infile: BinaryIO, buffer_size: int = 1024*1024) -> int:
 
 
 def file_progress_gen(main_window, file: IO, title: str, label: str,
-                      no_lines: int, step: int = 100) \
+                      raw_file: BinaryIO, step: int = 100) \
                       -> Generator[Tuple[int, str], None, None]:
     """A generator for file iteration that displays a progress bar
 
     Yields (line number, line string).
     Return value on user cancel via progress dialog is current line number
 
+    Progress is the read position in raw_file, the file on disk that file
+    reads from, e.g. compressed data. Therefore, the file is not read in
+    advance for counting lines.
+
     :param main_window: Application main window
     :param file: File to be iterater over
     :param title: Progress dialog title
     :param label: Progress dialog label
-    :param no_lines: Number of lines that are remaining in file
+    :param raw_file: Binary file on disk that file reads from
     :param step: Number of lines per progress bar update
 
     """
 
-    with progress_dialog(main_window, title, label, no_lines) as progress_dlg:
+    size = max(os.fstat(raw_file.fileno()).st_size, 1)
+    steps = 1000
+
+    with progress_dialog(main_window, title, label, steps) as progress_dlg:
         try:
             for i, line in enumerate(file):
                 yield i, line
 
                 if not i % step:
-                    progress_dlg.setValue(i)
+                    # Maximum would close the dialog
+                    progress = raw_file.tell() * steps // size
+                    progress_dlg.setValue(min(progress, steps - 1))
                     QApplication.instance().processEvents()
                     if progress_dlg.wasCanceled():
                         msg = "File operation canceled at line {}.".format(i)
@@ -26,11 +26,16 @@ Grid selection representation
 **Provides**
 
 * :class:`Selection`: Represents grid selection independently from PyQt
+* :class:`CompiledSelection`: Selection with fast membership and iteration
 
 """
 
+from bisect import bisect_right
 from builtins import zip, range, object
-from typing import Generator, List, Tuple
+from math import inf
+from typing import Collection, Generator, List, Tuple
+
+import numpy
 
 
 class Selection:
@@ -615,6 +620,18 @@ class Selection:
         return len(self.cells) == 1 and not any((self.block_tl, self.block_br,
                                                  self.rows, self.columns))
 
+    def compile(self):
+        """Returns compiled selection for many membership checks
+
+        The compiled selection does not follow later changes of self.
+
+        :return: Compiled selection
+        :rtype: CompiledSelection
+
+        """
+
+        return CompiledSelection(self)
+
     def cell_generator(self, shape, table=None) -> Generator:
         """Returns a generator of cell key tuples
 
@@ -625,16 +642,179 @@ class Selection:
 
         """
 
+        return self.compile().cell_generator(shape, table)
+
+    def filled_cell_generator(self, keys: Collection[Tuple[int, int, int]],
+                              shape: Tuple[int, int, int],
+                              table: int) -> Generator:
+        """Returns a generator of selected keys that are in keys
+
+        :param keys: Keys of filled cells, e.g. a `DictGrid`
+        :param shape: Grid shape
+        :param table: Table of the returned keys
+
+        """
+
+        return self.compile().filled_cell_generator(keys, shape, table)
+
+
+class CompiledSelection:
+    """Selection with fast membership checks and cell iteration
+
+    Rows, columns and cells are stored in sets. Blocks are stored as
+    (top, left, bottom, right) sorted by top so that only blocks that start
+    above a row are checked. Cells are iterated row-wise via numpy masks.
+
+    """
+
+    mask_size = 2**20
+    """Maximum number of cells in a mask during cell iteration"""
+
+    def __init__(self, selection: Selection):
+        """
+        :param selection: Selection to be compiled
+
+        """
+
+        self.selection = selection
+
+        self.rows = set(selection.rows)
+        self.columns = set(selection.columns)
+        self.cells = set(map(tuple, selection.cells))
+
+        blocks = []
+        for (top, left), (bottom, right) in zip(selection.block_tl,
+                                                selection.block_br):
+            # None represents the grid border as in Selection.__contains__
+            blocks.append((0 if top is None else top,
+                           0 if left is None else left,
+                           inf if bottom is None else bottom,
+                           inf if right is None else right))
+        blocks.sort()
+
+        self.blocks = blocks
+        self._block_tops = [block[0] for block in blocks]
+
+    def __contains__(self, cell: Tuple[int, int]) -> bool:
+        """Check if cell is included in self
+
+        :param cell: Index of cell to be checked
+
+        """
+
+        row, column = cell
+
+        if row in self.rows or column in self.columns \
+           or (row, column) in self.cells:
+            return True
+
+        for _, left, bottom, right in \
+                self.blocks[:bisect_right(self._block_tops, row)]:
+            if row <= bottom and left <= column <= right:
+                return True
+
+        return False
+
+    def mask(self, top: int, left: int, bottom: int,
+             right: int) -> numpy.ndarray:
+        """Returns boolean array that is True for selected cells
+
+        :param top: Top row of the masked area
+        :param left: Left column of the masked area
+        :param bottom: Bottom row of the masked area
+        :param right: Right column of the masked area
+
+        """
+
+        mask = numpy.zeros((bottom - top + 1, right - left + 1), dtype=bool)
+
+        rows = [row - top for row in self.rows if top <= row <= bottom]
+        mask[rows, :] = True
+
+        columns = [column - left for column in self.columns
+                   if left <= column <= right]
+        mask[:, columns] = True
+
+        for block_top, block_left, block_bottom, block_right in \
+                self.blocks[:bisect_right(self._block_tops, bottom)]:
+            if block_bottom >= top and block_left <= right \
+               and block_right >= left:
+                mask[max(block_top, top) - top:
+                     min(block_bottom, bottom) - top + 1,
+                     max(block_left, left) - left:
+                     min(block_right, right) - left + 1] = True
+
+        cells = [(row - top, column - left) for row, column in self.cells
+                 if top <= row <= bottom and left <= column <= right]
+        if cells:
+            mask[tuple(zip(*cells))] = True
+
+        return mask
+
+    def cell_generator(self, shape: Tuple[int, int, int],
+                       table: int = None) -> Generator:
+        """Returns a generator of selected cell key tuples in row order
+
+        :param shape: Grid shape
+        :param table: Third component of each returned key
+
+        If table is None 2-tuples (row, column) are yielded else 3-tuples
+
+        """
+
         rows, columns, tables = shape
 
-        (top, left), (bottom, right) = self.get_grid_bbox(shape)
+        if table is not None and table >= tables:
+            return
+
+        (top, left), (bottom, right) = self.selection.get_grid_bbox(shape)
         bottom = min(bottom, rows - 1)
         right = min(right, columns - 1)
 
-        for row in range(top, bottom + 1):
-            for column in range(left, right + 1):
-                if (row, column) in self:
-                    if table is None:
-                        yield row, column
-                    elif table < tables:
-                        yield row, column, table
+        if top > bottom or left > right:
+            return
+
+        chunk_rows = max(1, self.mask_size // (right - left + 1))
+
+        for chunk_top in range(top, bottom + 1, chunk_rows):
+            chunk_bottom = min(chunk_top + chunk_rows - 1, bottom)
+            mask = self.mask(chunk_top, left, chunk_bottom, right)
+            for row, column in zip(*numpy.nonzero(mask)):
+                if table is None:
+                    yield int(row) + chunk_top, int(column) + left
+                else:
+                    yield int(row) + chunk_top, int(column) + left, table
+
+    def filled_cell_generator(self, keys: Collection[Tuple[int, int, int]],
+                              shape: Tuple[int, int, int],
+                              table: int) -> Generator:
+        """Returns a generator of selected keys that are in keys
+
+        Keys are yielded in row order. If there are fewer keys than cells in
+        the bounding box of the selection then the keys are iterated, else
+        the selected cells are.
+
+        :param keys: Keys of filled cells, e.g. a `DictGrid`
+        :param shape: Grid shape
+        :param table: Table of the returned keys
+
+        """
+
+        rows, columns, tables = shape
+
+        (top, left), (bottom, right) = self.selection.get_grid_bbox(shape)
+        bottom = min(bottom, rows - 1)
+        right = min(right, columns - 1)
+        size = max(0, bottom - top + 1) * max(0, right - left + 1)
+
+        if len(keys) < size:
+            yield from sorted(key for key in keys
+                              if key[2] == table
+                              and top <= key[0] <= bottom
+                              and left <= key[1] <= right
+                              and key[:2] in self)
+            return
+
+        for key in self.cell_generator(shape, table):
+            if key in keys:
+                yield key
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+
+"""
+test_compression
+================
+
+Unit tests for compression.py
+
+"""
+
+import bz2
+import io
+
+import pytest
+
+from ..compression import Bz2Writer
+
+LINES = [bytes(f"{i}\t0\t0\t'Line {i}' * {i % 7}\n", "utf-8")
+         for i in range(20000)]
+
+
+@pytest.mark.parametrize("threads", [1, 2, 4])
+def test_bz2writer(threads, monkeypatch):
+    """Unit test for Bz2Writer round trips"""
+
+    monkeypatch.setattr(Bz2Writer, "block_size", 10000)
+
+    data = b"".join(LINES)
+    file = io.BytesIO()
+    with Bz2Writer(file, threads) as writer:
+        for line in LINES:
+            writer.write(line)
+
+    assert bz2.decompress(file.getvalue()) == data
+
+    file.seek(0)
+    with bz2.open(file) as infile:
+        assert infile.read() == data
+
+
+def test_bz2writer_single_stream():
+    """Unit test for single stream output"""
+
+    data = b"".join(LINES)
+    file = io.BytesIO()
+    with Bz2Writer(file) as writer:
+        for line in LINES:
+            writer.write(line)
+
+    assert file.getvalue() == bz2.compress(data)
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_bz2writer_empty(threads):
+    """Unit test for Bz2Writer without data"""
+
+    file = io.BytesIO()
+    writer = Bz2Writer(file, threads)
+    writer.close()
+    writer.close()
+
+    assert bz2.decompress(file.getvalue()) == b""
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_bz2writer_abort(threads, monkeypatch):
+    """Unit test for Bz2Writer leaving a with block with an exception"""
+
+    monkeypatch.setattr(Bz2Writer, "block_size", 10000)
+
+    file = io.BytesIO()
+    with pytest.raises(OSError):
+        with Bz2Writer(file, threads) as writer:
+            for line in LINES:
+                writer.write(line)
+            size = len(file.getvalue())
+            raise OSError("Disk full")
+
+    assert len(file.getvalue()) == size
+    assert writer._executor is None
+    writer.close()
+    assert len(file.getvalue()) == size
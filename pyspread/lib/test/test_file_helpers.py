@@ -25,8 +25,13 @@
 
 """
 
+import bz2
+
 import pytest
-from ..file_helpers import linecount
+
+from PyQt6.QtWidgets import QApplication, QMainWindow
+
+from ..file_helpers import file_progress_gen, linecount
 
 
 param_test_linecount = [
@@ -47,3 +52,24 @@ def test_linecount(content, res, tmp_path):
     testfile_path.write_bytes(content)
     with open(testfile_path, "rb") as testfile:
         assert linecount(testfile) == res
+
+
+def test_file_progress_gen(tmp_path):
+    """Unit test for file_progress_gen"""
+
+    app = QApplication.instance() or QApplication([])
+    main_window = QMainWindow()
+
+    lines = [f"Line {i}\n".encode() for i in range(10000)]
+    testfile_path = tmp_path / "test.bz2"
+    testfile_path.write_bytes(bz2.compress(b"".join(lines)))
+
+    with open(testfile_path, "rb") as rawfile:
+        infile = bz2.open(rawfile)
+        progress = file_progress_gen(main_window, infile, "Title", "Label",
+                                     rawfile)
+        assert list(progress) == list(enumerate(lines))
+        assert rawfile.tell() == testfile_path.stat().st_size
+
+    main_window.deleteLater()
+    app.processEvents()
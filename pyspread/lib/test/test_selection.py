@@ -406,3 +406,68 @@ class TestSelection:
         """Unit test for cell_generator"""
 
         assert set(sel.cell_generator(shape, tab)) == res
+
+    param_test_filled_cell_generator = [
+        (Selection([], [], [], [3], []), {(2, 3, 0), (9, 3, 0), (2, 4, 0),
+                                          (5, 3, 1)},
+         [(2, 3, 0), (9, 3, 0)]),
+        (Selection([], [], [], [], [(2, 3)]), {(2, 3, 0), (9, 3, 0)},
+         [(2, 3, 0)]),
+        (Selection([(0, 0)], [(1000, 1000)], [], [], []), {(20, 3, 0)},
+         []),
+    ]
+
+    @pytest.mark.parametrize("sel, keys, res",
+                             param_test_filled_cell_generator)
+    def test_filled_cell_generator(self, sel, keys, res):
+        """Unit test for filled_cell_generator"""
+
+        shape = 10, 10, 2
+
+        assert list(sel.filled_cell_generator(keys, shape, 0)) == res
+
+
+class TestCompiledSelection:
+    """Unit tests for CompiledSelection"""
+
+    selections = [
+        Selection([], [], [], [], [(32, 53), (34, 56)]),
+        Selection([(1, 3), (5, 0)], [(2, 8), (9, 1)], [4], [7], [(0, 0)]),
+        Selection([(None, 2)], [(None, 3)], [], [], []),
+        Selection([(4, None)], [(5, None)], [2, 9], [], [(9, 9)]),
+    ]
+
+    @pytest.mark.parametrize("sel", selections)
+    def test_contains(self, sel):
+        """Compiled membership equals Selection.__contains__"""
+
+        compiled = sel.compile()
+
+        for row in range(40):
+            for column in range(60):
+                assert ((row, column) in compiled) == ((row, column) in sel)
+
+    @pytest.mark.parametrize("sel", selections)
+    def test_mask(self, sel):
+        """Unit test for mask"""
+
+        mask = sel.compile().mask(3, 2, 12, 9)
+
+        assert mask.shape == (10, 8)
+        for row in range(3, 13):
+            for column in range(2, 10):
+                assert mask[row - 3, column - 2] == ((row, column) in sel)
+
+    @pytest.mark.parametrize("sel", selections)
+    def test_cell_generator_chunks(self, sel):
+        """Cells are yielded in row order also across mask chunks"""
+
+        compiled = sel.compile()
+        compiled.mask_size = 7
+        shape = 40, 60, 1
+
+        cells = list(compiled.cell_generator(shape, 0))
+
+        assert cells == sorted(cells)
+        assert set(cells) == {(row, column, 0) for row in range(40)
+                              for column in range(60) if (row, column) in sel}
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+
+"""
+test_watchdog
+=============
+
+Unit tests for watchdog.py
+
+"""
+
+from threading import Thread
+from time import monotonic
+
+from ..watchdog import EvaluationTimeout, Watchdog
+
+
+def busy(watchdog, timeout):
+    """Loops until EvaluationTimeout and returns elapsed time"""
+
+    start = monotonic()
+    assert watchdog.arm(timeout)
+    try:
+        try:
+            while True:
+                sum(range(10))
+        finally:
+            watchdog.disarm()
+    except EvaluationTimeout:
+        return monotonic() - start
+
+
+def test_timeout():
+    """Unit test for sub-second timeout in main thread"""
+
+    watchdog = Watchdog()
+    assert 0.1 <= busy(watchdog, 0.1) < 1
+
+
+def test_timeout_thread():
+    """Unit test for timeout in worker thread"""
+
+    watchdog = Watchdog()
+    elapsed = []
+    thread = Thread(target=lambda: elapsed.append(busy(watchdog, 0.05)))
+    thread.start()
+    thread.join(5)
+
+    assert len(elapsed) == 1
+    assert 0.05 <= elapsed[0] < 1
+
+
+def test_arm_nested():
+    """Unit test for keeping the outermost deadline"""
+
+    watchdog = Watchdog()
+
+    assert watchdog.arm(10)
+    deadline = dict(watchdog.deadlines)
+    assert not watchdog.arm(1)
+    assert watchdog.deadlines == deadline
+
+    watchdog.disarm()
+    assert not watchdog.deadlines
+
+
+def test_batch():
+    """Unit test for evaluations that finish before the deadline"""
+
+    watchdog = Watchdog()
+
+    with watchdog.batch():
+        for _ in range(1000):
+            assert watchdog.arm(0.5)
+            watchdog.disarm()
+
+    assert not watchdog.deadlines
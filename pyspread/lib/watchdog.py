@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+# Copyright Martin Manns
+# Distributed under the terms of the GNU General Public License
+
+# --------------------------------------------------------------------
+# pyspread is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# pyspread is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pyspread.  If not, see <http://www.gnu.org/licenses/>.
+# --------------------------------------------------------------------
+
+"""
+
+Evaluation timeouts for any thread
+
+A single daemon thread per process watches the deadlines of all threads that
+evaluate code. When a deadline passes, :class:`EvaluationTimeout` is raised
+asynchronously in the thread that owns the deadline. In contrast to
+`signal.alarm`, this has sub-second resolution, works outside the main
+thread and in worker processes, and arming a deadline requires no system
+call.
+
+As with `signal.alarm`, long running C code such as `2**99999999999999` is
+not interrupted because the exception is raised between bytecodes.
+
+**Provides**
+
+ * :class:`EvaluationTimeout` - Exception that is raised on timeout
+ * :class:`Watchdog` - Deadline watcher thread
+
+"""
+
+from contextlib import contextmanager
+import ctypes
+import os
+import threading
+from time import monotonic, sleep
+
+# Idents of threads in which an asynchronous EvaluationTimeout has been raised
+_delivered = set()
+
+
+class EvaluationTimeout(RuntimeError):
+    """Raised in a thread that has exceeded its deadline
+
+    The exception is instantiated in the thread when it is raised, which
+    marks the asynchronous exception of the thread as delivered.
+
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args or ("Evaluation timeout",))
+        _delivered.add(threading.get_ident())
+
+
+class Watchdog:
+    """Raises :class:`EvaluationTimeout` in threads that pass their deadline
+
+    Deadlines are set with :meth:`arm` and removed with :meth:`disarm`.
+    Nested arming in the same thread keeps the outermost deadline. The
+    watcher thread polls with :attr:`resolution` while deadlines or batches
+    are active and sleeps otherwise. Inside :meth:`batch`, it stays awake so
+    that arming a cell deadline is a plain dict assignment.
+
+    """
+
+    resolution = 0.01
+    """Polling interval in seconds while deadlines are active"""
+
+    def __init__(self):
+        self._init_state()
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._init_state)
+
+    def _init_state(self):
+        """Initializes locks and deadlines, also in forked processes"""
+
+        self.deadlines = {}  # thread ident: deadline
+        self._fired = set()  # Idents of threads that got an exception
+        self._batches = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _ensure_thread(self):
+        """Starts the watcher thread if it is not running and wakes it up
+
+        Must be called with the lock held.
+
+        """
+
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run,
+                                            name="pyspread-watchdog",
+                                            daemon=True)
+            self._thread.start()
+
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _run(self):
+        """Watcher thread main loop"""
+
+        while True:
+            if not self.deadlines and not self._batches:
+                self._wake.clear()
+                # Re-check after clearing to avoid missing a wake up
+                if not self.deadlines and not self._batches:
+                    self._wake.wait()
+
+            sleep(self.resolution)
+
+            now = monotonic()
+            for ident, deadline in list(self.deadlines.items()):
+                if deadline <= now:
+                    self._fire(ident, deadline)
+
+    def _fire(self, ident: int, deadline: float):
+        """Raises EvaluationTimeout in thread ident if deadline is current
+
+        :param ident: Thread identifier
+        :param deadline: Deadline that has passed
+
+        """
+
+        with self._lock:
+            if self.deadlines.get(ident) != deadline:
+                # Disarmed or re-armed meanwhile
+                return
+
+            del self.deadlines[ident]
+            self._fired.add(ident)
+            _delivered.discard(ident)
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                ctypes.c_ulong(ident), ctypes.py_object(EvaluationTimeout))
+
+    def arm(self, timeout: float) -> bool:
+        """Sets deadline for the calling thread
+
+        Returns False without changing the deadline if the calling thread
+        already has a deadline.
+
+        :param timeout: Time from now in seconds until deadline
+
+        """
+
+        ident = threading.get_ident()
+
+        if ident in self.deadlines:
+            return False
+
+        self.deadlines[ident] = monotonic() + timeout
+
+        if not self._wake.is_set():
+            with self._lock:
+                self._ensure_thread()
+
+        return True
+
+    def disarm(self):
+        """Removes deadline of the calling thread
+
+        A timeout exception that has not been raised yet is discarded.
+        Delivered exceptions are not touched because clearing an exception
+        that is no longer pending disturbs later tracing and profiling in
+        the thread.
+
+        """
+
+        ident = threading.get_ident()
+
+        with self._lock:
+            self.deadlines.pop(ident, None)
+
+            if ident in self._fired:
+                self._fired.discard(ident)
+                if ident in _delivered:
+                    _delivered.discard(ident)
+                else:
+                    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                        ctypes.c_ulong(ident), None)
+
+    @contextmanager
+    def batch(self):
+        """Keeps the watcher thread awake while evaluating many cells"""
+
+        with self._lock:
+            self._batches += 1
+            self._ensure_thread()
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batches -= 1
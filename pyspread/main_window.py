@@ -66,7 +66,7 @@ try:
                                   PrintAreaDialog, PrintPreviewDialog)
     from pyspread.installer import DependenciesDialog
     from pyspread.interfaces.pys import qt62qt5_fontweights
-    from pyspread.panels import MacroPanel
+    from pyspread.panels import MacroPanel, ProfilerPanel
     from pyspread.lib.hashing import genkey
     from pyspread.model.model import CellAttributes
 except ImportError:
@@ -85,7 +85,7 @@ except ImportError:
                          TutorialDialog, PrintAreaDialog, PrintPreviewDialog)
     from installer import DependenciesDialog
     from interfaces.pys import qt62qt5_fontweights
-    from panels import MacroPanel
+    from panels import MacroPanel, ProfilerPanel
     from lib.hashing import genkey
     from model.model import CellAttributes
 
@@ -238,6 +238,8 @@ class MainWindow(QMainWindow):
 
         self.macro_panel = MacroPanel(self, self.grid.model.code_array)
 
+        self.profiler_panel = ProfilerPanel(self, self.grid.model.code_array)
+
         self.main_panel = QWidget(self)
 
         self.entry_line_dock = QDockWidget("Entry Line", self)
@@ -254,11 +256,19 @@ class MainWindow(QMainWindow):
         self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea,
                            self.macro_dock)
 
+        self.profiler_dock = QDockWidget("Profiler", self)
+        self.profiler_dock.setObjectName("Profiler Panel")
+        self.profiler_dock.setWidget(self.profiler_panel)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea,
+                           self.profiler_dock)
+        self.profiler_dock.hide()
+
         self.central_layout = QVBoxLayout(self.main_panel)
         self._layout()
 
         self.entry_line_dock.installEventFilter(self)
         self.macro_dock.installEventFilter(self)
+        self.profiler_dock.installEventFilter(self)
 
         QApplication.instance().focusChanged.connect(self.on_focus_changed)
         self.gui_update.connect(self.on_gui_update)
@@ -310,6 +320,9 @@ class MainWindow(QMainWindow):
                                                             QDockWidget):
             if source.windowTitle() == "Macros":
                 self.main_window_actions.toggle_macro_dock.setChecked(False)
+            elif source.windowTitle() == "Profiler":
+                self.main_window_actions.toggle_profiler_dock.setChecked(
+                    False)
             elif source.windowTitle() == "Entry Line":
                 self.main_window_actions.toggle_entry_line_dock.setChecked(
                     False)
@@ -353,6 +366,9 @@ class MainWindow(QMainWindow):
         macrodock_visible = self.macro_dock.isVisibleTo(self)
         actions.toggle_macro_dock.setChecked(macrodock_visible)
 
+        profilerdock_visible = self.profiler_dock.isVisibleTo(self)
+        actions.toggle_profiler_dock.setChecked(profilerdock_visible)
+
     @property
     def focused_grid(self):
         """Returns grid with focus or self if none has focus"""
@@ -661,6 +677,18 @@ class MainWindow(QMainWindow):
 
         self._toggle_widget(self.macro_dock, "toggle_macro_dock", toggled)
 
+    def on_toggle_profiler_dock(self, toggled: bool):
+        """Profiler panel toggle event handler
+
+        :param toggled: Toggle state
+
+        """
+
+        self._toggle_widget(self.profiler_dock, "toggle_profiler_dock",
+                            toggled)
+        if toggled:
+            self.profiler_panel.update()
+
     def on_manual(self):
         """Show manual browser"""
 
@@ -805,3 +833,6 @@ class MainWindow(QMainWindow):
             attributes.merge_area is not None)
         self.main_window_toolbar_actions.merge_cells.setChecked(
             attributes.merge_area is not None)
+
+        self.main_window_actions.spill_cells.setChecked(
+            attributes.spill_shape is not None)
@@ -233,6 +233,7 @@ class ViewMenu(QMenu):
 
         self.addAction(actions.toggle_entry_line_dock)
         self.addAction(actions.toggle_macro_dock)
+        self.addAction(actions.toggle_profiler_dock)
         self.addSeparator()
         self.addAction(actions.goto_cell)
         self.addSeparator()
@@ -262,6 +263,7 @@ class FormatMenu(QMenu):
 
         self.addAction(actions.copy_format)
         self.addAction(actions.paste_format)
+        self.addAction(actions.compact_format)
         self.addSeparator()
         self.addAction(actions.font)
         self.addAction(actions.bold)
@@ -284,6 +286,7 @@ class FormatMenu(QMenu):
         self.addSeparator()
 
         self.addAction(actions.merge_cells)
+        self.addAction(actions.spill_cells)
 
         self.addSeparator()
 
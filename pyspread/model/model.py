@@ -33,11 +33,22 @@ into the following layers.
 
  * :class:`DefaultCellAttributeDict`
  * :class:`CellAttribute`
+ * :class:`CellAttributeIndex`
+ * :class:`MergeAreaIndex`
  * :class:`CellAttributes`
  * :class:`KeyValueStore`
+ * :class:`NumericColumn`
+ * :class:`ColumnStore`
+ * :class:`AxisMap`
  * :class:`DictGrid`
  * :class:`DataArray`
+ * :class:`DependencyGraph`
+ * :class:`CellEnvironment`
+ * :class:`ResultCache`
+ * :class:`CellProfile`
+ * :class:`EvaluationProfiler`
  * :class:`CodeArray`
+ * :class:`WorkerCodeArray`
 
 """
 
@@ -49,22 +60,34 @@ from builtins import range
 
 import ast
 import base64
+from bisect import bisect_left, bisect_right, insort
 import bz2
-from collections import defaultdict
+import cProfile
+from collections import defaultdict, OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from copy import copy
+import csv
 import datetime
 import decimal
 from decimal import Decimal  # Needed
+from functools import lru_cache
 from importlib import reload
 from inspect import isgenerator
 import io
-from itertools import product
+from itertools import chain, count, groupby, product
+import json
+from math import inf, isfinite
+import multiprocessing
+import pickle
+import pstats
 import re
-import signal
 import sys
+from time import perf_counter
 from traceback import print_exception
 from typing import (
-        Any, Dict, Iterable, List, NamedTuple, Sequence, Tuple, Union)
+        Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence,
+        TextIO, Tuple, Union)
 
 import numpy
 
@@ -88,6 +111,7 @@ try:
     from pyspread.lib.typechecks import is_stringlike
     from pyspread.lib.selection import Selection
     from pyspread.lib.string_helpers import ZEN
+    from pyspread.lib.watchdog import EvaluationTimeout, Watchdog
 except ImportError:
     from settings import Settings
     from lib.attrdict import AttrDict
@@ -96,6 +120,7 @@ except ImportError:
     from lib.typechecks import is_stringlike
     from lib.selection import Selection
     from lib.string_helpers import ZEN
+    from lib.watchdog import EvaluationTimeout, Watchdog
 
 
 class DefaultCellAttributeDict(AttrDict):
@@ -122,6 +147,7 @@ class DefaultCellAttributeDict(AttrDict):
         self.justification = "justify_left"
         self.frozen = False
         self.merge_area = None
+        self.spill_shape = None
         self.renderer = "text"
         self.button_cell = False
         self.panel_cell = False
@@ -135,6 +161,236 @@ class CellAttribute(NamedTuple):
     attr: AttrDict
 
 
+class CellAttributeIndex:
+    """Spatial index of the selections of the cell attributes of one table
+
+    Layers are numbered in the order in which they are appended. The index
+    maps cells, rows and columns directly to layers. Blocks are stored in
+    buckets of `bucket_size` rows and columns. Blocks that cover too many
+    buckets are checked individually.
+
+    """
+
+    bucket_size = 64
+    max_buckets = 256
+
+    def __init__(self, selections: Iterable[Selection] = ()):
+        """
+        :param selections: Selections of layers in append order
+
+        """
+
+        self.cells = defaultdict(list)  # (row, column): layers
+        self.rows = defaultdict(list)  # row: layers
+        self.columns = defaultdict(list)  # column: layers
+        self.buckets = defaultdict(list)  # (row, column) bucket: blocks
+        self.large_blocks = []  # Blocks that are not in buckets
+
+        self.size = 0  # Number of layers
+
+        for selection in selections:
+            self.add(selection)
+
+    def add(self, selection: Selection):
+        """Adds selection as next layer
+
+        :param selection: Selection of the new layer
+
+        """
+
+        layer = self.size
+        self.size += 1
+
+        for cell in selection.cells:
+            self.cells[tuple(cell)].append(layer)
+        for row in selection.rows:
+            self.rows[row].append(layer)
+        for column in selection.columns:
+            self.columns[column].append(layer)
+
+        bucket_size = self.bucket_size
+
+        for (top, left), (bottom, right) in zip(selection.block_tl,
+                                                selection.block_br):
+            # None represents the grid border as in Selection.__contains__
+            top = 0 if top is None else top
+            left = 0 if left is None else left
+            bottom = inf if bottom is None else bottom
+            right = inf if right is None else right
+
+            block = top, left, bottom, right, layer
+
+            if bottom == inf or right == inf:
+                self.large_blocks.append(block)
+                continue
+
+            row_buckets = range(top // bucket_size, bottom // bucket_size + 1)
+            col_buckets = range(left // bucket_size,
+                                right // bucket_size + 1)
+
+            if len(row_buckets) * len(col_buckets) > self.max_buckets:
+                self.large_blocks.append(block)
+                continue
+
+            for bucket in product(row_buckets, col_buckets):
+                self.buckets[bucket].append(block)
+
+    def layers(self, row: int, column: int) -> List[int]:
+        """Returns layers whose selections contain the cell in append order
+
+        :param row: Row of cell
+        :param column: Column of cell
+
+        """
+
+        layers = set(self.cells.get((row, column), ()))
+        layers.update(self.rows.get(row, ()))
+        layers.update(self.columns.get(column, ()))
+
+        bucket = row // self.bucket_size, column // self.bucket_size
+
+        for blocks in self.buckets.get(bucket, ()), self.large_blocks:
+            for top, left, bottom, right, layer in blocks:
+                if top <= row <= bottom and left <= column <= right:
+                    layers.add(layer)
+
+        return sorted(layers)
+
+# End of class CellAttributeIndex
+
+
+class MergeAreaIndex:
+    """Spatial index of the merge areas of all tables
+
+    Merge areas are numbered in the order in which they are added. They are
+    stored in buckets of `bucket_size` rows and columns for each table.
+    Merge areas that cover too many buckets are checked individually.
+
+    """
+
+    bucket_size = 64
+    max_buckets = 256
+
+    def __init__(self, cell_attributes: Iterable[CellAttribute] = ()):
+        """
+        :param cell_attributes: Cell attributes in append order
+
+        """
+
+        self.areas = defaultdict(dict)  # table: {number: merge area}
+        self.buckets = defaultdict(list)  # (table, row, column) bucket: areas
+        self.large_areas = defaultdict(list)  # table: areas not in buckets
+
+        self._numbers = count()
+
+        for _, table, attr in cell_attributes:
+            merge_area = attr.get("merge_area")
+            if merge_area is not None:
+                self.add(table, merge_area)
+
+    def _buckets(self, table: int, merge_area: Tuple[int, int, int, int]
+                 ) -> Optional[List[Tuple[int, int, int]]]:
+        """Returns buckets of merge_area or None if there are too many
+
+        :param table: Table of the merge area
+        :param merge_area: Merge area (top, left, bottom, right)
+
+        """
+
+        top, left, bottom, right = merge_area
+        bucket_size = self.bucket_size
+
+        row_buckets = range(top // bucket_size, bottom // bucket_size + 1)
+        col_buckets = range(left // bucket_size, right // bucket_size + 1)
+
+        if len(row_buckets) * len(col_buckets) > self.max_buckets:
+            return
+
+        return [(table, row, column)
+                for row, column in product(row_buckets, col_buckets)]
+
+    def add(self, table: int, merge_area: Tuple[int, int, int, int]):
+        """Adds merge area
+
+        :param table: Table of the merge area
+        :param merge_area: Merge area (top, left, bottom, right)
+
+        """
+
+        number = next(self._numbers)
+        self.areas[table][number] = merge_area
+
+        entry = number, merge_area
+        buckets = self._buckets(table, merge_area)
+        if buckets is None:
+            self.large_areas[table].append(entry)
+        else:
+            for bucket in buckets:
+                self.buckets[bucket].append(entry)
+
+    def remove(self, table: int, merge_area: Tuple[int, int, int, int]):
+        """Removes the most recently added equal merge area
+
+        :param table: Table of the merge area
+        :param merge_area: Merge area (top, left, bottom, right)
+
+        """
+
+        areas = self.areas[table]
+        for number in reversed(areas):
+            if areas[number] == merge_area:
+                break
+        else:
+            return
+
+        del areas[number]
+
+        entry = number, merge_area
+        buckets = self._buckets(table, merge_area)
+        if buckets is None:
+            self.large_areas[table].remove(entry)
+        else:
+            for bucket in buckets:
+                self.buckets[bucket].remove(entry)
+                if not self.buckets[bucket]:
+                    del self.buckets[bucket]
+
+    def get(self, row: int, column: int,
+            table: int) -> Optional[Tuple[int, int, int, int]]:
+        """Returns first added merge area that contains the cell or None
+
+        :param row: Row of cell
+        :param column: Column of cell
+        :param table: Table of cell
+
+        """
+
+        bucket = table, row // self.bucket_size, column // self.bucket_size
+
+        result = None
+        for entries in self.buckets.get(bucket, ()), \
+                self.large_areas.get(table, ()):
+            for number, (top, left, bottom, right) in entries:
+                if top <= row <= bottom and left <= column <= right:
+                    if result is None or number < result[0]:
+                        result = number, (top, left, bottom, right)
+                    break  # Entries are in order
+
+        if result is not None:
+            return result[1]
+
+    def merge_areas(self, table: int) -> List[Tuple[int, int, int, int]]:
+        """Returns merge areas of table in the order in which they are added
+
+        :param table: Table of the merge areas
+
+        """
+
+        return list(self.areas.get(table, {}).values())
+
+# End of class MergeAreaIndex
+
+
 class CellAttributes(list):
     """Stores cell formatting attributes in a list of CellAttribute instances
 
@@ -151,12 +407,35 @@ class CellAttributes(list):
 
     """
 
+    attr_cache_size = 2**16
+    """Maximum number of cells in the attribute cache"""
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+        # Mutation counter, incremented by each change of the layers
+        self._generation = 0
+
+        # Generation for which _table_cache and _index_cache are built
+        self._cache_generation = -1
+
+        # Maps key to attr_dict
+        self._attr_cache = AttrDict()
+
+        # Maps table to list of (selection, attr) layers
+        self._table_cache = {}
+
+        # Maps table to CellAttributeIndex of the layers in _table_cache
+        self._index_cache = {}
+
+        # Generation and spill areas by table
+        self._spill_cache = None
+
+        # MergeAreaIndex that is kept up to date or None if it is outdated
+        self._merge_index = None
+
         self.__add__ = None
         self.__delattr__ = None
-        self.__delitem__ = None
         self.__delslice__ = None
         self.__iadd__ = None
         self.__imul__ = None
@@ -168,13 +447,31 @@ class CellAttributes(list):
         self.reverse = None
         self.sort = None
 
-    # Cache for __getattr__ maps key to tuple of len and attr_dict
+    def __reduce__(self) -> tuple:
+        """Pickles and copies layers without caches"""
 
-    _attr_cache = AttrDict()
-    _table_cache = {}
+        return self.__class__, (list(self),)
+
+    @property
+    def generation(self) -> int:
+        """Mutation counter that changes whenever layers change"""
+
+        return self._generation
+
+    def _clear_caches(self):
+        """Increments generation and clears all caches"""
+
+        self._generation += 1
+        self._attr_cache.clear()
+        self._table_cache.clear()
+        self._index_cache.clear()
+        self._spill_cache = None
 
     def append(self, cell_attribute: CellAttribute):
-        """append that clears caches
+        """append that updates caches
+
+        If the caches are up to date then only the cells in the selection of
+        the appended layer are invalidated.
 
         :param cell_attribute: Cell attribute to be appended
 
@@ -195,13 +492,86 @@ class CellAttributes(list):
                         self.pop(-1 - i)
                     except IndexError:
                         pass
-            if attr["merge_area"] is not None:
-                super().append(cell_attribute)
+            if attr["merge_area"] is None:
+                return
+
+        super().append(cell_attribute)
+
+        if self._merge_index is not None \
+           and attr.get("merge_area") is not None:
+            self._merge_index.add(table, attr["merge_area"])
+
+        generation = self._generation
+        self._generation += 1
+
+        if self._cache_generation == generation:
+            self._append_to_caches(cell_attribute)
         else:
-            super().append(cell_attribute)
+            self._attr_cache.clear()
 
-        self._attr_cache.clear()
-        self._table_cache.clear()
+        if "spill_shape" in attr:
+            self._spill_cache = None
+        elif self._spill_cache is not None \
+                and self._spill_cache[0] == generation:
+            self._spill_cache = self._generation, self._spill_cache[1]
+
+    def _append_to_caches(self, cell_attribute: CellAttribute):
+        """Adds a layer to up to date caches
+
+        :param cell_attribute: Cell attribute that has been appended
+
+        """
+
+        selection, table, attr = cell_attribute
+
+        self._table_cache.setdefault(table, []).append((selection, attr))
+        if table in self._index_cache:
+            self._index_cache[table].add(selection)
+
+        if not (selection.block_tl or selection.rows or selection.columns) \
+           and len(selection.cells) < len(self._attr_cache):
+            for row, column in selection.cells:
+                self._attr_cache.pop((row, column, table), None)
+        else:
+            for key in [key for key in self._attr_cache
+                        if key[2] == table and key[:2] in selection]:
+                del self._attr_cache[key]
+
+        self._cache_generation = self._generation
+
+    def pop(self, *args) -> CellAttribute:
+        """pop that clears caches
+
+        :param args: Optional index of the layer to be removed
+
+        """
+
+        cell_attribute = super().pop(*args)
+
+        _, table, attr = cell_attribute
+        if self._merge_index is not None \
+           and attr.get("merge_area") is not None:
+            self._merge_index.remove(table, attr["merge_area"])
+
+        self._clear_caches()
+        return cell_attribute
+
+    def clear(self):
+        """clear that clears caches"""
+
+        super().clear()
+        self._merge_index = None
+        self._clear_caches()
+
+    def extend(self, cell_attributes: Iterable[CellAttribute]):
+        """extend that updates caches
+
+        :param cell_attributes: Cell attributes to be appended
+
+        """
+
+        for cell_attribute in cell_attributes:
+            self.append(cell_attribute)
 
     def __getitem__(self, key: Tuple[int, int, int]) -> AttrDict:
         """Returns attribute dict for a single key
@@ -214,52 +584,80 @@ class CellAttributes(list):
 #            raise Warning("slice in key {}".format(key))
 #            return
 
-        try:
-            cache_len, cache_dict = self._attr_cache[key]
+        # Update table cache if it is outdated (e.g. when creating a new grid)
+        if self._cache_generation != self._generation:
+            self._update_table_cache()
 
-            # Use cache result only if no new attrs have been defined
-            if cache_len == len(self):
-                return cache_dict
+        try:
+            return self._attr_cache[key]
         except KeyError:
             pass
 
-        # Update table cache if it is outdated (e.g. when creating a new grid)
-        if len(self) != self._len_table_cache():
-            self._update_table_cache()
-
         row, col, tab = key
 
         result_dict = DefaultCellAttributeDict()
 
         try:
-            for selection, attr_dict in self._table_cache[tab]:
-                if (row, col) in selection:
-                    result_dict.update(attr_dict)
+            table_layers = self._table_cache[tab]
         except KeyError:
-            pass
+            table_layers = []
 
-        # Upddate cache with current length and dict
-        self._attr_cache[key] = (len(self), result_dict)
+        if table_layers:
+            try:
+                index = self._index_cache[tab]
+            except KeyError:
+                index = self._index_cache[tab] = CellAttributeIndex(
+                    selection for selection, _ in table_layers)
+
+            for layer in index.layers(row, col):
+                result_dict.update(table_layers[layer][1])
+
+        # Bound the cache by dropping its oldest entry
+        if len(self._attr_cache) >= self.attr_cache_size:
+            del self._attr_cache[next(iter(self._attr_cache))]
+
+        self._attr_cache[key] = result_dict
 
         return result_dict
 
-    def __setitem__(self, index: int, cell_attribute: CellAttribute):
+    def __setitem__(self, index: Union[int, slice],
+                    cell_attribute: Union[CellAttribute,
+                                          Iterable[CellAttribute]]):
         """__setitem__ that clears caches
 
-        :param index: Index of item in self
-        :param cell_attribute: Cell attribute to be set
+        :param index: Index of item in self or slice
+        :param cell_attribute: Cell attribute or cell attributes for slice
 
         """
 
-        if not isinstance(cell_attribute, CellAttribute):
-            msg = "{} not instance of CellAttribute".format(cell_attribute)
-            raise Warning(msg)
-            return
+        if isinstance(index, slice):
+            cell_attribute = list(cell_attribute)
+            cell_attributes = cell_attribute
+        else:
+            cell_attributes = [cell_attribute]
+
+        for ele in cell_attributes:
+            if not isinstance(ele, CellAttribute):
+                msg = "{} not instance of CellAttribute".format(ele)
+                raise Warning(msg)
+                return
 
         super().__setitem__(index, cell_attribute)
 
-        self._attr_cache.clear()
-        self._table_cache.clear()
+        self._merge_index = None
+        self._clear_caches()
+
+    def __delitem__(self, index: Union[int, slice]):
+        """__delitem__ that clears caches
+
+        :param index: Index of item in self or slice
+
+        """
+
+        super().__delitem__(index)
+
+        self._merge_index = None
+        self._clear_caches()
 
     def _len_table_cache(self) -> int:
         """Returns the length of the table cache"""
@@ -274,7 +672,9 @@ class CellAttributes(list):
     def _update_table_cache(self):
         """Clears and updates the table cache to be in sync with self"""
 
+        self._attr_cache.clear()
         self._table_cache.clear()
+        self._index_cache.clear()
         for sel, tab, val in self:
             try:
                 self._table_cache[tab].append((sel, val))
@@ -284,6 +684,8 @@ class CellAttributes(list):
         if len(self) != self._len_table_cache():
             raise Warning("Length of _table_cache does not match")
 
+        self._cache_generation = self._generation
+
     def get_merging_cell(self,
                          key: Tuple[int, int, int]) -> Tuple[int, int, int]:
         """Returns key of cell that merges the cell key
@@ -294,14 +696,79 @@ class CellAttributes(list):
 
         """
 
-        row, col, tab = key
+        merge_area = self._get_merge_index().get(*key)
+
+        if merge_area is not None:
+            top, left, _, _ = merge_area
+            return top, left, key[2]
+
+    def _get_merge_index(self) -> MergeAreaIndex:
+        """Returns merge area index, which is rebuilt if it is outdated"""
+
+        if self._merge_index is None:
+            self._merge_index = MergeAreaIndex(self)
+
+        return self._merge_index
+
+    def merge_areas(self, table: int) -> List[Tuple[int, int, int, int]]:
+        """Returns merge areas (top, left, bottom, right) of table
+
+        Merge areas are returned in the order of their layers.
+
+        :param table: Table of the merge areas
+
+        """
+
+        return self._get_merge_index().merge_areas(table)
 
-        # Is cell merged
+    def _spill_areas(self) -> Dict[int, List[Tuple[int, int, int, int]]]:
+        """Returns spill areas (top, left, bottom, right) for each table
+
+        A spill area is defined by the `spill_shape` attribute of the top left
+        cell. Only single cells of selections define spill areas.
+
+        """
+
+        if self._spill_cache is not None \
+           and self._spill_cache[0] == self._generation:
+            return self._spill_cache[1]
+
+        spill_shapes = {}
         for selection, table, attr in self:
-            if tab == table and "merge_area" in attr:
-                top, left, bottom, right = attr["merge_area"]
-                if top <= row <= bottom and left <= col <= right:
-                    return top, left, tab
+            if "spill_shape" in attr:
+                for row, column in selection.cells:
+                    spill_shapes[row, column, table] = attr["spill_shape"]
+
+        spill_areas = defaultdict(list)
+        for (row, column, table), spill_shape in spill_shapes.items():
+            if spill_shape is not None:
+                rows, columns = spill_shape
+                spill_areas[table].append((row, column, row + rows - 1,
+                                           column + columns - 1))
+
+        self._spill_cache = self._generation, spill_areas
+
+        return spill_areas
+
+    def get_spilling_cell(self,
+                          key: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        """Returns key of cell whose result spills into the cell key
+
+        Returns None if cell key is not in a spill area.
+
+        :param key: Key of the cell that is spilled into
+
+        """
+
+        row, col, tab = key
+
+        spill_areas = self._spill_areas()
+        if tab not in spill_areas:
+            return
+
+        for top, left, bottom, right in spill_areas[tab]:
+            if top <= row <= bottom and left <= col <= right:
+                return top, left, tab
 
     def for_table(self, table: int) -> list:
         """Return cell attributes for a given table
@@ -324,1019 +791,4171 @@ class CellAttributes(list):
 
         return table_cell_attributes
 
-# End of class CellAttributes
+    def set_layers(self, cell_attributes: Iterable[CellAttribute]):
+        """Replaces all layers and clears caches
 
+        :param cell_attributes: New layers
 
-class KeyValueStore(dict):
-    """Key-Value store in memory. Currently a dict with default value None.
+        """
 
-    This class represents layer 0 of the model.
+        list.clear(self)
+        list.extend(self, cell_attributes)
 
-    """
+        self._merge_index = None
+        self._clear_caches()
 
-    def __init__(self, default_value=None):
-        """
-        :param default_value: Value that is provided for missing keys
+    def lookup_time(self, keys: Iterable[Tuple[int, int, int]]) -> float:
+        """Returns time in seconds for uncached attribute lookups of keys
+
+        :param keys: Cell keys for attribute lookup
 
         """
 
-        super().__init__()
-        self.default_value = default_value
+        self._update_table_cache()
 
-    def __missing__(self, value: Any) -> Any:
-        """Returns the default value None"""
+        start = perf_counter()
+        for key in keys:
+            self._attr_cache.pop(key, None)
+            self[key]
 
-        return self.default_value
+        return perf_counter() - start
 
-# End of class KeyValueStore
+    def compacted(self) -> list:
+        """Returns equivalent cell attributes with fewer layers
 
-# -----------------------------------------------------------------------------
+        Return type is `CellAttributes`, see :meth:`for_table`.
 
+        Compaction coalesces single cells of a layer into blocks, removes
+        attributes that later layers set for the complete selection,
+        removes empty layers and merges adjacent layers of a table that
+        have the same selection or the same attributes. Layers with merge
+        areas or spill shapes are kept as they are, see :meth:`_is_anchor`.
 
-class DictGrid(KeyValueStore):
-    """Core data class with all information that is stored in a `.pys` file.
+        """
 
-    Besides grid code access via standard `dict` operations, it provides
-    the following attributes:
+        tables = {}  # Dicts preserve the order of tables
+        for selection, table, attr in self:
+            tables.setdefault(table, []).append((selection, attr))
 
-    * :attr:`~DictGrid.cell_attributes` -  Stores cell formatting attributes
-    * :attr:`~DictGrid.macros` - String of all macros
+        compacted = []
+        for table, layers in tables.items():
+            layers = [(selection, attr) if self._is_anchor(attr)
+                      else (self._coalesce_cells(selection), attr)
+                      for selection, attr in layers]
+            layers = self._remove_overridden(layers)
+            layers = self._merge_adjacent(layers)
 
-    This class represents layer 1 of the model.
+            compacted.extend(CellAttribute(selection, table, attr)
+                             for selection, attr in layers)
 
-    """
+        return CellAttributes(compacted)
+
+    @staticmethod
+    def _is_anchor(attr: AttrDict) -> bool:
+        """True if attr defines merge areas or spill areas
+
+        Both are defined by the single cells of the selection of their layer
+        and must not be coalesced or merged with other layers.
+
+        :param attr: Attributes of a layer
 
-    def __init__(self, shape: Tuple[int, int, int]):
         """
-        :param shape: Shape of the grid
+
+        return "merge_area" in attr or "spill_shape" in attr
+
+    @staticmethod
+    def _coalesce_cells(selection: Selection) -> Selection:
+        """Returns selection with adjacent single cells combined into blocks
+
+        :param selection: Selection with cells to be coalesced
 
         """
 
-        super().__init__()
+        if len(selection.cells) < 2:
+            return selection
+
+        # Horizontal runs of cells (row, left, right)
+        runs = []
+        for row, cells in groupby(sorted(set(map(tuple, selection.cells))),
+                                  key=lambda cell: cell[0]):
+            columns = [column for _, column in cells]
+            left = right = columns[0]
+            for column in columns[1:]:
+                if column != right + 1:
+                    runs.append((row, left, right))
+                    left = column
+                right = column
+            runs.append((row, left, right))
+
+        # Stack runs with equal columns in consecutive rows
+        open_blocks = {}  # (left, right): [top, bottom]
+        blocks = []
+        for row, left, right in runs:
+            block = open_blocks.get((left, right))
+            if block is not None and block[1] == row - 1:
+                block[1] = row
+            else:
+                if block is not None:
+                    blocks.append((block[0], left, block[1], right))
+                open_blocks[left, right] = [row, row]
+        blocks.extend((top, left, bottom, right)
+                      for (left, right), (top, bottom) in open_blocks.items())
+
+        block_tl = list(selection.block_tl)
+        block_br = list(selection.block_br)
+        cells = []
+        for top, left, bottom, right in sorted(blocks):
+            if top == bottom and left == right:
+                cells.append((top, left))
+            else:
+                block_tl.append((top, left))
+                block_br.append((bottom, right))
 
-        self.shape = shape
+        return Selection(block_tl, block_br, list(selection.rows),
+                         list(selection.columns), cells)
 
-        # Instance of :class:`CellAttributes`
-        self.cell_attributes = CellAttributes()
+    @staticmethod
+    def _selection_parts(selection: Selection) -> Iterable[tuple]:
+        """Yields parts of selection as (top, left, bottom, right)
 
-        # Macros as string
-        self.macros = u""
+        Unbounded sides are represented by None for top and left and by inf
+        for bottom and right.
 
-        self.row_heights = defaultdict(float)  # Keys have format (row, table)
-        self.col_widths = defaultdict(float)  # Keys have format (col, table)
+        :param selection: Selection to be split
 
-    def __getitem__(self, key: Tuple[int, int, int]) -> Any:
         """
-        :param key: Cell key
 
-        """
-        shape = self.shape
+        for (top, left), (bottom, right) in zip(selection.block_tl,
+                                                selection.block_br):
+            yield (top or 0, left or 0, inf if bottom is None else bottom,
+                   inf if right is None else right)
+        for row in selection.rows:
+            yield row, 0, row, inf
+        for column in selection.columns:
+            yield 0, column, inf, column
+        for row, column in selection.cells:
+            yield row, column, row, column
 
-        for axis, key_ele in enumerate(key):
-            if shape[axis] <= key_ele or key_ele < -shape[axis]:
-                msg = "Grid index {key} outside grid shape {shape}."
-                msg = msg.format(key=key, shape=shape)
-                raise IndexError(msg)
+    @classmethod
+    def _covers(cls, selection: Selection, part: tuple) -> bool:
+        """True if selection contains the whole part
 
-        return super().__getitem__(key)
+        The check is conservative, i.e. it may return False for parts that
+        are covered by a combination of parts of the selection.
 
-    def __missing__(self, key):
-        """Default value is None"""
+        :param selection: Selection that may cover part
+        :param part: (top, left, bottom, right) from _selection_parts
 
-        return
+        """
 
-# End of class DictGrid
+        top, left, bottom, right = part
 
-# -----------------------------------------------------------------------------
+        for outer in cls._selection_parts(selection):
+            outer_top, outer_left, outer_bottom, outer_right = outer
+            if outer_top <= top and outer_left <= left \
+               and bottom <= outer_bottom and right <= outer_right:
+                return True
 
+        return False
 
-class DataArray:
-    """DataArray provides enhanced grid read/write access.
+    def _remove_overridden(self, layers: List[Tuple[Selection, AttrDict]]
+                           ) -> List[Tuple[Selection, AttrDict]]:
+        """Removes attributes that later layers of the table set, too
 
-    Enhancements comprise:
-     * Slicing
-     * Multi-dimensional operations such as insertion and deletion along one
-       axis
+        Layers without remaining attributes are removed.
 
-    This class represents layer 2 of the model.
-
-    """
+        :param layers: (selection, attr) of one table in append order
 
-    def __init__(self, shape: Tuple[int, int, int], settings: Settings):
         """
-        :param shape: Shape of the grid
-        :param settings: Pyspread settings
 
-        """
+        index = CellAttributeIndex(selection for selection, _ in layers)
 
-        self.dict_grid = DictGrid(shape)
-        self.settings = settings
+        result = []
+        for i, (selection, attr) in enumerate(layers):
+            if not selection or not attr:
+                continue
 
-    def __eq__(self, other) -> bool:
-        if not hasattr(other, "dict_grid") or \
-           not hasattr(other, "cell_attributes"):
-            return False
+            if self._is_anchor(attr):
+                result.append((selection, attr))
+                continue
 
-        return self.dict_grid == other.dict_grid and \
-            self.cell_attributes == other.cell_attributes
+            covered_keys = set(attr)
+            for part in self._selection_parts(selection):
+                top, left = part[:2]
+                later = [layers[j] for j in index.layers(top, left) if j > i]
+                covered_keys &= {key for key in attr
+                                 if any(key in later_attr
+                                        and self._covers(later_selection,
+                                                         part)
+                                        for later_selection, later_attr
+                                        in later)}
+                if not covered_keys:
+                    break
 
-    def __ne__(self, other) -> bool:
-        return not self.__eq__(other)
+            if len(covered_keys) == len(attr):
+                continue
 
-    @property
-    def data(self) -> dict:
-        """Returns `dict` of data content.
+            if covered_keys:
+                attr = AttrDict((key, value) for key, value in attr.items()
+                                if key not in covered_keys)
 
+            result.append((selection, attr))
 
-        - Data is the central content interface for loading / saving data.
-        - It shall be used for loading and saving from and to `.pys` and other
-          files.
-        - It shall be used for loading and saving macros.
-        - However, it is not used for importing and exporting data because
-          these operations are partial to the grid.
+        return result
 
-        **Content of returned dict**
+    def _merge_adjacent(self, layers: List[Tuple[Selection, AttrDict]]
+                        ) -> List[Tuple[Selection, AttrDict]]:
+        """Merges adjacent layers with equal selections or equal attributes
 
-        :param shape: Grid shape
-        :type shape: Tuple[int, int, int]
-        :param grid: Cell content
-        :type grid: Dict[Tuple[int, int, int], str]
-        :param attributes: Cell attributes
-        :type attributes: CellAttribute
-        :param row_heights: Row heights
-        :type row_heights: defaultdict[Tuple[int, int], float]
-        :param col_widths: Column widths
-        :type col_widths: defaultdict[Tuple[int, int], float]
-        :param macros: Macros
-        :type macros: str
+        :param layers: (selection, attr) of one table in append order
 
         """
 
-        data = {}
-
-        data["shape"] = self.shape
-        data["grid"] = {}.update(self.dict_grid)
-        data["attributes"] = self.cell_attributes[:]
-        data["row_heights"] = self.row_heights
-        data["col_widths"] = self.col_widths
-        data["macros"] = self.macros
+        result = []
+        for selection, attr in layers:
+            if result and not self._is_anchor(attr) \
+               and not self._is_anchor(result[-1][1]):
+                last_selection, last_attr = result[-1]
+                if selection == last_selection:
+                    merged_attr = AttrDict(last_attr)
+                    merged_attr.update(attr)
+                    result[-1] = selection, merged_attr
+                    continue
+                if attr == last_attr:
+                    merged_selection = Selection(
+                        last_selection.block_tl + selection.block_tl,
+                        last_selection.block_br + selection.block_br,
+                        last_selection.rows + [row for row in selection.rows
+                                               if row not in
+                                               last_selection.rows],
+                        last_selection.columns
+                        + [column for column in selection.columns
+                           if column not in last_selection.columns],
+                        last_selection.cells + selection.cells)
+                    result[-1] = merged_selection, attr
+                    continue
+
+            result.append((selection, attr))
+
+        return [(selection, attr) if self._is_anchor(attr)
+                else (self._coalesce_cells(selection), attr)
+                for selection, attr in result]
 
-        return data
+# End of class CellAttributes
 
-    @data.setter
-    def data(self, **kwargs):
-        """Sets data from given parameters
 
-        Old values are deleted.
-        If a paremeter is not given, nothing is changed.
+class KeyValueStore(dict):
+    """Key-Value store in memory. Currently a dict with default value None.
 
-        **Content of kwargs dict**
+    This class represents layer 0 of the model.
 
-        :param shape: Grid shape
-        :type shape: Tuple[int, int, int]
-        :param grid: Cell content
-        :type grid: Dict[Tuple[int, int, int], str]
-        :param attributes: Cell attributes
-        :type attributes: CellAttribute
-        :param row_heights: Row heights
-        :type row_heights: defaultdict[Tuple[int, int], float]
-        :param col_widths: Column widths
-        :type col_widths: defaultdict[Tuple[int, int], float]
-        :param macros: Macros
-        :type macros: str
+    """
 
+    def __init__(self, default_value=None):
         """
+        :param default_value: Value that is provided for missing keys
 
-        if "shape" in kwargs:
-            self.shape = kwargs["shape"]
-
-        if "grid" in kwargs:
-            self.dict_grid.clear()
-            self.dict_grid.update(kwargs["grid"])
+        """
 
-        if "attributes" in kwargs:
-            self.attributes[:] = kwargs["attributes"]
+        super().__init__()
+        self.default_value = default_value
 
-        if "row_heights" in kwargs:
-            self.row_heights = kwargs["row_heights"]
+    def __missing__(self, value: Any) -> Any:
+        """Returns the default value None"""
 
-        if "col_widths" in kwargs:
-            self.col_widths = kwargs["col_widths"]
+        return self.default_value
 
-        if "macros" in kwargs:
-            self.macros = kwargs["macros"]
+# End of class KeyValueStore
 
-    @property
-    def row_heights(self) -> defaultdict:
-        """row_heights interface to dict_grid"""
+# -----------------------------------------------------------------------------
 
-        return self.dict_grid.row_heights
 
-    @row_heights.setter
-    def row_heights(self, row_heights: defaultdict):
-        """row_heights interface to dict_grid"""
+class NumericColumn:
+    """Numbers of one grid column in typed numpy blocks
 
-        self.dict_grid.row_heights = row_heights
+    Rows are grouped in blocks of `block_size` rows. Each block consists of
+    a value array of the column dtype and a boolean validity mask. Blocks
+    are allocated when the first row in them is set and released when their
+    last row is removed.
 
-    @property
-    def col_widths(self) -> defaultdict:
-        """col_widths interface to dict_grid"""
+    """
 
-        return self.dict_grid.col_widths
+    block_size = 4096
 
-    @col_widths.setter
-    def col_widths(self, col_widths: defaultdict):
-        """col_widths interface to dict_grid"""
+    def __init__(self, dtype: type):
+        """
+        :param dtype: Python type of the numbers, int or float
 
-        self.dict_grid.col_widths = col_widths
+        """
 
-    @property
-    def cell_attributes(self) -> CellAttributes:
-        """cell_attributes interface to dict_grid"""
+        self.dtype = dtype
+        self.array_dtype = numpy.int64 if dtype is int else numpy.float64
+        self.values = {}  # block: numpy value array
+        self.masks = {}  # block: numpy bool array
+        self.counts = {}  # block: number of filled rows
+        self.size = 0
 
-        return self.dict_grid.cell_attributes
+    def copy(self) -> "NumericColumn":
+        """Returns an independent copy of the column"""
 
-    @cell_attributes.setter
-    def cell_attributes(self, value: CellAttributes):
-        """cell_attributes interface to dict_grid"""
+        numeric_column = NumericColumn(self.dtype)
+        numeric_column.values = {block: values.copy()
+                                 for block, values in self.values.items()}
+        numeric_column.masks = {block: mask.copy()
+                                for block, mask in self.masks.items()}
+        numeric_column.counts = self.counts.copy()
+        numeric_column.size = self.size
+        return numeric_column
 
-        # First empty cell_attributes
-        self.cell_attributes[:] = []
-        self.cell_attributes.extend(value)
+    def __contains__(self, row: int) -> bool:
+        """True if row is filled
 
-    @property
-    def macros(self) -> str:
-        """macros interface to dict_grid"""
+        :param row: Physical row
 
-        return self.dict_grid.macros
+        """
 
-    @macros.setter
-    def macros(self, macros: str):
-        """Sets  macros string"""
+        block, pos = divmod(row, self.block_size)
+        try:
+            return bool(self.masks[block][pos])
+        except KeyError:
+            return False
 
-        self.dict_grid.macros = macros
+    def get(self, row: int) -> Union[int, float, None]:
+        """Returns number in row or None if row is empty
 
-    @property
-    def shape(self) -> Tuple[int, int, int]:
-        """Returns dict_grid shape"""
+        :param row: Physical row
 
-        return self.dict_grid.shape
+        """
 
-    @shape.setter
-    def shape(self, shape: Tuple[int, int, int]):
-        """Deletes all cells beyond new shape and sets dict_grid shape
+        block, pos = divmod(row, self.block_size)
+        try:
+            if self.masks[block][pos]:
+                return self.values[block][pos].item()
+        except KeyError:
+            return
 
-        Returns a dict of the deleted cells' contents
+    def set(self, row: int, value: Union[int, float]):
+        """Sets number in row
 
-        :param shape: Target shape for grid
+        :param row: Physical row
+        :param value: Number of the column dtype
 
         """
 
-        # Delete each cell that is beyond new borders
-
-        old_shape = self.shape
-        deleted_cells = {}
+        block, pos = divmod(row, self.block_size)
+        try:
+            mask = self.masks[block]
+        except KeyError:
+            mask = self.masks[block] = numpy.zeros(self.block_size, bool)
+            self.values[block] = numpy.zeros(self.block_size,
+                                             self.array_dtype)
+            self.counts[block] = 0
 
-        if any(new_axis < old_axis
-               for new_axis, old_axis in zip(shape, old_shape)):
-            for key in list(self.dict_grid.keys()):
-                if any(key_ele >= new_axis
-                       for key_ele, new_axis in zip(key, shape)):
-                    deleted_cells[key] = self.pop(key)
+        if not mask[pos]:
+            mask[pos] = True
+            self.counts[block] += 1
+            self.size += 1
 
-        # Set dict_grid shape attribute
-        self.dict_grid.shape = shape
+        self.values[block][pos] = value
 
-        self._adjust_rowcol(0, 0, 0)
-        self._adjust_cell_attributes(0, 0, 0)
+    def remove(self, row: int) -> bool:
+        """Removes number in row, returns True if row has been filled
 
-        return deleted_cells
+        :param row: Physical row
 
-    def __iter__(self) -> Iterable:
-        """Returns iterator over self.dict_grid"""
+        """
 
-        return iter(self.dict_grid)
+        block, pos = divmod(row, self.block_size)
+        try:
+            mask = self.masks[block]
+        except KeyError:
+            return False
 
-    def __contains__(self, key: Tuple[int, int, int]) -> bool:
-        """True if key is contained in grid
+        if not mask[pos]:
+            return False
 
-        Handles single keys only.
+        mask[pos] = False
+        self.size -= 1
+        self.counts[block] -= 1
+        if not self.counts[block]:
+            del self.values[block], self.masks[block], self.counts[block]
 
-        :param key: Key of cell to be checked
+        return True
 
-        """
+    def rows(self) -> numpy.ndarray:
+        """Returns sorted array of filled rows"""
 
-        if any(not isinstance(ele, int) for ele in key):
-            return NotImplemented
+        rows = [numpy.flatnonzero(self.masks[block]) + block * self.block_size
+                for block in sorted(self.masks)]
+        if not rows:
+            return numpy.zeros(0, numpy.int64)
+        return numpy.concatenate(rows)
 
-        row, column, table = key
-        rows, columns, tables = self.shape
+    def chunks(self, start: int, stop: int
+               ) -> Iterable[Tuple[int, numpy.ndarray, numpy.ndarray]]:
+        """Yields (first row, values, mask) views for a row range
 
-        return (0 <= row <= rows
-                and 0 <= column <= columns
-                and 0 <= table <= tables)
+        Views of unallocated blocks are not yielded. The views share memory
+        with the column and must not be altered.
 
-    # Slice support
+        :param start: First physical row of the range
+        :param stop: Physical row after the range
 
-    def __getitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
-                                     Union[int, slice]]
-                    ) -> Union[str, Iterable[str], Iterable[Iterable[str]],
-                               Iterable[Iterable[Iterable[str]]]]:
-        """Adds slicing access to cell code retrieval
+        """
 
-        The cells are returned as a generator of generators, of ... of unicode.
+        block_size = self.block_size
 
-        :param key: Keys of the cell code that is returned
+        if stop - start > len(self.masks) * block_size:
+            blocks = [block for block in sorted(self.masks)
+                      if start // block_size <= block
+                      <= (stop - 1) // block_size]
+        else:
+            blocks = range(start // block_size, (stop - 1) // block_size + 1)
 
-        Note
-        ----
-        Classical Excel type addressing (A$1, ...) may be added here later
+        for block in blocks:
+            if block not in self.masks:
+                continue
+            offset = block * block_size
+            lower = max(start - offset, 0)
+            upper = min(stop - offset, block_size)
+            yield (offset + lower, self.values[block][lower:upper],
+                   self.masks[block][lower:upper])
 
-        """
+# End of class NumericColumn
 
-        for key_ele in key:
-            if isinstance(key_ele, slice):
-                # We have something slice-like here
-                return self.cell_array_generator(key)
+# -----------------------------------------------------------------------------
 
-            if is_stringlike(key_ele):
-                # We have something string-like here
-                msg = "Cell string based access not implemented"
-                raise NotImplementedError(msg)
 
-        # key_ele should be a single cell
+class ColumnStore:
+    """Columnar storage for cells that contain literal numbers
 
-        return self.dict_grid[key]
+    Cell code that is the canonical repr of an int64 or of a finite float is
+    stored as number in a :class:`NumericColumn` of its table and column.
+    The dtype of a column is given by its first number. Numbers of the
+    other type are not stored. Code is recreated from the numbers.
 
-    def __setitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
-                                     Union[int, slice]], value: str):
-        """Accepts index and slice keys
+    Keys are physical keys of :class:`DictGrid`.
 
-        :param key: Cell key(s) that shall be set
-        :param value: Code for cell(s) to be set
+    """
 
-        """
+    _int_code = re.compile(r"(0|-?[1-9][0-9]{0,18})\Z", re.ASCII)
+    max_code_length = 32
 
-        single_keys_per_dim = []
+    def __init__(self):
+        self.tables = {}  # table: {column: NumericColumn}
+        self.size = 0
 
-        for axis, key_ele in enumerate(key):
-            if isinstance(key_ele, slice):
-                # We have something slice-like here
+    def __len__(self) -> int:
+        return self.size
 
-                length = self.shape[axis]
-                slice_range = range(*key_ele.indices(length))
-                single_keys_per_dim.append(slice_range)
+    def copy(self) -> "ColumnStore":
+        """Returns an independent copy of the store"""
 
-            elif is_stringlike(key_ele):
-                # We have something string-like here
+        column_store = ColumnStore()
+        column_store.tables = {
+            table: {column: numeric_column.copy()
+                    for column, numeric_column in columns.items()}
+            for table, columns in self.tables.items()}
+        column_store.size = self.size
+        return column_store
 
-                raise NotImplementedError
+    @classmethod
+    def parse(cls, code: Any) -> Union[int, float, None]:
+        """Returns number if code is a number literal that can be stored
 
-            else:
-                # key_ele is a single cell
+        :param code: Cell code
 
-                single_keys_per_dim.append((key_ele, ))
+        """
 
-        single_keys = product(*single_keys_per_dim)
+        if not isinstance(code, str) or len(code) > cls.max_code_length:
+            return
 
-        for single_key in single_keys:
-            if value:
-                # Never change merged cells
-                merging_cell = \
-                    self.cell_attributes.get_merging_cell(single_key)
-                if ((merging_cell is None or merging_cell == single_key) and
-                        isinstance(value, str)):
-                    self.dict_grid[single_key] = value
-            else:
-                # Value is empty --> delete cell
-                try:
-                    self.pop(key)
+        if cls._int_code.match(code):
+            value = int(code)
+            if -2**63 <= value < 2**63:
+                return value
+            return
 
-                except (KeyError, TypeError):
-                    pass
+        try:
+            value = float(code)
+        except ValueError:
+            return
 
-    # Pickle support
+        if isfinite(value) and repr(value) == code:
+            return value
 
-    def __getstate__(self) -> Dict[str, DictGrid]:
-        """Returns dict_grid for pickling
+    def _column(self, key: Tuple[int, int, int]) -> Optional[NumericColumn]:
+        """Returns column of key or None
 
-        Note that all persistent data is contained in the DictGrid class
+        :param key: Physical cell key
 
         """
 
-        return {"dict_grid": self.dict_grid}
+        try:
+            return self.tables[key[2]][key[1]]
+        except KeyError:
+            return
 
-    def get_row_height(self, row: int, tab: int) -> float:
-        """Returns row height
+    def __contains__(self, key: Tuple[int, int, int]) -> bool:
+        column = self._column(key)
+        return column is not None and key[0] in column
 
-        :param row: Row for which height is retrieved
-        :param tab: Table for which for which row height is retrieved
+    def get(self, key: Tuple[int, int, int]) -> Optional[str]:
+        """Returns code of key or None if key is not stored
 
-        """
+        :param key: Physical cell key
 
-        try:
-            return self.row_heights[(row, tab)]
+        """
 
-        except KeyError:
-            return
+        column = self._column(key)
+        if column is not None:
+            value = column.get(key[0])
+            if value is not None:
+                return repr(value)
 
-    def get_col_width(self, col: int, tab: int) -> float:
-        """Returns column width
+    def set(self, key: Tuple[int, int, int], code: Any) -> bool:
+        """Stores code of key if possible, returns True if it is stored
 
-        :param col: Column for which width is retrieved
-        :param tab: Table for which for which column width is retrieved
+        :param key: Physical cell key
+        :param code: Cell code
 
         """
 
-        try:
-            return self.col_widths[(col, tab)]
+        value = self.parse(code)
+        if value is None:
+            return False
 
+        row, column, table = key
+        columns = self.tables.setdefault(table, {})
+        try:
+            numeric_column = columns[column]
         except KeyError:
-            return
+            numeric_column = columns[column] = NumericColumn(type(value))
 
-    def keys(self) -> List[Tuple[int, int, int]]:
-        """Returns keys in self.dict_grid"""
+        if numeric_column.dtype is not type(value):
+            return False
 
-        return list(self.dict_grid.keys())
+        size = numeric_column.size
+        numeric_column.set(row, value)
+        self.size += numeric_column.size - size
+        return True
 
-    def pop(self, key: Tuple[int, int, int]) -> Any:
-        """dict_grid pop wrapper
+    def remove(self, key: Tuple[int, int, int]) -> bool:
+        """Removes key, returns True if key has been stored
 
-        :param key: Cell key
+        :param key: Physical cell key
 
         """
 
-        return self.dict_grid.pop(key)
+        row, column, table = key
 
-    def get_last_filled_cell(self, table: int = None) -> Tuple[int, int, int]:
-        """Returns key for the bottommost rightmost cell with content
+        numeric_column = self._column(key)
+        if numeric_column is None or not numeric_column.remove(row):
+            return False
 
-        :param table: Limit search to this table
+        self.size -= 1
+        if not numeric_column.size:
+            del self.tables[table][column]
+            if not self.tables[table]:
+                del self.tables[table]
 
-        """
+        return True
 
-        maxrow = 0
-        maxcol = 0
+    def keys(self) -> Iterable[Tuple[int, int, int]]:
+        """Yields physical keys"""
 
-        for row, col, tab in self.dict_grid:
-            if table is None or tab == table:
-                maxrow = max(row, maxrow)
-                maxcol = max(col, maxcol)
+        for table, columns in list(self.tables.items()):
+            for column, numeric_column in list(columns.items()):
+                for row in numeric_column.rows().tolist():
+                    yield row, column, table
 
-        return maxrow, maxcol, table
+    def items(self) -> Iterable[Tuple[Tuple[int, int, int], str]]:
+        """Yields physical keys and code"""
 
-    def cell_array_generator(self,
-                             key: Tuple[Union[int, slice], Union[int, slice],
-                                        Union[int, slice]]) -> Iterable[str]:
-        """Generator traversing cells specified in key
+        for key in self.keys():
+            yield key, self.get(key)
 
-        Yields cells' contents.
+    def columns(self, table: int) -> List[int]:
+        """Returns sorted columns of table that contain numbers
 
-        :param key: Specifies the cell keys of the generator
+        :param table: Physical table
 
         """
 
-        for i, key_ele in enumerate(key):
+        return sorted(self.tables.get(table, ()))
 
-            # Recursively replace first element of key that is a slice
-            if isinstance(key_ele, slice):
-                slc_keys = range(*key_ele.indices(self.dict_grid.shape[i]))
-                key_list = list(key)
+    def column_rows(self, table: int, column: int) -> List[int]:
+        """Returns sorted rows of column that contain numbers
 
-                key_list[i] = None
+        :param table: Physical table
+        :param column: Physical column
 
-                has_subslice = any(isinstance(ele, slice) for ele in key_list)
+        """
 
-                for slc_key in slc_keys:
-                    key_list[i] = slc_key
+        try:
+            return self.tables[table][column].rows().tolist()
+        except KeyError:
+            return []
 
-                    if has_subslice:
-                        # If there is a slice left yield generator
-                        yield self.cell_array_generator(key_list)
+    def rows(self, table: int) -> List[int]:
+        """Returns sorted rows of table that contain numbers
 
-                    else:
-                        # No slices? Yield value
-                        yield self[tuple(key_list)]
+        :param table: Physical table
 
-                break
+        """
 
-    def _shift_rowcol(self, insertion_point: int, no_to_insert: int):
-        """Shifts row and column sizes when a table is inserted or deleted
+        rows = [numeric_column.rows()
+                for numeric_column in self.tables.get(table, {}).values()]
+        if not rows:
+            return []
+        return numpy.unique(numpy.concatenate(rows)).tolist()
 
-        :param insertion_point: Table at which a new table is inserted
-        :param no_to_insert: Number of tables that are inserted
+    def row_columns(self, table: int, row: int) -> List[int]:
+        """Returns sorted columns that contain numbers in row
+
+        :param table: Physical table
+        :param row: Physical row
 
         """
 
-        # Shift row heights
+        return sorted(column for column, numeric_column
+                      in self.tables.get(table, {}).items()
+                      if row in numeric_column)
 
-        new_row_heights = {}
-        del_row_heights = []
+# End of class ColumnStore
 
-        for row, tab in self.row_heights:
-            if tab >= insertion_point:
-                new_row_heights[(row, tab + no_to_insert)] = \
-                    self.row_heights[(row, tab)]
-                del_row_heights.append((row, tab))
+# -----------------------------------------------------------------------------
 
-        for row, tab in new_row_heights:
-            self.set_row_height(row, tab, new_row_heights[(row, tab)])
 
-        for row, tab in del_row_heights:
-            if (row, tab) not in new_row_heights:
-                self.set_row_height(row, tab, None)
+class AxisMap:
+    """Piecewise offset map from logical to physical indices of one axis
 
-        # Shift column widths
+    The map consists of segments that start at sorted logical indices.
+    Within a segment, the physical index is the logical index plus the
+    segment offset. Inserting or deleting indices splits segments and moves
+    the starts of all following segments, so that the cost depends on the
+    number of segments and not on the number of cells. Inserted indices get
+    fresh physical indices from `fresh_start` upwards, which are never
+    reached by logical indices. Negative indices are not mapped.
 
-        new_col_widths = {}
-        del_col_widths = []
+    """
 
-        for col, tab in self.col_widths:
-            if tab >= insertion_point:
-                new_col_widths[(col, tab + no_to_insert)] = \
-                    self.col_widths[(col, tab)]
-                del_col_widths.append((col, tab))
+    fresh_start = 2**62
 
-        for col, tab in new_col_widths:
-            self.set_col_width(col, tab, new_col_widths[(col, tab)])
+    def __init__(self):
+        self.starts = [0]  # Logical start of each segment
+        self.offsets = [0]  # Physical minus logical index for each segment
+        self._fresh = self.fresh_start
+        self._inverse = None  # Segments sorted by physical start
 
-        for col, tab in del_col_widths:
-            if (col, tab) not in new_col_widths:
-                self.set_col_width(col, tab, None)
+    def __len__(self) -> int:
+        """Returns number of segments"""
 
-    def _adjust_rowcol(self, insertion_point: int, no_to_insert: int,
-                       axis: int, tab: int = None):
-        """Adjusts row and column sizes on insertion/deletion
+        return len(self.starts)
 
-        :param insertion_point: Point on axis at which insertion takes place
-        :param no_to_insert: Number of rows or columns that are inserted
-        :param axis: Row insertion if 0, column insertion if 1, must be in 0, 1
-        :param tab: Table at which insertion takes place, None means all tables
+    def copy(self) -> "AxisMap":
+        """Returns an independent copy of the map"""
 
-        """
+        axis_map = AxisMap()
+        axis_map.starts = self.starts.copy()
+        axis_map.offsets = self.offsets.copy()
+        axis_map._fresh = self._fresh
+        return axis_map
 
-        if axis == 2:
-            self._shift_rowcol(insertion_point, no_to_insert)
-            return
+    @property
+    def is_identity(self) -> bool:
+        """True if each logical index equals its physical index"""
 
-        if axis not in (0, 1):
-            raise Warning("Axis {} not in (0, 1)".format(axis))
-            return
+        return self.offsets == [0]
 
-        cell_sizes = self.col_widths if axis else self.row_heights
-        set_cell_size = self.set_col_width if axis else self.set_row_height
+    def to_physical(self, index: int) -> int:
+        """Returns physical index of logical index
 
-        new_sizes = {}
-        del_sizes = []
+        :param index: Logical index
 
-        for pos, table in cell_sizes:
-            if pos >= insertion_point and (tab is None or tab == table):
-                if 0 <= pos + no_to_insert < self.shape[axis]:
-                    new_sizes[(pos + no_to_insert, table)] = \
-                        cell_sizes[(pos, table)]
-                if pos < insertion_point + no_to_insert:
-                    new_sizes[(pos, table)] = cell_sizes[(pos, table)]
-                del_sizes.append((pos, table))
+        """
 
-        for pos, table in new_sizes:
-            set_cell_size(pos, table, new_sizes[(pos, table)])
+        if index < 0:
+            return index
 
-        for pos, table in del_sizes:
-            if (pos, table) not in new_sizes:
-                set_cell_size(pos, table, None)
+        return index + self.offsets[bisect_right(self.starts, index) - 1]
 
-    def _adjust_merge_area(
-            self, attrs: AttrDict, insertion_point: int, no_to_insert: int,
-            axis: int) -> Tuple[int, int, int, int]:
-        """Returns an updated merge area
+    def to_logical(self, index: int) -> Optional[int]:
+        """Returns logical index of physical index or None if it is unmapped
 
-        :param attrs: Cell attribute dictionary that shall be adjusted
-        :param insertion_point: Point on axis at which insertion takes place
-        :param no_to_insert: Number of rows/cols/tabs to be inserted (>=0)
-        :param axis: Row insertion if 0, column insertion if 1, must be in 0, 1
+        :param index: Physical index
 
         """
 
-        if axis not in (0, 1):
-            raise Warning("Axis {} not in (0, 1)".format(axis))
-            return
+        if index < 0:
+            return index
 
-        if "merge_area" not in attrs or attrs["merge_area"] is None:
-            return
+        if self._inverse is None:
+            stops = self.starts[1:] + [inf]
+            self._inverse = sorted(
+                (start + offset, self._clip(start, stop, offset) + offset,
+                 offset)
+                for start, stop, offset in zip(self.starts, stops,
+                                               self.offsets))
+            self._inverse_starts = [segment[0] for segment in self._inverse]
 
-        top, left, bottom, right = attrs["merge_area"]
-        selection = Selection([(top, left)], [(bottom, right)], [], [], [])
+        pos = bisect_right(self._inverse_starts, index) - 1
+        if pos < 0:
+            return
 
-        selection.insert(insertion_point, no_to_insert, axis)
+        _, stop, offset = self._inverse[pos]
+        if index < stop:
+            return index - offset
 
-        __top, __left = selection.block_tl[0]
-        __bottom, __right = selection.block_br[0]
+    def _clip(self, start: int, stop: float, offset: int) -> float:
+        """Returns stop of a segment clipped to its own physical range
 
-        # Adjust merge area if it is beyond the grid shape
-        rows, cols, tabs = self.shape
+        Physical indices of the last segment would otherwise reach into the
+        fresh indices of inserted segments.
 
-        if __top < 0 and __bottom < 0:
-            return
-        if __top >= rows and __bottom >= rows:
-            return
-        if __left < 0 and __right < 0:
-            return
-        if __left >= cols and __right >= cols:
-            return
+        :param start: Logical start of the segment
+        :param stop: Logical stop of the segment
+        :param offset: Physical minus logical index of the segment
 
-        if __top < 0:
-            __top = 0
+        """
 
-        if __top >= rows:
-            __top = rows - 1
+        if start + offset < self.fresh_start:
+            return min(stop, self.fresh_start - offset)
 
-        if __bottom < 0:
-            __bottom = 0
+        return min(stop, self._fresh - offset)
 
-        if __bottom >= rows:
-            __bottom = rows - 1
+    def segments(self, start: int = 0,
+                 stop: float = inf) -> Iterable[Tuple[int, float, int]]:
+        """Yields (start, stop, offset) of the segments in a logical range
 
-        if __left < 0:
-            __left = 0
+        Segments are clipped to the range and yielded in logical order.
 
-        if __left >= cols:
-            __left = cols - 1
+        :param start: First logical index of the range
+        :param stop: Logical index after the range
 
-        if __right < 0:
-            __right = 0
+        """
 
-        if __right >= cols:
-            __right = cols - 1
+        starts = self.starts
+        stops = starts[1:] + [inf]
 
-        return __top, __left, __bottom, __right
+        for pos in range(max(0, bisect_right(starts, start) - 1),
+                         len(starts)):
+            if starts[pos] >= stop:
+                break
+            offset = self.offsets[pos]
+            yield (max(starts[pos], start),
+                   min(self._clip(starts[pos], stops[pos], offset), stop),
+                   offset)
 
-    def _adjust_cell_attributes(
-            self, insertion_point: int, no_to_insert: int,  axis: int,
-            tab: int = None, cell_attrs: AttrDict = None):
-        """Adjusts cell attributes on insertion/deletion
+    def _split(self, index: int) -> int:
+        """Makes index a segment start and returns the segment number
 
-        :param insertion_point: Point on axis at which insertion takes place
-        :param no_to_insert: Number of rows/cols/tabs to be inserted (>=0)
-        :param axis: Row insertion if 0, column insertion if 1, must be in 0, 1
-        :param tab: Table at which insertion takes place, None means all tables
-        :param cell_attrs: If given replaces the existing cell attributes
+        :param index: Logical index
 
         """
 
-        def replace_cell_attributes_table(index: int, new_table: int):
-            """Replaces table in cell_attributes item
+        pos = bisect_right(self.starts, index) - 1
+        if self.starts[pos] == index:
+            return pos
 
-            :param index: Cell attribute index for table replacement
-            :param new_table: New table value for cell attribute
+        self.starts.insert(pos + 1, index)
+        self.offsets.insert(pos + 1, self.offsets[pos])
+        return pos + 1
 
-            """
+    def _join(self):
+        """Joins neighboring segments with equal offsets"""
 
-            cell_attr = list(list.__getitem__(self.cell_attributes, index))
-            cell_attr[1] = new_table
-            self.cell_attributes[index] = CellAttribute(*cell_attr)
+        starts = [self.starts[0]]
+        offsets = [self.offsets[0]]
 
-        def get_ca_with_updated_ma(
-                attrs: AttrDict,
-                merge_area: Tuple[int, int, int, int]) -> AttrDict:
-            """Returns cell attributes with updated merge area
+        for start, offset in zip(self.starts[1:], self.offsets[1:]):
+            if offset != offsets[-1]:
+                starts.append(start)
+                offsets.append(offset)
 
-            :param attrs: Cell attributes to be updated
-            :param merge_area: New merge area (top, left, bottom, right)
+        self.starts = starts
+        self.offsets = offsets
+        self._inverse = None
 
-            """
+    def insert(self, point: int, number: int):
+        """Inserts number indices with fresh physical indices before point
 
-            new_attrs = copy(attrs)
+        :param point: Logical index at which the indices are inserted
+        :param number: Number of inserted indices
 
-            if merge_area is None:
-                try:
-                    new_attrs.pop("merge_area")
-                except KeyError:
-                    pass
-            else:
-                new_attrs["merge_area"] = merge_area
+        """
 
-            return new_attrs
+        if number <= 0:
+            return
 
-        if axis not in list(range(3)):
-            raise ValueError("Axis must be in [0, 1, 2]")
+        pos = self._split(point)
 
-        if tab is not None and tab < 0:
-            raise Warning("tab is negative")
-            return
+        for i in range(pos, len(self.starts)):
+            self.starts[i] += number
+            self.offsets[i] -= number
 
-        if cell_attrs is None:
-            cell_attrs = []
+        self.starts.insert(pos, point)
+        self.offsets.insert(pos, self._fresh - point)
+        self._fresh += number
 
-        if cell_attrs:
-            self.cell_attributes[:] = cell_attrs
+        self._join()
 
-        elif axis < 2:
-            # Adjust selections on given table
+    def delete(self, point: int, number: int):
+        """Deletes number indices starting with point
 
-            ca_updates = {}
-            for i, (selection, table, attrs) \
-                    in enumerate(self.cell_attributes):
-                selection = copy(selection)
-                if tab is None or tab == table:
-                    selection.insert(insertion_point, no_to_insert, axis)
-                    # Update merge area if present
-                    merge_area = self._adjust_merge_area(attrs,
-                                                         insertion_point,
-                                                         no_to_insert, axis)
-                    new_attrs = get_ca_with_updated_ma(attrs, merge_area)
+        Physical indices of deleted logical indices become unmapped.
 
-                    ca_updates[i] = CellAttribute(selection, table, new_attrs)
+        :param point: First logical index that is deleted
+        :param number: Number of deleted indices
 
-            for idx in ca_updates:
-                self.cell_attributes[idx] = ca_updates[idx]
+        """
 
-        elif axis == 2:
-            # Adjust tabs
+        if number <= 0:
+            return
 
-            pop_indices = []
+        pos = self._split(point)
+        stop_pos = self._split(point + number)
 
-            for i, cell_attribute in enumerate(self.cell_attributes):
-                selection, table, value = cell_attribute
+        del self.starts[pos:stop_pos]
+        del self.offsets[pos:stop_pos]
 
-                if no_to_insert < 0 and insertion_point <= table:
-                    if insertion_point > table + no_to_insert:
-                        # Delete later
-                        pop_indices.append(i)
-                    else:
-                        replace_cell_attributes_table(i, table + no_to_insert)
+        for i in range(pos, len(self.starts)):
+            self.starts[i] -= number
+            self.offsets[i] += number
 
-                elif insertion_point <= table:
-                    # Insert
+        self._join()
+
+# End of class AxisMap
+
+# -----------------------------------------------------------------------------
+
+
+class DictGrid(KeyValueStore):
+    """Core data class with all information that is stored in a `.pys` file.
+
+    Besides grid code access via standard `dict` operations, it provides
+    the following attributes:
+
+    * :attr:`~DictGrid.cell_attributes` -  Stores cell formatting attributes
+    * :attr:`~DictGrid.macros` - String of all macros
+
+    Cell code is stored under physical keys. An :class:`AxisMap` for tables
+    and one for rows and one for columns of each physical table map logical
+    keys to physical keys. Therefore, :meth:`insert` and :meth:`delete` do
+    not move cells. As long as no rows, columns or tables have been inserted
+    or deleted, logical and physical keys are equal.
+
+    Physical keys are indexed per table in sorted lists of filled rows and
+    columns and in sorted lists of the filled columns of each row and of the
+    filled rows of each column. The index is updated by all `dict`
+    operations that add or remove keys.
+
+    If `columnar` is `True` then literal numbers are stored in the typed
+    arrays of a :class:`ColumnStore` instead of the dict. These cells are
+    not part of the key index. Their code is recreated on access, and
+    :meth:`numeric_column` provides views of the arrays.
+
+    This class represents layer 1 of the model.
+
+    """
+
+    max_segments = 1024
+    """Maximum number of map segments before keys are rewritten"""
+
+    journal = None
+    """List that changes of cells and of the shape are appended to or None
+
+    Changes are tuples ("set", key, code), ("del", key), ("clear",),
+    ("insert", point, number, axis, table), ("delete", point, number, axis,
+    table) and ("shape", shape) with logical keys.
+
+    """
+
+    loader = None
+    """Loader of cells that are loaded on first access or None
+
+    A loader has the methods `load(key)`, `load_table(table)` and
+    `load_all()`, which add the cells around a key, of a table or all
+    remaining cells with :meth:`add_loaded`, and `close()`. Its attribute
+    `pending` is the number of cells that have not been loaded, and its
+    attribute `global_keys` contains the keys of cells whose code may
+    assign globals or is None if these are unknown. When all cells are
+    loaded, the loader is closed and removed. Key maps are not used while
+    there is a loader, see :meth:`set_loader`.
+
+    """
+
+    on_load = None
+    """Callable that is called with the keys of cells from the loader or None
+    """
+
+    def __init__(self, shape: Tuple[int, int, int], columnar: bool = False):
+        """
+        :param shape: Shape of the grid
+        :param columnar: Store literal numbers in typed column arrays
+
+        """
+
+        super().__init__()
+
+        self.shape = shape
+        self.columnar = columnar
+
+        # Instance of :class:`CellAttributes`
+        self.cell_attributes = CellAttributes()
+
+        # Macros as string
+        self.macros = u""
+
+        self.row_heights = defaultdict(float)  # Keys have format (row, table)
+        self.col_widths = defaultdict(float)  # Keys have format (col, table)
+
+        self._init_index()
+
+    def _init_index(self):
+        """Initializes the empty key index and identity key maps"""
+
+        self._row_index = {}  # table: {row: sorted columns}
+        self._column_index = {}  # table: {column: sorted rows}
+        self._sorted_rows = {}  # table: sorted filled rows
+        self._sorted_columns = {}  # table: sorted filled columns
+
+        self._table_map = AxisMap()
+        self._row_maps = {}  # physical table: AxisMap
+        self._column_maps = {}  # physical table: AxisMap
+        self._mapped = False  # True if any map is not the identity
+
+        # Literal numbers if columnar
+        self._columns = ColumnStore() if self.columnar else None
+
+    # Key mapping
+
+    def _to_physical(self, key: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        """Returns physical key of logical key
+
+        :param key: Logical cell key
+
+        """
+
+        if not self._mapped:
+            return key
+
+        row, column, table = key
+
+        table = self._table_map.to_physical(table)
+        if table in self._row_maps:
+            row = self._row_maps[table].to_physical(row)
+        if table in self._column_maps:
+            column = self._column_maps[table].to_physical(column)
+
+        return row, column, table
+
+    def _to_logical(self, key: Tuple[int, int, int]) -> Tuple[int, int, int]:
+        """Returns logical key of physical key that is in self
+
+        :param key: Physical cell key
+
+        """
+
+        if not self._mapped:
+            return key
+
+        row, column, table = key
+
+        if table in self._row_maps:
+            row = self._row_maps[table].to_logical(row)
+        if table in self._column_maps:
+            column = self._column_maps[table].to_logical(column)
+        table = self._table_map.to_logical(table)
+
+        return row, column, table
+
+    def _axis_map(self, table: int, axis: int) -> Optional[AxisMap]:
+        """Returns map of physical table for rows or columns or None
+
+        :param table: Physical table
+        :param axis: Rows if 0, columns if 1
+
+        """
+
+        return (self._column_maps if axis else self._row_maps).get(table)
+
+    # Cell loading
+
+    def set_loader(self, loader):
+        """Sets the loader of cells that are loaded on first access
+
+        The cells of the loader must not be in the grid.
+
+        :param loader: Loader with logical keys, see :attr:`loader`
+
+        """
+
+        self._load_all()
+        if self._mapped:
+            self._normalize()
+
+        self.loader = loader
+
+    def add_loaded(self, items: Iterable[Tuple[Tuple[int, int, int], Any]]):
+        """Adds cells from the loader without recording them in the journal
+
+        :param items: (key, code) pairs of loaded cells
+
+        """
+
+        journal, self.journal = self.journal, None
+        loader, self.loader = self.loader, None
+
+        keys = []
+
+        try:
+            if self._columns is not None:
+                for key, code in items:
+                    keys.append(key)
+                    self[key] = code
+            else:
+                # Keys are physical keys because there are no key maps
+                for key, code in items:
+                    keys.append(key)
+                    if not super().__contains__(key):
+                        self._index_add(key)
+                    super().__setitem__(key, code)
+        finally:
+            self.journal = journal
+            if loader is not None and loader.pending:
+                self.loader = loader
+            elif loader is not None:
+                loader.close()
+
+        if self.on_load is not None:
+            self.on_load(keys)
+
+    def _load_table(self, table: int):
+        """Loads the cells of a logical table
+
+        :param table: Logical table
+
+        """
+
+        if self.loader is not None:
+            self.loader.load_table(table)
+
+    def _load_all(self):
+        """Loads all cells"""
+
+        if self.loader is not None:
+            self.loader.load_all()
+
+    def loaded_keys(self) -> List[Tuple[int, int, int]]:
+        """Returns logical keys of cells that have been loaded
+
+        In contrast to :meth:`keys`, no cells are loaded.
+
+        """
+
+        keys = list(super().keys())
+        if self._columns:
+            keys.extend(self._columns.keys())
+
+        if not self._mapped:
+            return keys
+
+        return list(map(self._to_logical, keys))
+
+    def _normalize(self):
+        """Rewrites all keys so that logical and physical keys are equal"""
+
+        journal, self.journal = self.journal, None
+
+        items = list(self.items())
+        self.clear()
+        self.update(items)
+
+        self.journal = journal
+
+    # Key index
+
+    def _index_add(self, key: Tuple[int, int, int]):
+        """Adds new physical key to the key index
+
+        :param key: Physical cell key that has not been in self
+
+        """
+
+        row, column, table = key
+
+        try:
+            row_index = self._row_index[table]
+        except KeyError:
+            row_index = self._row_index[table] = {}
+            self._column_index[table] = {}
+            self._sorted_rows[table] = []
+            self._sorted_columns[table] = []
+
+        try:
+            insort(row_index[row], column)
+        except KeyError:
+            row_index[row] = [column]
+            insort(self._sorted_rows[table], row)
+
+        column_index = self._column_index[table]
+        try:
+            insort(column_index[column], row)
+        except KeyError:
+            column_index[column] = [row]
+            insort(self._sorted_columns[table], column)
+
+    def _index_remove(self, key: Tuple[int, int, int]):
+        """Removes physical key from the key index
+
+        :param key: Physical cell key that has been in self
+
+        """
+
+        row, column, table = key
+
+        for index, sorted_list, outer, inner in (
+                (self._row_index, self._sorted_rows, row, column),
+                (self._column_index, self._sorted_columns, column, row)):
+            inner_list = index[table][outer]
+            del inner_list[bisect_left(inner_list, inner)]
+            if not inner_list:
+                del index[table][outer]
+                outer_list = sorted_list[table]
+                del outer_list[bisect_left(outer_list, outer)]
+
+        if not self._sorted_rows[table]:
+            for index in (self._row_index, self._column_index,
+                          self._sorted_rows, self._sorted_columns):
+                del index[table]
+            self._drop_empty_maps(table)
+
+    def _drop_empty_maps(self, table: int):
+        """Removes key maps of table if it has no filled cells
+
+        Empty tables need no key maps.
+
+        :param table: Physical table
+
+        """
+
+        if table not in self._sorted_rows and \
+           (not self._columns or table not in self._columns.tables):
+            self._row_maps.pop(table, None)
+            self._column_maps.pop(table, None)
+
+    def _physical_tables(self) -> Iterable[int]:
+        """Returns physical tables with filled cells"""
+
+        if self._columns:
+            return set(self._sorted_rows).union(self._columns.tables)
+
+        return self._sorted_rows.keys()
+
+    def _sorted_lines(self, table: int, axis: int) -> List[int]:
+        """Returns sorted physical rows or columns with filled cells
+
+        :param table: Physical table
+        :param axis: Rows if 0, columns if 1
+
+        """
+
+        lines = (self._sorted_columns if axis
+                 else self._sorted_rows).get(table, [])
+
+        if not self._columns or table not in self._columns.tables:
+            return lines
+
+        if axis:
+            stored_lines = self._columns.columns(table)
+        else:
+            stored_lines = self._columns.rows(table)
+
+        return sorted(set(lines).union(stored_lines))
+
+    def _line_positions(self, table: int, axis: int, line: int) -> List[int]:
+        """Returns sorted physical positions of filled cells in one line
+
+        :param table: Physical table
+        :param axis: Row if 0, column if 1
+        :param line: Physical row or column
+
+        """
+
+        index = self._column_index if axis else self._row_index
+        positions = index.get(table, {}).get(line, [])
+
+        if not self._columns or table not in self._columns.tables:
+            return positions
+
+        if axis:
+            stored_positions = self._columns.column_rows(table, line)
+        else:
+            stored_positions = self._columns.row_columns(table, line)
+
+        return sorted(set(positions).union(stored_positions))
+
+    def _logical_tables(self, start: int = 0,
+                        stop: float = inf) -> List[Tuple[int, int]]:
+        """Returns sorted (logical, physical) tables with filled cells
+
+        :param start: Smallest logical table
+        :param stop: Logical table after the largest returned table
+
+        """
+
+        tables = []
+        for table in self._physical_tables():
+            logical_table = self._table_map.to_logical(table)
+            if logical_table is not None \
+               and start <= logical_table < stop:
+                tables.append((logical_table, table))
+
+        return sorted(tables)
+
+    def _logical_lines(self, table: int, axis: int, start: int = 0,
+                       stop: float = inf) -> List[Tuple[int, int]]:
+        """Returns sorted (logical, physical) filled rows or columns
+
+        :param table: Physical table
+        :param axis: Rows if 0, columns if 1
+        :param start: Smallest logical row or column
+        :param stop: Logical row or column after the largest returned one
+
+        """
+
+        sorted_lines = self._sorted_lines(table, axis)
+        axis_map = self._axis_map(table, axis)
+
+        if axis_map is None:
+            segments = [(start, stop, 0)]
+        else:
+            segments = axis_map.segments(start, stop)
+
+        lines = []
+        for segment_start, segment_stop, offset in segments:
+            lower = bisect_left(sorted_lines, segment_start + offset)
+            upper = bisect_left(sorted_lines, segment_stop + offset)
+            lines.extend((line - offset, line)
+                         for line in sorted_lines[lower:upper])
+
+        return lines
+
+    def _logical_line(self, table: int, axis: int, line: int) -> List[int]:
+        """Returns sorted logical positions of filled cells in one line
+
+        :param table: Physical table
+        :param axis: Row if 0, column if 1
+        :param line: Physical row or column
+
+        """
+
+        positions = self._line_positions(table, axis, line)
+
+        axis_map = self._axis_map(table, 1 - axis)
+
+        if axis_map is None or axis_map.is_identity:
+            return list(positions)
+
+        return sorted(map(axis_map.to_logical, positions))
+
+    # dict interface with logical keys
+
+    def __getitem__(self, key: Tuple[int, int, int]) -> Any:
+        """
+        :param key: Cell key
+
+        """
+        shape = self.shape
+
+        for axis, key_ele in enumerate(key):
+            if shape[axis] <= key_ele or key_ele < -shape[axis]:
+                msg = "Grid index {key} outside grid shape {shape}."
+                msg = msg.format(key=key, shape=shape)
+                raise IndexError(msg)
+
+        if self.loader is not None:
+            self.loader.load(key)
+
+        key = self._to_physical(key)
+        code = super().__getitem__(key)
+
+        if code is None and self._columns:
+            return self._columns.get(key)
+
+        return code
+
+    def __missing__(self, key):
+        """Default value is None"""
+
+        return
+
+    def __setitem__(self, key: Tuple[int, int, int], value: Any):
+        """dict __setitem__ that updates the key index
+
+        :param key: Cell key
+        :param value: Cell code
+
+        """
+
+        if self.journal is not None:
+            self.journal.append(("set", key, value))
+
+        if self.loader is not None:
+            self.loader.load(key)
+
+        key = self._to_physical(key)
+
+        if self._columns is not None and self._columns.set(key, value):
+            if super().__contains__(key):
+                super().__delitem__(key)
+                self._index_remove(key)
+            return
+
+        if not super().__contains__(key):
+            self._index_add(key)
+
+        super().__setitem__(key, value)
+
+        if self._columns:
+            self._columns.remove(key)
+
+    def __delitem__(self, key: Tuple[int, int, int]):
+        """dict __delitem__ that updates the key index
+
+        :param key: Cell key
+
+        """
+
+        if self.loader is not None:
+            self.loader.load(key)
+
+        physical_key = self._to_physical(key)
+
+        if self._columns and self._columns.remove(physical_key):
+            self._drop_empty_maps(physical_key[2])
+        else:
+            try:
+                super().__delitem__(physical_key)
+            except KeyError:
+                raise KeyError(key)
+
+            self._index_remove(physical_key)
+
+        if self.journal is not None:
+            self.journal.append(("del", key))
+
+    def __contains__(self, key: Tuple[int, int, int]) -> bool:
+        """True if cell key has code
+
+        :param key: Cell key
+
+        """
+
+        try:
+            if self.loader is not None:
+                self.loader.load(key)
+            key = self._to_physical(key)
+        except (TypeError, ValueError):
+            return False
+
+        if super().__contains__(key):
+            return True
+
+        return bool(self._columns) and key in self._columns
+
+    def __len__(self) -> int:
+        length = super().__len__()
+
+        if self._columns:
+            length += len(self._columns)
+
+        if self.loader is not None:
+            length += self.loader.pending
+
+        return length
+
+    def _physical_keys(self) -> Iterable[Tuple[int, int, int]]:
+        """Returns physical keys"""
+
+        self._load_all()
+
+        if self._columns:
+            return chain(list(super().keys()), list(self._columns.keys()))
+
+        return super().keys()
+
+    def __iter__(self) -> Iterable[Tuple[int, int, int]]:
+        """Yields logical keys"""
+
+        if not self._mapped:
+            return iter(self._physical_keys())
+
+        return map(self._to_logical, list(self._physical_keys()))
+
+    def __eq__(self, other) -> bool:
+        self._load_all()
+        if isinstance(other, DictGrid):
+            other._load_all()
+
+        if not self._mapped and not self._columns \
+           and not getattr(other, "_mapped", False) \
+           and not getattr(other, "_columns", None):
+            return super().__eq__(other)
+
+        if isinstance(other, DictGrid):
+            other = dict(other.items())
+
+        return dict(self.items()) == other
+
+    def __ne__(self, other) -> bool:
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+    def get(self, key: Tuple[int, int, int], default: Any = None) -> Any:
+        """dict get for logical keys
+
+        :param key: Cell key
+        :param default: Value that is returned if key is not in self
+
+        """
+
+        if self.loader is not None:
+            self.loader.load(key)
+
+        key = self._to_physical(key)
+
+        if self._columns and key in self._columns:
+            return self._columns.get(key)
+
+        return super().get(key, default)
+
+    def keys(self) -> Iterable[Tuple[int, int, int]]:
+        """Returns logical keys"""
+
+        self._load_all()
+
+        if not self._mapped and not self._columns:
+            return super().keys()
+
+        return list(self)
+
+    def values(self) -> Iterable[Any]:
+        """Returns code"""
+
+        self._load_all()
+
+        if not self._columns:
+            return super().values()
+
+        return [value for _, value in self.items()]
+
+    def items(self) -> Iterable[Tuple[Tuple[int, int, int], Any]]:
+        """Returns (logical key, code) pairs"""
+
+        self._load_all()
+
+        if self._columns:
+            items = chain(super().items(), self._columns.items())
+        elif not self._mapped:
+            return super().items()
+        else:
+            items = super().items()
+
+        return [(self._to_logical(key), value) for key, value in items]
+
+    def copy(self) -> dict:
+        """Returns dict of logical keys and code"""
+
+        return dict(self.items())
+
+    def pop(self, key: Tuple[int, int, int], *args) -> Any:
+        """dict pop that updates the key index
+
+        :param key: Cell key
+        :param args: Optional default value
+
+        """
+
+        if self.loader is not None:
+            self.loader.load(key)
+
+        physical_key = self._to_physical(key)
+
+        if super().__contains__(physical_key):
+            value = super().pop(physical_key)
+            self._index_remove(physical_key)
+            if self.journal is not None:
+                self.journal.append(("del", key))
+            return value
+
+        if self._columns and physical_key in self._columns:
+            value = self._columns.get(physical_key)
+            del self[key]
+            return value
+
+        return super().pop(physical_key, *args)
+
+    def popitem(self) -> Tuple[Tuple[int, int, int], Any]:
+        """dict popitem that updates the key index"""
+
+        self._load_all()
+
+        if self._columns and not super().__len__():
+            key = self._to_logical(next(self._columns.keys()))
+            return key, self.pop(key)
+
+        key, value = super().popitem()
+        self._index_remove(key)
+        key = self._to_logical(key)
+
+        if self.journal is not None:
+            self.journal.append(("del", key))
+
+        return key, value
+
+    def setdefault(self, key: Tuple[int, int, int], default: Any = None):
+        """dict setdefault that updates the key index
+
+        :param key: Cell key
+        :param default: Value that is set if key is not in self
+
+        """
+
+        if key not in self:
+            self[key] = default
+
+        return self.get(key)
+
+    def update(self, *args, **kwargs):
+        """dict update that updates the key index"""
+
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        """dict clear that clears the key index and the key maps"""
+
+        if self.loader is not None:
+            self.loader.close()
+            self.loader = None
+
+        super().clear()
+        self._init_index()
+
+        if self.journal is not None:
+            self.journal.append(("clear",))
+
+    def __reduce__(self) -> tuple:
+        """Pickles and copies logical keys without key index and maps"""
+
+        state = {key: value for key, value in self.__dict__.items()
+                 if key not in self._init_state_keys
+                 and key not in ("journal", "loader", "on_load")}
+
+        return self._from_state, (state, dict(self.items()))
+
+    _init_state_keys = ("_row_index", "_column_index", "_sorted_rows",
+                        "_sorted_columns", "_table_map", "_row_maps",
+                        "_column_maps", "_mapped", "_columns")
+
+    @classmethod
+    def _from_state(cls, state: dict, items: dict):
+        """Returns DictGrid from pickled state
+
+        :param state: Instance attributes
+        :param items: Dict content
+
+        """
+
+        dict_grid = cls.__new__(cls)
+        dict_grid.__dict__.update(state)
+        dict_grid._init_index()
+        dict_grid.update(items)
+        return dict_grid
+
+    def snapshot(self) -> "DictGridSnapshot":
+        """Returns a read-only snapshot that is not affected by changes"""
+
+        self._load_all()
+
+        return DictGridSnapshot(self)
+
+    def numeric_column(self, column: int, table: int, start: int = 0,
+                       stop: int = None
+                       ) -> Iterable[Tuple[int, numpy.ndarray, numpy.ndarray]]:
+        """Yields (first row, values, mask) array views of a column range
+
+        Only literal numbers in columnar storage are covered. The numpy
+        arrays are views of the storage and must not be altered. The mask
+        is True for rows that contain a number.
+
+        :param column: Column of the range
+        :param table: Table of the range
+        :param start: First row of the range
+        :param stop: Row after the range, None means the last row
+
+        """
+
+        if not self._columns:
+            return
+
+        self._load_table(table)
+
+        if stop is None:
+            stop = self.shape[0]
+
+        physical_table = self._table_map.to_physical(table)
+        column_map = self._axis_map(physical_table, 1)
+        if column_map is not None:
+            column = column_map.to_physical(column)
+
+        try:
+            numeric_column = self._columns.tables[physical_table][column]
+        except KeyError:
+            return
+
+        row_map = self._axis_map(physical_table, 0)
+        if row_map is None:
+            segments = [(start, stop, 0)]
+        else:
+            segments = row_map.segments(start, stop)
+
+        for segment_start, segment_stop, offset in segments:
+            for row, values, mask in numeric_column.chunks(
+                    segment_start + offset, segment_stop + offset):
+                yield row - offset, values, mask
+
+    # Structural changes
+
+    def insert(self, insertion_point: int, no_to_insert: int, axis: int,
+               tab: int = None):
+        """Inserts no_to_insert empty rows/cols/tabs before insertion_point
+
+        Cells that are moved beyond the grid shape are deleted.
+
+        :param insertion_point: Point on axis at which insertion takes place
+        :param no_to_insert: Number of rows/cols/tabs to be inserted (>=0)
+        :param axis: Row/Column/Table insertion if 0/1/2 must be in 0, 1, 2
+        :param tab: Table at which insertion takes place, None means all tables
+
+        """
+
+        if no_to_insert <= 0:
+            return
+
+        self._load_all()
+
+        insertion_point = max(insertion_point, 0)
+
+        # Cells that would be moved beyond the grid shape
+        stop = self.shape[axis]
+        for key in self.keys_from(axis,
+                                  max(insertion_point, stop - no_to_insert),
+                                  tab, stop=stop):
+            del self[key]
+
+        if axis == 2:
+            self._table_map.insert(insertion_point, no_to_insert)
+        else:
+            self._insert_lines(insertion_point, no_to_insert, axis, tab)
+
+        self._mapped = True
+        self._check_segments()
+
+        if self.journal is not None:
+            self.journal.append(("insert", insertion_point, no_to_insert,
+                                 axis, tab))
+
+    def delete(self, deletion_point: int, no_to_delete: int, axis: int,
+               tab: int = None):
+        """Deletes no_to_delete rows/cols/tabs starting with deletion_point
+
+        :param deletion_point: Point on axis at which deletion takes place
+        :param no_to_delete: Number of rows/cols/tabs to be deleted (>=0)
+        :param axis: Row/Column/Table deletion if 0/1/2, must be in 0, 1, 2
+        :param tab: Table at which deletion takes place, None means all tables
+
+        """
+
+        stop = deletion_point + no_to_delete
+        deletion_point = max(deletion_point, 0)
+        no_to_delete = stop - deletion_point
+
+        if no_to_delete <= 0:
+            return
+
+        self._load_all()
+
+        for key in self.keys_from(axis, deletion_point, tab, stop=stop):
+            del self[key]
+
+        if axis == 2:
+            self._table_map.delete(deletion_point, no_to_delete)
+        else:
+            self._insert_lines(deletion_point, -no_to_delete, axis, tab)
+
+        self._mapped = True
+        self._check_segments()
+
+        if self.journal is not None:
+            self.journal.append(("delete", deletion_point, no_to_delete,
+                                 axis, tab))
+
+    def _insert_lines(self, point: int, number: int, axis: int,
+                      tab: Optional[int]):
+        """Inserts or deletes rows or columns in the maps of tables
+
+        :param point: Logical row or column of insertion or deletion
+        :param number: Number of inserted lines, deletion if negative
+        :param axis: Rows if 0, columns if 1
+        :param tab: Logical table, None means all tables
+
+        """
+
+        maps = self._column_maps if axis else self._row_maps
+
+        if tab is None:
+            tables = list(self._physical_tables())
+        elif self._table_map.to_physical(tab) in self._physical_tables():
+            tables = [self._table_map.to_physical(tab)]
+        else:
+            tables = []
+
+        for table in tables:
+            try:
+                axis_map = maps[table]
+            except KeyError:
+                axis_map = maps[table] = AxisMap()
+
+            if number > 0:
+                axis_map.insert(point, number)
+            else:
+                axis_map.delete(point, -number)
+
+    def _check_segments(self):
+        """Rewrites keys if the maps have become too fragmented"""
+
+        segments = len(self._table_map)
+        segments += sum(map(len, self._row_maps.values()))
+        segments += sum(map(len, self._column_maps.values()))
+
+        if segments > self.max_segments:
+            self._normalize()
+
+    # Key index queries
+
+    def bbox(self, table: int) -> Optional[Tuple[int, int, int, int]]:
+        """Returns (top, left, bottom, right) of filled cells of table
+
+        Returns None if there are no filled cells in the table.
+
+        :param table: Table of the bounding box
+
+        """
+
+        self._load_table(table)
+
+        table = self._table_map.to_physical(table)
+
+        if table not in self._physical_tables():
+            return
+
+        bbox = []
+        for axis in 0, 1:
+            axis_map = self._axis_map(table, axis)
+            if axis_map is None or axis_map.is_identity:
+                lines = self._sorted_lines(table, axis)
+                bbox.append((lines[0], lines[-1]))
+            else:
+                lines = self._logical_lines(table, axis)
+                bbox.append((lines[0][0], lines[-1][0]))
+
+        (top, bottom), (left, right) = bbox
+
+        return top, left, bottom, right
+
+    def tables(self) -> List[int]:
+        """Returns sorted list of tables that contain filled cells"""
+
+        self._load_all()
+
+        return [table for table, _ in self._logical_tables()]
+
+    def table_keys(self, table: int) -> Iterable[Tuple[int, int, int]]:
+        """Yields keys of a table sorted by column and row
+
+        :param table: Table of the keys
+
+        """
+
+        self._load_table(table)
+
+        physical_table = self._table_map.to_physical(table)
+        if physical_table not in self._physical_tables():
+            return
+
+        for column, physical_column in self._logical_lines(physical_table, 1):
+            for row in self._logical_line(physical_table, 1, physical_column):
+                yield row, column, table
+
+    def column_rows(self, column: int, table: int, start: int = 0,
+                    stop: float = inf) -> List[int]:
+        """Returns sorted rows of filled cells in a column range
+
+        :param column: Column of the range
+        :param table: Table of the range
+        :param start: First row of the range
+        :param stop: Row after the range
+
+        """
+
+        self._load_table(table)
+
+        physical_table = self._table_map.to_physical(table)
+        lines = self._logical_lines(physical_table, 1, column, column + 1)
+        if not lines:
+            return []
+
+        rows = self._logical_line(physical_table, 1, lines[0][1])
+
+        return rows[bisect_left(rows, start):bisect_left(rows, stop)]
+
+    def keys_from(self, axis: int, point: int, table: int = None,
+                  stop: float = inf) -> List[Tuple[int, int, int]]:
+        """Returns keys that are at or beyond point on axis
+
+        :param axis: Row/Column/Table if 0/1/2
+        :param point: Smallest row/column/table of the returned keys
+        :param table: Limit keys to this table, None means all tables
+        :param stop: Row/column/table after the largest returned one
+
+        """
+
+        if table is None:
+            self._load_all()
+            tables = self._logical_tables()
+        else:
+            self._load_table(table)
+            tables = self._logical_tables(table, table + 1)
+
+        keys = []
+
+        if axis == 2:
+            for logical_table, _ in tables:
+                if point <= logical_table < stop:
+                    keys.extend(self.table_keys(logical_table))
+            return keys
+
+        for logical_table, physical_table in tables:
+            lines = self._logical_lines(physical_table, axis, point, stop)
+            for line, physical_line in lines:
+                for pos in self._logical_line(physical_table, axis,
+                                              physical_line):
+                    if axis == 0:
+                        keys.append((line, pos, logical_table))
+                    else:
+                        keys.append((pos, line, logical_table))
+
+        return keys
+
+    def keys_beyond(self, shape: Tuple[int, int, int]
+                    ) -> List[Tuple[int, int, int]]:
+        """Returns keys that are outside shape
+
+        :param shape: Grid shape
+
+        """
+
+        rows, columns, tables = shape
+
+        keys = set(self.keys_from(2, tables))
+        keys.update(self.keys_from(0, rows))
+        keys.update(self.keys_from(1, columns))
+
+        return list(keys)
+
+    def search_keys(self, startkey: Tuple[int, int, int],
+                    reverse: bool = False) -> Iterable[Tuple[int, int, int]]:
+        """Yields keys of the table of startkey in search order
+
+        Keys are sorted by column and row, starting with startkey and
+        wrapping around at the end of the table.
+
+        :param startkey: First key to be yielded if it is filled
+        :param reverse: Search direction reversed if True
+
+        """
+
+        start_row, start_column, table = startkey
+
+        self._load_table(table)
+
+        physical_table = self._table_map.to_physical(table)
+        if physical_table not in self._physical_tables():
+            return
+
+        lines = self._logical_lines(physical_table, 1)
+        columns = [column for column, _ in lines]
+        physical_columns = dict(lines)
+
+        def column_rows(column):
+            if column not in physical_columns:
+                return []
+            return self._logical_line(physical_table, 1,
+                                      physical_columns[column])
+
+        def column_keys(column, start=None, stop=None):
+            rows = column_rows(column)[start:stop]
+            if reverse:
+                rows = rows[::-1]
+            return [(row, column, table) for row in rows]
+
+        start_rows = column_rows(start_column)
+
+        if reverse:
+            pos = bisect_right(columns, start_column)
+            split = bisect_right(start_rows, start_row)
+            yield from column_keys(start_column, stop=split)
+            for column in columns[:pos][::-1]:
+                if column != start_column:
+                    yield from column_keys(column)
+            for column in columns[pos:][::-1]:
+                yield from column_keys(column)
+            yield from column_keys(start_column, start=split)
+
+        else:
+            pos = bisect_left(columns, start_column)
+            split = bisect_left(start_rows, start_row)
+            yield from column_keys(start_column, start=split)
+            for column in columns[pos:]:
+                if column != start_column:
+                    yield from column_keys(column)
+            for column in columns[:pos]:
+                yield from column_keys(column)
+            yield from column_keys(start_column, stop=split)
+
+# End of class DictGrid
+
+# -----------------------------------------------------------------------------
+
+
+class DictGridSnapshot:
+    """Read-only snapshot of the data of a :class:`DictGrid`
+
+    Taking a snapshot copies references to the physical keys and the code
+    into lists, which takes milliseconds for millions of cells. Key maps,
+    number columns, cell attributes, row heights, column widths and macros
+    are copied, too. Logical keys are computed when the snapshot is read.
+    Therefore, a snapshot can be read, e.g. by a `PysWriter`, in a worker
+    thread while the grid is changed.
+
+    Code is accessed with :meth:`items`. There is no key index.
+
+    """
+
+    def __init__(self, dict_grid: DictGrid):
+        """
+        :param dict_grid: Grid of which the snapshot is taken
+
+        """
+
+        self.shape = dict_grid.shape
+        self.macros = dict_grid.macros
+        self.cell_attributes = CellAttributes(dict_grid.cell_attributes)
+        self.row_heights = dict_grid.row_heights.copy()
+        self.col_widths = dict_grid.col_widths.copy()
+
+        self._keys = list(dict.keys(dict_grid))
+        self._code = list(dict.values(dict_grid))
+
+        self._mapped = dict_grid._mapped
+        self._table_map = dict_grid._table_map.copy()
+        self._row_maps = {table: axis_map.copy()
+                          for table, axis_map in dict_grid._row_maps.items()}
+        self._column_maps = {
+            table: axis_map.copy()
+            for table, axis_map in dict_grid._column_maps.items()}
+
+        if dict_grid._columns:
+            self._columns = dict_grid._columns.copy()
+        else:
+            self._columns = None
+
+    _to_logical = DictGrid._to_logical
+
+    def __len__(self) -> int:
+        if self._columns:
+            return len(self._keys) + len(self._columns)
+
+        return len(self._keys)
+
+    def __iter__(self) -> Iterable[Tuple[int, int, int]]:
+        """Yields logical keys"""
+
+        for key, _ in self.items():
+            yield key
+
+    def items(self) -> Iterable[Tuple[Tuple[int, int, int], Any]]:
+        """Yields (logical key, code) pairs in the order of DictGrid.items"""
+
+        items = zip(self._keys, self._code)
+        if self._columns:
+            items = chain(items, self._columns.items())
+
+        if not self._mapped:
+            yield from items
+            return
+
+        for key, code in items:
+            yield self._to_logical(key), code
+
+# End of class DictGridSnapshot
+
+# -----------------------------------------------------------------------------
+
+
+class DataArray:
+    """DataArray provides enhanced grid read/write access.
+
+    Enhancements comprise:
+     * Slicing
+     * Multi-dimensional operations such as insertion and deletion along one
+       axis
+
+    This class represents layer 2 of the model.
+
+    """
+
+    def __init__(self, shape: Tuple[int, int, int], settings: Settings):
+        """
+        :param shape: Shape of the grid
+        :param settings: Pyspread settings
+
+        """
+
+        self.dict_grid = DictGrid(shape, settings.columnar_storage)
+        self.settings = settings
+
+    def __eq__(self, other) -> bool:
+        if not hasattr(other, "dict_grid") or \
+           not hasattr(other, "cell_attributes"):
+            return False
+
+        return self.dict_grid == other.dict_grid and \
+            self.cell_attributes == other.cell_attributes
+
+    def __ne__(self, other) -> bool:
+        return not self.__eq__(other)
+
+    @property
+    def data(self) -> dict:
+        """Returns `dict` of data content.
+
+
+        - Data is the central content interface for loading / saving data.
+        - It shall be used for loading and saving from and to `.pys` and other
+          files.
+        - It shall be used for loading and saving macros.
+        - However, it is not used for importing and exporting data because
+          these operations are partial to the grid.
+
+        **Content of returned dict**
+
+        :param shape: Grid shape
+        :type shape: Tuple[int, int, int]
+        :param grid: Cell content
+        :type grid: Dict[Tuple[int, int, int], str]
+        :param attributes: Cell attributes
+        :type attributes: CellAttribute
+        :param row_heights: Row heights
+        :type row_heights: defaultdict[Tuple[int, int], float]
+        :param col_widths: Column widths
+        :type col_widths: defaultdict[Tuple[int, int], float]
+        :param macros: Macros
+        :type macros: str
+
+        """
+
+        data = {}
+
+        data["shape"] = self.shape
+        data["grid"] = {}.update(self.dict_grid)
+        data["attributes"] = self.cell_attributes[:]
+        data["row_heights"] = self.row_heights
+        data["col_widths"] = self.col_widths
+        data["macros"] = self.macros
+
+        return data
+
+    @data.setter
+    def data(self, **kwargs):
+        """Sets data from given parameters
+
+        Old values are deleted.
+        If a paremeter is not given, nothing is changed.
+
+        **Content of kwargs dict**
+
+        :param shape: Grid shape
+        :type shape: Tuple[int, int, int]
+        :param grid: Cell content
+        :type grid: Dict[Tuple[int, int, int], str]
+        :param attributes: Cell attributes
+        :type attributes: CellAttribute
+        :param row_heights: Row heights
+        :type row_heights: defaultdict[Tuple[int, int], float]
+        :param col_widths: Column widths
+        :type col_widths: defaultdict[Tuple[int, int], float]
+        :param macros: Macros
+        :type macros: str
+
+        """
+
+        if "shape" in kwargs:
+            self.shape = kwargs["shape"]
+
+        if "grid" in kwargs:
+            self.dict_grid.clear()
+            self.dict_grid.update(kwargs["grid"])
+
+        if "attributes" in kwargs:
+            self.attributes[:] = kwargs["attributes"]
+
+        if "row_heights" in kwargs:
+            self.row_heights = kwargs["row_heights"]
+
+        if "col_widths" in kwargs:
+            self.col_widths = kwargs["col_widths"]
+
+        if "macros" in kwargs:
+            self.macros = kwargs["macros"]
+
+    @property
+    def row_heights(self) -> defaultdict:
+        """row_heights interface to dict_grid"""
+
+        return self.dict_grid.row_heights
+
+    @row_heights.setter
+    def row_heights(self, row_heights: defaultdict):
+        """row_heights interface to dict_grid"""
+
+        self.dict_grid.row_heights = row_heights
+
+    @property
+    def col_widths(self) -> defaultdict:
+        """col_widths interface to dict_grid"""
+
+        return self.dict_grid.col_widths
+
+    @col_widths.setter
+    def col_widths(self, col_widths: defaultdict):
+        """col_widths interface to dict_grid"""
+
+        self.dict_grid.col_widths = col_widths
+
+    @property
+    def cell_attributes(self) -> CellAttributes:
+        """cell_attributes interface to dict_grid"""
+
+        return self.dict_grid.cell_attributes
+
+    @cell_attributes.setter
+    def cell_attributes(self, value: CellAttributes):
+        """cell_attributes interface to dict_grid"""
+
+        # First empty cell_attributes
+        self.cell_attributes[:] = []
+        self.cell_attributes.extend(value)
+
+    @property
+    def macros(self) -> str:
+        """macros interface to dict_grid"""
+
+        return self.dict_grid.macros
+
+    @macros.setter
+    def macros(self, macros: str):
+        """Sets  macros string"""
+
+        self.dict_grid.macros = macros
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """Returns dict_grid shape"""
+
+        return self.dict_grid.shape
+
+    @shape.setter
+    def shape(self, shape: Tuple[int, int, int]):
+        """Deletes all cells beyond new shape and sets dict_grid shape
+
+        Returns a dict of the deleted cells' contents
+
+        :param shape: Target shape for grid
+
+        """
+
+        # Delete each cell that is beyond new borders
+
+        old_shape = self.shape
+        deleted_cells = {}
+
+        if any(new_axis < old_axis
+               for new_axis, old_axis in zip(shape, old_shape)):
+            for key in self.dict_grid.keys_beyond(shape):
+                deleted_cells[key] = self.pop(key)
+
+        # Set dict_grid shape attribute
+        self.dict_grid.shape = shape
+
+        if self.dict_grid.journal is not None:
+            self.dict_grid.journal.append(("shape", shape))
+
+        self._adjust_rowcol(0, 0, 0)
+        self._adjust_cell_attributes(0, 0, 0)
+
+        return deleted_cells
+
+    def __iter__(self) -> Iterable:
+        """Returns iterator over self.dict_grid"""
+
+        return iter(self.dict_grid)
+
+    def __contains__(self, key: Tuple[int, int, int]) -> bool:
+        """True if key is contained in grid
+
+        Handles single keys only.
+
+        :param key: Key of cell to be checked
+
+        """
+
+        if any(not isinstance(ele, int) for ele in key):
+            return NotImplemented
+
+        row, column, table = key
+        rows, columns, tables = self.shape
+
+        return (0 <= row <= rows
+                and 0 <= column <= columns
+                and 0 <= table <= tables)
+
+    # Slice support
+
+    def __getitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                     Union[int, slice]]
+                    ) -> Union[str, Iterable[str], Iterable[Iterable[str]],
+                               Iterable[Iterable[Iterable[str]]]]:
+        """Adds slicing access to cell code retrieval
+
+        The cells are returned as a generator of generators, of ... of unicode.
+
+        :param key: Keys of the cell code that is returned
+
+        Note
+        ----
+        Classical Excel type addressing (A$1, ...) may be added here later
+
+        """
+
+        for key_ele in key:
+            if isinstance(key_ele, slice):
+                # We have something slice-like here
+                return self.cell_array_generator(key)
+
+            if is_stringlike(key_ele):
+                # We have something string-like here
+                msg = "Cell string based access not implemented"
+                raise NotImplementedError(msg)
+
+        # key_ele should be a single cell
+
+        return self.dict_grid[key]
+
+    def __setitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                     Union[int, slice]], value: str):
+        """Accepts index and slice keys
+
+        :param key: Cell key(s) that shall be set
+        :param value: Code for cell(s) to be set
+
+        """
+
+        single_keys_per_dim = []
+
+        for axis, key_ele in enumerate(key):
+            if isinstance(key_ele, slice):
+                # We have something slice-like here
+
+                length = self.shape[axis]
+                slice_range = range(*key_ele.indices(length))
+                single_keys_per_dim.append(slice_range)
+
+            elif is_stringlike(key_ele):
+                # We have something string-like here
+
+                raise NotImplementedError
+
+            else:
+                # key_ele is a single cell
+
+                single_keys_per_dim.append((key_ele, ))
+
+        single_keys = product(*single_keys_per_dim)
+
+        for single_key in single_keys:
+            if value:
+                # Never change merged cells
+                merging_cell = \
+                    self.cell_attributes.get_merging_cell(single_key)
+                if ((merging_cell is None or merging_cell == single_key) and
+                        isinstance(value, str)):
+                    self.dict_grid[single_key] = value
+            else:
+                # Value is empty --> delete cell
+                try:
+                    self.pop(key)
+
+                except (KeyError, TypeError):
+                    pass
+
+    # Pickle support
+
+    def __getstate__(self) -> Dict[str, DictGrid]:
+        """Returns dict_grid for pickling
+
+        Note that all persistent data is contained in the DictGrid class
+
+        """
+
+        return {"dict_grid": self.dict_grid}
+
+    def snapshot(self) -> "DataArray":
+        """Returns a DataArray with a :class:`DictGridSnapshot` of the data
+
+        The snapshot can be written by a `PysWriter` in a worker thread
+        while self is changed.
+
+        """
+
+        data_array = DataArray(self.shape, self.settings)
+        data_array.dict_grid = self.dict_grid.snapshot()
+        return data_array
+
+    def get_row_height(self, row: int, tab: int) -> float:
+        """Returns row height
+
+        :param row: Row for which height is retrieved
+        :param tab: Table for which for which row height is retrieved
+
+        """
+
+        try:
+            return self.row_heights[(row, tab)]
+
+        except KeyError:
+            return
+
+    def get_col_width(self, col: int, tab: int) -> float:
+        """Returns column width
+
+        :param col: Column for which width is retrieved
+        :param tab: Table for which for which column width is retrieved
+
+        """
+
+        try:
+            return self.col_widths[(col, tab)]
+
+        except KeyError:
+            return
+
+    def keys(self) -> List[Tuple[int, int, int]]:
+        """Returns keys in self.dict_grid"""
+
+        return list(self.dict_grid.keys())
+
+    def pop(self, key: Tuple[int, int, int]) -> Any:
+        """dict_grid pop wrapper
+
+        :param key: Cell key
+
+        """
+
+        return self.dict_grid.pop(key)
+
+    def get_last_filled_cell(self, table: int = None) -> Tuple[int, int, int]:
+        """Returns key for the bottommost rightmost cell with content
+
+        :param table: Limit search to this table
+
+        """
+
+        maxrow = 0
+        maxcol = 0
+
+        if table is None:
+            tables = self.dict_grid.tables()
+        else:
+            tables = [table]
+
+        for tab in tables:
+            bbox = self.dict_grid.bbox(tab)
+            if bbox is not None:
+                maxrow = max(bbox[2], maxrow)
+                maxcol = max(bbox[3], maxcol)
+
+        return maxrow, maxcol, table
+
+    def cell_array_generator(self,
+                             key: Tuple[Union[int, slice], Union[int, slice],
+                                        Union[int, slice]]) -> Iterable[str]:
+        """Generator traversing cells specified in key
+
+        Yields cells' contents.
+
+        :param key: Specifies the cell keys of the generator
+
+        """
+
+        for i, key_ele in enumerate(key):
+
+            # Recursively replace first element of key that is a slice
+            if isinstance(key_ele, slice):
+                slc_keys = range(*key_ele.indices(self.dict_grid.shape[i]))
+                key_list = list(key)
+
+                key_list[i] = None
+
+                has_subslice = any(isinstance(ele, slice) for ele in key_list)
+
+                for slc_key in slc_keys:
+                    key_list[i] = slc_key
+
+                    if has_subslice:
+                        # If there is a slice left yield generator
+                        yield self.cell_array_generator(key_list)
+
+                    else:
+                        # No slices? Yield value
+                        yield self[tuple(key_list)]
+
+                break
+
+    def _shift_rowcol(self, insertion_point: int, no_to_insert: int):
+        """Shifts row and column sizes when a table is inserted or deleted
+
+        :param insertion_point: Table at which a new table is inserted
+        :param no_to_insert: Number of tables that are inserted
+
+        """
+
+        # Shift row heights
+
+        new_row_heights = {}
+        del_row_heights = []
+
+        for row, tab in self.row_heights:
+            if tab >= insertion_point:
+                new_row_heights[(row, tab + no_to_insert)] = \
+                    self.row_heights[(row, tab)]
+                del_row_heights.append((row, tab))
+
+        for row, tab in new_row_heights:
+            self.set_row_height(row, tab, new_row_heights[(row, tab)])
+
+        for row, tab in del_row_heights:
+            if (row, tab) not in new_row_heights:
+                self.set_row_height(row, tab, None)
+
+        # Shift column widths
+
+        new_col_widths = {}
+        del_col_widths = []
+
+        for col, tab in self.col_widths:
+            if tab >= insertion_point:
+                new_col_widths[(col, tab + no_to_insert)] = \
+                    self.col_widths[(col, tab)]
+                del_col_widths.append((col, tab))
+
+        for col, tab in new_col_widths:
+            self.set_col_width(col, tab, new_col_widths[(col, tab)])
+
+        for col, tab in del_col_widths:
+            if (col, tab) not in new_col_widths:
+                self.set_col_width(col, tab, None)
+
+    def _adjust_rowcol(self, insertion_point: int, no_to_insert: int,
+                       axis: int, tab: int = None):
+        """Adjusts row and column sizes on insertion/deletion
+
+        :param insertion_point: Point on axis at which insertion takes place
+        :param no_to_insert: Number of rows or columns that are inserted
+        :param axis: Row insertion if 0, column insertion if 1, must be in 0, 1
+        :param tab: Table at which insertion takes place, None means all tables
+
+        """
+
+        if axis == 2:
+            self._shift_rowcol(insertion_point, no_to_insert)
+            return
+
+        if axis not in (0, 1):
+            raise Warning("Axis {} not in (0, 1)".format(axis))
+            return
+
+        cell_sizes = self.col_widths if axis else self.row_heights
+        set_cell_size = self.set_col_width if axis else self.set_row_height
+
+        new_sizes = {}
+        del_sizes = []
+
+        for pos, table in cell_sizes:
+            if pos >= insertion_point and (tab is None or tab == table):
+                if 0 <= pos + no_to_insert < self.shape[axis]:
+                    new_sizes[(pos + no_to_insert, table)] = \
+                        cell_sizes[(pos, table)]
+                if pos < insertion_point + no_to_insert:
+                    new_sizes[(pos, table)] = cell_sizes[(pos, table)]
+                del_sizes.append((pos, table))
+
+        for pos, table in new_sizes:
+            set_cell_size(pos, table, new_sizes[(pos, table)])
+
+        for pos, table in del_sizes:
+            if (pos, table) not in new_sizes:
+                set_cell_size(pos, table, None)
+
+    def _adjust_merge_area(
+            self, attrs: AttrDict, insertion_point: int, no_to_insert: int,
+            axis: int) -> Tuple[int, int, int, int]:
+        """Returns an updated merge area
+
+        :param attrs: Cell attribute dictionary that shall be adjusted
+        :param insertion_point: Point on axis at which insertion takes place
+        :param no_to_insert: Number of rows/cols/tabs to be inserted (>=0)
+        :param axis: Row insertion if 0, column insertion if 1, must be in 0, 1
+
+        """
+
+        if axis not in (0, 1):
+            raise Warning("Axis {} not in (0, 1)".format(axis))
+            return
+
+        if "merge_area" not in attrs or attrs["merge_area"] is None:
+            return
+
+        top, left, bottom, right = attrs["merge_area"]
+        selection = Selection([(top, left)], [(bottom, right)], [], [], [])
+
+        selection.insert(insertion_point, no_to_insert, axis)
+
+        __top, __left = selection.block_tl[0]
+        __bottom, __right = selection.block_br[0]
+
+        # Adjust merge area if it is beyond the grid shape
+        rows, cols, tabs = self.shape
+
+        if __top < 0 and __bottom < 0:
+            return
+        if __top >= rows and __bottom >= rows:
+            return
+        if __left < 0 and __right < 0:
+            return
+        if __left >= cols and __right >= cols:
+            return
+
+        if __top < 0:
+            __top = 0
+
+        if __top >= rows:
+            __top = rows - 1
+
+        if __bottom < 0:
+            __bottom = 0
+
+        if __bottom >= rows:
+            __bottom = rows - 1
+
+        if __left < 0:
+            __left = 0
+
+        if __left >= cols:
+            __left = cols - 1
+
+        if __right < 0:
+            __right = 0
+
+        if __right >= cols:
+            __right = cols - 1
+
+        return __top, __left, __bottom, __right
+
+    def _adjust_spill_shape(
+            self, selection: Selection, attrs: AttrDict, insertion_point: int,
+            no_to_insert: int, axis: int) -> Tuple[int, int]:
+        """Returns an updated spill shape
+
+        The spill area grows or shrinks if rows or columns are inserted or
+        deleted inside it. The spill area is located at the first cell of
+        selection.
+
+        :param selection: Selection of the cell attribute before insertion
+        :param attrs: Cell attribute dictionary that shall be adjusted
+        :param insertion_point: Point on axis at which insertion takes place
+        :param no_to_insert: Number of rows/cols/tabs to be inserted (>=0)
+        :param axis: Row insertion if 0, column insertion if 1, must be in 0, 1
+
+        """
+
+        if "spill_shape" not in attrs or attrs["spill_shape"] is None \
+           or not selection.cells:
+            return
+
+        row, column = selection.cells[0]
+        rows, columns = attrs["spill_shape"]
+        merge_area = row, column, row + rows - 1, column + columns - 1
+
+        spill_area = self._adjust_merge_area(AttrDict(merge_area=merge_area),
+                                             insertion_point, no_to_insert,
+                                             axis)
+        if spill_area is None:
+            return
+
+        top, left, bottom, right = spill_area
+        return bottom - top + 1, right - left + 1
+
+    def _adjust_cell_attributes(
+            self, insertion_point: int, no_to_insert: int,  axis: int,
+            tab: int = None, cell_attrs: AttrDict = None):
+        """Adjusts cell attributes on insertion/deletion
+
+        :param insertion_point: Point on axis at which insertion takes place
+        :param no_to_insert: Number of rows/cols/tabs to be inserted (>=0)
+        :param axis: Row insertion if 0, column insertion if 1, must be in 0, 1
+        :param tab: Table at which insertion takes place, None means all tables
+        :param cell_attrs: If given replaces the existing cell attributes
+
+        """
+
+        def replace_cell_attributes_table(index: int, new_table: int):
+            """Replaces table in cell_attributes item
+
+            :param index: Cell attribute index for table replacement
+            :param new_table: New table value for cell attribute
+
+            """
+
+            cell_attr = list(list.__getitem__(self.cell_attributes, index))
+            cell_attr[1] = new_table
+            self.cell_attributes[index] = CellAttribute(*cell_attr)
+
+        def get_ca_with_updated_ma(
+                attrs: AttrDict,
+                merge_area: Tuple[int, int, int, int],
+                spill_shape: Tuple[int, int] = None) -> AttrDict:
+            """Returns cell attributes with updated merge area and spill shape
+
+            :param attrs: Cell attributes to be updated
+            :param merge_area: New merge area (top, left, bottom, right)
+            :param spill_shape: New spill shape (rows, columns)
+
+            """
+
+            new_attrs = copy(attrs)
+
+            if merge_area is None:
+                try:
+                    new_attrs.pop("merge_area")
+                except KeyError:
+                    pass
+            else:
+                new_attrs["merge_area"] = merge_area
+
+            if "spill_shape" in new_attrs:
+                new_attrs["spill_shape"] = spill_shape
+
+            return new_attrs
+
+        if axis not in list(range(3)):
+            raise ValueError("Axis must be in [0, 1, 2]")
+
+        if tab is not None and tab < 0:
+            raise Warning("tab is negative")
+            return
+
+        if cell_attrs is None:
+            cell_attrs = []
+
+        if cell_attrs:
+            self.cell_attributes[:] = cell_attrs
+
+        elif axis < 2:
+            # Adjust selections on given table
+
+            ca_updates = {}
+            for i, (selection, table, attrs) \
+                    in enumerate(self.cell_attributes):
+                selection = copy(selection)
+                if tab is None or tab == table:
+                    # Update spill shape relative to the unshifted cells
+                    spill_shape = self._adjust_spill_shape(
+                        selection, attrs, insertion_point, no_to_insert, axis)
+                    selection.insert(insertion_point, no_to_insert, axis)
+                    # Update merge area if present
+                    merge_area = self._adjust_merge_area(attrs,
+                                                         insertion_point,
+                                                         no_to_insert, axis)
+                    new_attrs = get_ca_with_updated_ma(attrs, merge_area,
+                                                       spill_shape)
+
+                    ca_updates[i] = CellAttribute(selection, table, new_attrs)
+
+            for idx in ca_updates:
+                self.cell_attributes[idx] = ca_updates[idx]
+
+        elif axis == 2:
+            # Adjust tabs
+
+            pop_indices = []
+
+            for i, cell_attribute in enumerate(self.cell_attributes):
+                selection, table, value = cell_attribute
+
+                if no_to_insert < 0 and insertion_point <= table:
+                    if insertion_point > table + no_to_insert:
+                        # Delete later
+                        pop_indices.append(i)
+                    else:
+                        replace_cell_attributes_table(i, table + no_to_insert)
+
+                elif insertion_point <= table:
+                    # Insert
                     replace_cell_attributes_table(i, table + no_to_insert)
 
-            for i in pop_indices[::-1]:
-                self.cell_attributes.pop(i)
+            for i in pop_indices[::-1]:
+                self.cell_attributes.pop(i)
+
+        self.cell_attributes._update_table_cache()
+
+    def insert(self, insertion_point: int, no_to_insert: int, axis: int,
+               tab: int = None):
+        """Inserts no_to_insert rows/cols/tabs/... before insertion_point
+
+        :param insertion_point: Point on axis at which insertion takes place
+        :param no_to_insert: Number of rows/cols/tabs to be inserted (>=0)
+        :param axis: Row/Column/Table insertion if 0/1/2 must be in 0, 1, 2
+        :param tab: Table at which insertion takes place, None means all tables
+
+        """
+
+        if not 0 <= axis <= len(self.shape):
+            raise ValueError("Axis not in grid dimensions")
+
+        if insertion_point > self.shape[axis] or \
+           insertion_point < -self.shape[axis]:
+            raise IndexError("Insertion point not in grid")
+
+        self.dict_grid.insert(insertion_point, no_to_insert, axis, tab)
+
+        self._adjust_rowcol(insertion_point, no_to_insert, axis, tab=tab)
+        self._adjust_cell_attributes(insertion_point, no_to_insert, axis, tab)
+
+    def delete(self, deletion_point: int, no_to_delete: int, axis: int,
+               tab: int = None):
+        """Deletes no_to_delete rows/cols/... starting with deletion_point
+
+        :param deletion_point: Point on axis at which deletion takes place
+        :param no_to_delete: Number of rows/cols/tabs to be deleted (>=0)
+        :param axis: Row/Column/Table deletion if 0/1/2, must be in 0, 1, 2
+        :param tab: Table at which insertion takes place, None means all tables
+
+        """
+
+        if not 0 <= axis < len(self.shape):
+            raise ValueError("Axis not in grid dimensions")
+
+        if no_to_delete < 0:
+            raise ValueError("Cannot delete negative number of rows/cols/...")
+
+        if deletion_point > self.shape[axis] or \
+           deletion_point <= -self.shape[axis]:
+            raise IndexError("Deletion point not in grid")
+
+        self.dict_grid.delete(deletion_point, no_to_delete, axis, tab)
+
+        self._adjust_rowcol(deletion_point, -no_to_delete, axis, tab=tab)
+        self._adjust_cell_attributes(deletion_point, -no_to_delete, axis, tab)
+
+    def set_row_height(self, row: int, tab: int, height: float):
+        """Sets row height
+
+        :param row: Row for height setting
+        :param tab: Table, in which row height is set
+        :param height: Row height to be set
+
+        """
+
+        try:
+            self.row_heights.pop((row, tab))
+        except KeyError:
+            pass
+
+        if height is not None:
+            self.row_heights[(row, tab)] = float(height)
+
+    def set_col_width(self, col: int, tab: int, width: float):
+        """Sets column width
+
+        :param col: Column for width setting
+        :param tab: Table, in which column width is set
+        :param width: Column width to be set
+
+        """
+
+        try:
+            self.col_widths.pop((col, tab))
+        except KeyError:
+            pass
+
+        if width is not None:
+            self.col_widths[(col, tab)] = float(width)
+
+    # Element access via call
+
+    __call__ = __getitem__
+
+# End of class DataArray
+
+# -----------------------------------------------------------------------------
+
+
+class DependencyGraph:
+    """Records which cells are read by which cells during evaluation
+
+    Nodes are single cell keys or range keys. Range keys are keys, in which
+    slices are replaced by `range` objects. A range key stands for all cells
+    inside its range so that reading a large range adds one edge only.
+
+    """
+
+    def __init__(self):
+        # Maps node to set of nodes that read it
+        self.dependents = defaultdict(set)
+
+        # Maps node to set of nodes that it reads
+        self.precedents = defaultdict(set)
+
+        # Range keys that are read or that have a cached result
+        self.range_keys = set()
+
+    @staticmethod
+    def is_range_key(key: tuple) -> bool:
+        """True if key contains at least one `range`
+
+        :param key: Graph node
+
+        """
+
+        return any(isinstance(key_ele, range) for key_ele in key)
+
+    @staticmethod
+    def range_contains(range_key: tuple, key: Tuple[int, int, int]) -> bool:
+        """True if the single cell key is inside range_key
+
+        :param range_key: Key that may contain `range` objects
+        :param key: Single cell key
+
+        """
+
+        for range_ele, key_ele in zip(range_key, key):
+            if isinstance(range_ele, range):
+                if key_ele not in range_ele:
+                    return False
+            elif range_ele != key_ele:
+                return False
+        return True
+
+    def add(self, reader: tuple, key: tuple):
+        """Adds an edge that states that reader reads key
+
+        :param reader: Node that is evaluated
+        :param key: Node that is read by reader
+
+        """
+
+        if self.is_range_key(key):
+            self.range_keys.add(key)
+
+        self.dependents[key].add(reader)
+        self.precedents[reader].add(key)
+
+    def add_range(self, range_key: tuple):
+        """Adds a range node that has a cached result but may have no reader
+
+        :param range_key: Range key that has been evaluated
+
+        """
+
+        self.range_keys.add(range_key)
+
+    def discard_range(self, range_key: tuple):
+        """Removes a range node without readers, e.g. when it is stale
+
+        :param range_key: Range key, of which the result has been removed
+
+        """
+
+        if range_key not in self.dependents:
+            self.range_keys.discard(range_key)
+
+    def discard_reader(self, reader: tuple):
+        """Removes all edges that start from reader, e.g. before evaluation
+
+        :param reader: Node, for which outgoing edges are removed
+
+        """
+
+        for key in self.precedents.pop(reader, ()):
+            readers = self.dependents.get(key)
+            if readers is not None:
+                readers.discard(reader)
+                if not readers:
+                    del self.dependents[key]
+
+    def transitive_dependents(self, keys: Iterable[Tuple[int, int, int]]
+                              ) -> set:
+        """Returns all nodes that directly or indirectly read keys
+
+        :param keys: Single cell keys that have been changed
+
+        """
+
+        stale = set()
+        todo = list(keys)
+
+        while todo:
+            key = todo.pop()
+
+            affected = set(self.dependents.get(key, ()))
+            if not self.is_range_key(key):
+                affected.update(range_key for range_key in self.range_keys
+                                if self.range_contains(range_key, key))
+
+            for node in affected:
+                if node not in stale:
+                    stale.add(node)
+                    todo.append(node)
+
+        return stale
+
+    def clear(self):
+        """Removes all nodes and edges"""
+
+        self.dependents.clear()
+        self.precedents.clear()
+        self.range_keys.clear()
+
+# End of class DependencyGraph
+
+# -----------------------------------------------------------------------------
+
+
+class CellEnvironment(dict):
+    """Globals for evaluating one cell without copying the module globals
+
+    The dict itself only holds the per-cell variables such as X, Y, Z and S
+    as well as names that the cell code assigns. Missing names are looked up
+    in the shared base dict, which is not changed by cell code.
+
+    """
+
+    def __init__(self, base: dict, overlay: dict):
+        """
+        :param base: Shared base environment, usually the module globals
+        :param overlay: Per-cell variables
+
+        """
+
+        super().__init__(overlay)
+        self.base = base
+
+    def __missing__(self, key: str) -> Any:
+        """Looks up key in the base environment, raises KeyError if missing
+
+        :param key: Name to be looked up
+
+        """
+
+        return self.base[key]
+
+# End of class CellEnvironment
+
+# -----------------------------------------------------------------------------
+
+
+class ResultCache(OrderedDict):
+    """Least recently used cache for cell results with a memory budget
+
+    Keys are cell keys or range keys, i.e. tuples. The memory that each
+    result occupies is estimated when it is stored. The least recently used
+    results are evicted when the total exceeds the budget from
+    :attr:`settings.Settings.result_cache_size`.
+
+    Cell results that are Python ints within int64 or floats are not boxed.
+    They are stored in an int64 or float64 :class:`NumericColumn` of their
+    column and table, whose masks mark valid results. :meth:`numeric_range`
+    reads them for a range of rows. These results are not ordered by use.
+    They are dropped if the budget is exceeded by them alone.
+
+    """
+
+    def __init__(self, settings: Settings):
+        """
+        :param settings: Pyspread settings
+
+        """
+
+        super().__init__()
+
+        self.settings = settings
+
+        self.sizes = {}  # Estimated size in bytes for each key
+        self.size = 0  # Estimated total size in bytes
+
+        self.numbers = {}  # (column, table): {int: NumericColumn, float: ...}
+        self.number_count = 0  # Number of results in numbers
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_size(self) -> int:
+        """Memory budget in bytes"""
+
+        return self.settings.result_cache_size * 2 ** 20
+
+    @staticmethod
+    def estimate_size(value: Any) -> int:
+        """Returns estimated memory consumption of value in bytes
+
+        :param value: Cell result
+
+        """
+
+        if isinstance(value, numpy.ndarray):
+            return value.nbytes
+        if isinstance(value, QImage):
+            return value.sizeInBytes()
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        if Figure is not None and isinstance(value, Figure):
+            # Size of the rendered RGBA buffer
+            width, height = value.get_size_inches() * value.dpi
+            return int(width * height * 4)
+
+        return sys.getsizeof(value)
+
+    @staticmethod
+    def _number_type(key: tuple, value: Any) -> Optional[type]:
+        """Returns int or float if value is stored unboxed, else None
+
+        :param key: Cell key or range key
+        :param value: Cell result
+
+        """
+
+        value_type = type(value)
+        if value_type is float \
+           or value_type is int and -2**63 <= value < 2**63:
+            if ResultCache._is_cell_key(key):
+                return value_type
+
+    @staticmethod
+    def _is_cell_key(key: tuple) -> bool:
+        """True if key is a cell key and not a range key
+
+        :param key: Cell key or range key
+
+        """
+
+        return len(key) == 3 and type(key[0]) is int \
+            and type(key[1]) is int and type(key[2]) is int
+
+    def _number_column(self, key: tuple) -> Optional[NumericColumn]:
+        """Returns NumericColumn that contains the result of key or None
+
+        :param key: Cell key or range key
+
+        """
+
+        if not self._is_cell_key(key):
+            return
+
+        try:
+            columns = self.numbers[key[1], key[2]]
+        except KeyError:
+            return
+
+        for numeric_column in columns.values():
+            if key[0] in numeric_column:
+                return numeric_column
+
+    def _remove_number(self, key: tuple) -> bool:
+        """Removes unboxed result of key, returns True if it has existed
+
+        :param key: Cell key or range key
+
+        """
+
+        numeric_column = self._number_column(key)
+        if numeric_column is None:
+            return False
+
+        blocks = len(numeric_column.masks)
+        numeric_column.remove(key[0])
+        self.size -= (blocks - len(numeric_column.masks)) \
+            * self._block_bytes(numeric_column)
+        self.number_count -= 1
+
+        if not numeric_column.size:
+            columns = self.numbers[key[1], key[2]]
+            del columns[numeric_column.dtype]
+            if not columns:
+                del self.numbers[key[1], key[2]]
+
+        return True
+
+    @staticmethod
+    def _block_bytes(numeric_column: NumericColumn) -> int:
+        """Returns bytes of one block of values and mask
+
+        :param numeric_column: Column of unboxed results
+
+        """
+
+        return numeric_column.block_size * 9
+
+    def _clear_numbers(self):
+        """Removes all unboxed results"""
+
+        for columns in self.numbers.values():
+            for numeric_column in columns.values():
+                self.size -= len(numeric_column.masks) \
+                    * self._block_bytes(numeric_column)
+
+        self.numbers.clear()
+        self.number_count = 0
+
+    def __contains__(self, key: tuple) -> bool:
+        if super().__contains__(key):
+            return True
+
+        return bool(self.numbers) and self._number_column(key) is not None
+
+    def __len__(self) -> int:
+        return super().__len__() + self.number_count
+
+    def __getitem__(self, key: tuple) -> Any:
+        """Returns cached result and marks it as most recently used
+
+        :param key: Cell key or range key
+
+        """
+
+        if self.numbers:
+            numeric_column = self._number_column(key)
+            if numeric_column is not None:
+                self.hits += 1
+                return numeric_column.get(key[0])
+
+        try:
+            value = super().__getitem__(key)
+        except KeyError:
+            self.misses += 1
+            raise
+
+        self.hits += 1
+        self.move_to_end(key)
+
+        return value
+
+    def __setitem__(self, key: tuple, value: Any):
+        """Stores result and evicts least recently used results if needed
+
+        :param key: Cell key or range key
+        :param value: Cell result
+
+        """
+
+        number_type = self._number_type(key, value)
+
+        if self.numbers:
+            self._remove_number(key)
+
+        if number_type is None:
+            self.size -= self.sizes.pop(key, 0)
+
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+
+            size = self.estimate_size(value)
+            self.sizes[key] = size
+            self.size += size
+
+        else:
+            if super().__contains__(key):
+                self.__delitem__(key)
+
+            columns = self.numbers.setdefault((key[1], key[2]), {})
+            try:
+                numeric_column = columns[number_type]
+            except KeyError:
+                numeric_column = columns[number_type] = \
+                    NumericColumn(number_type)
+
+            blocks = len(numeric_column.masks)
+            numeric_column.set(key[0], value)
+            self.size += (len(numeric_column.masks) - blocks) \
+                * self._block_bytes(numeric_column)
+            self.number_count += 1
+
+        max_size = self.max_size
+        while self.size > max_size and super().__len__() > 1:
+            self.popitem(last=False)
+            self.evictions += 1
+
+        if self.size > max_size and self.numbers:
+            self.evictions += self.number_count
+            self._clear_numbers()
+
+    def __delitem__(self, key: tuple):
+        """Removes result
+
+        :param key: Cell key or range key
+
+        """
+
+        if self.numbers and self._remove_number(key):
+            return
+
+        super().__delitem__(key)
+        self.size -= self.sizes.pop(key, 0)
+
+    def pop(self, key: tuple, *args) -> Any:
+        """Removes result and returns it
+
+        :param key: Cell key or range key
+        :param args: Optional default value
+
+        """
+
+        if self.numbers:
+            numeric_column = self._number_column(key)
+            if numeric_column is not None:
+                value = numeric_column.get(key[0])
+                self._remove_number(key)
+                return value
+
+        self.size -= self.sizes.pop(key, 0)
+        return super().pop(key, *args)
+
+    def popitem(self, last: bool = True) -> Tuple[tuple, Any]:
+        """Removes and returns last or first boxed item
+
+        :param last: Remove most recently used item if True else least
+
+        """
+
+        key, value = super().popitem(last=last)
+        self.size -= self.sizes.pop(key, 0)
+
+        return key, value
+
+    def clear(self):
+        """Removes all results, counters are kept"""
+
+        super().clear()
+        self.sizes.clear()
+        self._clear_numbers()
+        self.size = 0
+
+    def numeric_range(self, column: int, table: int, start: int, stop: int
+                      ) -> Tuple[numpy.ndarray, numpy.ndarray, set]:
+        """Returns unboxed results of a column range
+
+        Returns an array of the results, a mask that is True for rows with
+        an unboxed result and the set of result types. The array is int64 if
+        all results are ints and float64 otherwise.
+
+        :param column: Column of the range
+        :param table: Table of the range
+        :param start: First row of the range
+        :param stop: Row after the range
+
+        """
+
+        chunks = []
+        for number_type, numeric_column in \
+                self.numbers.get((column, table), {}).items():
+            for row, chunk_values, chunk_mask in \
+                    numeric_column.chunks(start, stop):
+                if chunk_mask.any():
+                    chunks.append((number_type, row - start, chunk_values,
+                                   chunk_mask))
+
+        types = {number_type for number_type, _, _, _ in chunks}
+        dtype = numpy.int64 if types == {int} else numpy.float64
+
+        values = numpy.zeros(max(stop - start, 0), dtype)
+        mask = numpy.zeros(len(values), bool)
+
+        for _, pos, chunk_values, chunk_mask in chunks:
+            chunk = slice(pos, pos + len(chunk_mask))
+            numpy.copyto(values[chunk], chunk_values, where=chunk_mask)
+            mask[chunk] |= chunk_mask
+
+        return values, mask, types
+
+# End of class ResultCache
+
+# -----------------------------------------------------------------------------
+
+
+class CellProfile:
+    """Evaluation statistics of one cell"""
+
+    __slots__ = ("calls", "time", "self_time", "max_time", "size", "errors",
+                 "error")
+
+    def __init__(self):
+        self.calls = 0  # Number of evaluations
+        self.time = 0.0  # Total wall time in s including referenced cells
+        self.self_time = 0.0  # Total wall time in s excluding referenced cells
+        self.max_time = 0.0  # Wall time of slowest evaluation in s
+        self.size = 0  # Estimated size of last result in bytes
+        self.errors = 0  # Number of evaluations that raised an exception
+        self.error = None  # Message of last exception or None
+
+    def as_dict(self) -> dict:
+        """Returns statistics as dict"""
+
+        return {name: getattr(self, name) for name in self.__slots__}
+
+# End of class CellProfile
+
+# -----------------------------------------------------------------------------
+
+
+class EvaluationProfiler:
+    """Records cell evaluation statistics while enabled
+
+    Self times exclude time spent evaluating cells that are referenced by the
+    cell. Optionally, the evaluation of one cell is run with cProfile.
+
+    """
+
+    report_fields = ["section", "row", "column", "table", "calls", "time",
+                     "self_time", "max_time", "size", "errors", "error"]
+
+    def __init__(self):
+        self.enabled = False
+
+        self.profiles = {}  # key: CellProfile
+        self._stack = []  # [start time, time of referenced cells]
+
+        self.cprofile_key = None  # Key of cell that is profiled by cProfile
+        self.cprofile_stats = ""  # Statistics from last cProfile run
+
+    def reset(self):
+        """Discards all statistics"""
+
+        self.profiles.clear()
+        self._stack.clear()
+        self.cprofile_stats = ""
+
+    def start(self):
+        """Starts timing an evaluation"""
+
+        self._stack.append([perf_counter(), 0.0])
+
+    def stop(self, key: Tuple[int, int, int], result: Any):
+        """Stops timing an evaluation and records it for key
+
+        :param key: Key of evaluated cell
+        :param result: Evaluation result
+
+        """
+
+        start, child_time = self._stack.pop()
+        duration = perf_counter() - start
+
+        if self._stack:
+            self._stack[-1][1] += duration
+
+        key = tuple(key)
+        try:
+            profile = self.profiles[key]
+        except KeyError:
+            profile = self.profiles[key] = CellProfile()
+
+        profile.calls += 1
+        profile.time += duration
+        profile.self_time += duration - child_time
+        profile.max_time = max(profile.max_time, duration)
+        profile.size = ResultCache.estimate_size(result)
+        if isinstance(result, Exception):
+            profile.errors += 1
+            profile.error = str(result)
 
-        self.cell_attributes._attr_cache.clear()
-        self.cell_attributes._update_table_cache()
+    def run_cprofile(self, func: Callable, *args) -> Any:
+        """Calls func with cProfile and stores statistics in cprofile_stats
 
-    def insert(self, insertion_point: int, no_to_insert: int, axis: int,
-               tab: int = None):
-        """Inserts no_to_insert rows/cols/tabs/... before insertion_point
+        :param func: Function to be profiled
+        :param args: Arguments of func
 
-        :param insertion_point: Point on axis at which insertion takes place
-        :param no_to_insert: Number of rows/cols/tabs to be inserted (>=0)
-        :param axis: Row/Column/Table insertion if 0/1/2 must be in 0, 1, 2
-        :param tab: Table at which insertion takes place, None means all tables
+        """
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args)
+        finally:
+            stream = io.StringIO()
+            stats = pstats.Stats(profiler, stream=stream)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(30)
+            self.cprofile_stats = stream.getvalue()
+
+    def slowest(self, number: int = None) -> List[Tuple[tuple, CellProfile]]:
+        """Returns (key, profile) list of cells with largest self time
+
+        :param number: Maximum length of list, None means all cells
 
         """
 
-        if not 0 <= axis <= len(self.shape):
-            raise ValueError("Axis not in grid dimensions")
+        items = sorted(self.profiles.items(),
+                       key=lambda item: item[1].self_time, reverse=True)
+        return items[:number]
 
-        if insertion_point > self.shape[axis] or \
-           insertion_point < -self.shape[axis]:
-            raise IndexError("Insertion point not in grid")
+    def most_evaluated(self, number: int = None
+                       ) -> List[Tuple[tuple, CellProfile]]:
+        """Returns (key, profile) list of most often evaluated cells
 
-        new_keys = {}
-        del_keys = []
+        :param number: Maximum length of list, None means all cells
 
-        for key in list(self.dict_grid.keys()):
-            if key[axis] >= insertion_point and (tab is None or tab == key[2]):
-                new_key = list(key)
-                new_key[axis] += no_to_insert
-                if 0 <= new_key[axis] < self.shape[axis]:
-                    new_keys[tuple(new_key)] = self(key)
-                del_keys.append(key)
+        """
 
-        # Now re-insert moved keys
+        items = sorted(self.profiles.items(),
+                       key=lambda item: item[1].calls, reverse=True)
+        return items[:number]
 
-        for key in del_keys:
-            if key not in new_keys and self(key) is not None:
-                self.pop(key)
+    def table_totals(self) -> Dict[int, CellProfile]:
+        """Returns accumulated statistics for each table"""
 
-        self._adjust_rowcol(insertion_point, no_to_insert, axis, tab=tab)
-        self._adjust_cell_attributes(insertion_point, no_to_insert, axis, tab)
+        totals = {}
+        for (_, _, table), profile in self.profiles.items():
+            try:
+                total = totals[table]
+            except KeyError:
+                total = totals[table] = CellProfile()
+            total.calls += profile.calls
+            total.time += profile.time
+            total.self_time += profile.self_time
+            total.max_time = max(total.max_time, profile.max_time)
+            total.size += profile.size
+            total.errors += profile.errors
 
-        for key in new_keys:
-            self.__setitem__(key, new_keys[key])
+        return dict(sorted(totals.items()))
 
-    def delete(self, deletion_point: int, no_to_delete: int, axis: int,
-               tab: int = None):
-        """Deletes no_to_delete rows/cols/... starting with deletion_point
+    def report(self, number: int = 20) -> Dict[str, list]:
+        """Returns report of slowest cells, most evaluated cells and tables
 
-        :param deletion_point: Point on axis at which deletion takes place
-        :param no_to_delete: Number of rows/cols/tabs to be deleted (>=0)
-        :param axis: Row/Column/Table deletion if 0/1/2, must be in 0, 1, 2
-        :param tab: Table at which insertion takes place, None means all tables
+        Each section is a list of dicts with the keys from report_fields.
+
+        :param number: Number of cells in cell sections
 
         """
 
-        if not 0 <= axis < len(self.shape):
-            raise ValueError("Axis not in grid dimensions")
+        def cell_rows(section, items):
+            rows = []
+            for (row, column, table), profile in items:
+                row_dict = {"section": section, "row": row,
+                            "column": column, "table": table}
+                row_dict.update(profile.as_dict())
+                rows.append(row_dict)
+            return rows
+
+        tables = []
+        for table, profile in self.table_totals().items():
+            row_dict = {"section": "table", "row": None, "column": None,
+                        "table": table}
+            row_dict.update(profile.as_dict())
+            tables.append(row_dict)
+
+        return {
+            "slowest": cell_rows("slowest", self.slowest(number)),
+            "most_evaluated": cell_rows("most_evaluated",
+                                        self.most_evaluated(number)),
+            "tables": tables,
+        }
+
+    def write_csv(self, outfile: TextIO, number: int = 20):
+        """Writes report as csv
+
+        :param outfile: Text file that is written to
+        :param number: Number of cells in cell sections
 
-        if no_to_delete < 0:
-            raise ValueError("Cannot delete negative number of rows/cols/...")
+        """
 
-        if deletion_point > self.shape[axis] or \
-           deletion_point <= -self.shape[axis]:
-            raise IndexError("Deletion point not in grid")
+        writer = csv.DictWriter(outfile, fieldnames=self.report_fields)
+        writer.writeheader()
+        for rows in self.report(number).values():
+            writer.writerows(rows)
 
-        new_keys = {}
-        del_keys = []
+    def write_json(self, outfile: TextIO, number: int = 20):
+        """Writes report as json
 
-        # Note that the loop goes over a list that copies all dict keys
-        for key in list(self.dict_grid.keys()):
-            if tab is None or tab == key[2]:
-                if deletion_point <= key[axis] < deletion_point + no_to_delete:
-                    del_keys.append(key)
+        :param outfile: Text file that is written to
+        :param number: Number of cells in cell sections
 
-                elif key[axis] >= deletion_point + no_to_delete:
-                    new_key = list(key)
-                    new_key[axis] -= no_to_delete
+        """
 
-                    new_keys[tuple(new_key)] = self(key)
-                    del_keys.append(key)
+        json.dump(self.report(number), outfile, indent=2)
 
-        self._adjust_rowcol(deletion_point, -no_to_delete, axis, tab=tab)
-        self._adjust_cell_attributes(deletion_point, -no_to_delete, axis, tab)
+# End of class EvaluationProfiler
 
-        # Now re-insert moved keys
+# -----------------------------------------------------------------------------
 
-        for key in new_keys:
-            self.__setitem__(key, new_keys[key])
 
-        for key in del_keys:
-            if key not in new_keys and self(key) is not None:
-                self.pop(key)
+class CompiledCode(NamedTuple):
+    """Cell code that is split into an exec block and an eval expression"""
 
-    def set_row_height(self, row: int, tab: int, height: float):
-        """Sets row height
+    exec_code: Any  # Code object of all but the last statement
+    eval_code: Any  # Code object of the expression of the last statement
+    targets: list  # Assignment targets of the last statement
 
-        :param row: Row for height setting
-        :param tab: Table, in which row height is set
-        :param height: Row height to be set
+# -----------------------------------------------------------------------------
+
+
+class CodeArray(DataArray):
+    """CodeArray provides objects when accessing cells via `__getitem__`
+
+    Cell code can be accessed via function call
+
+    This class represents layer 3 of the model.
+
+    """
+
+    # Safe mode: If True then Whether pyspread is operating in safe_mode
+    # In safe_mode, cells are not evaluated but its code is returned instead.
+    safe_mode = False
+
+    # Maximum number of distinct code strings in the compiled code cache
+    code_cache_size = 65536
+
+    # Returned by literal_value for code that is no immutable literal
+    no_literal = object()
+
+    # Types of literal values that are returned without evaluation
+    literal_types = frozenset((int, float, complex, str, bytes, bool,
+                               type(None)))
+
+    # Raises EvaluationTimeout in cells that exceed settings.timeout
+    watchdog = Watchdog()
+
+    def __init__(self, shape: Tuple[int, int, int], settings: Settings):
+        """
+        :param shape: Shape of the grid
+        :param settings: Pyspread settings
+
+        """
+
+        super().__init__(shape, settings)
+
+        # Cache for results from __getitem__ calls
+        self.result_cache = ResultCache(settings)
+
+        # Cache for frozen objects
+        self.frozen_cache = {}
+
+        # Evaluation statistics, recorded only if enabled
+        self.profiler = EvaluationProfiler()
+
+        # Cell read dependencies for selective result cache invalidation
+        self.dep_graph = DependencyGraph()
+
+        # Keys of cells that are currently evaluated, innermost last
+        self._eval_stack = []
+
+        # Process pool for parallel recalculation and its initializer args
+        self._pool = None
+        self._pool_initargs = None
+
+    def __setitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                     Union[int, slice]], value: str):
+        """Sets cell code and invalidates dependent results
+
+        :param key: Cell key(s) that shall be set
+        :param value: Code for cell(s) to be set
+
+        """
+
+        # Change numpy array repr function for grid cell results
+        numpy.set_string_function(lambda s: repr(s.tolist()))
+
+        # Prevent unchanged cells from being recalculated on cursor movement
+
+        cache_key = self._cache_key(key)
+
+        unchanged = (cache_key in self.result_cache and
+                     value == self(key)) or \
+                    ((value is None or value == "") and
+                     cache_key not in self.result_cache)
+
+        if unchanged:
+            super().__setitem__(key, value)
+            return
+
+        old_code = None if self._is_slice_key(key) \
+            else self.dict_grid.get(tuple(key))
+
+        super().__setitem__(key, value)
+
+        self._invalidate(key, old_code, value)
+
+    def __getitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                     Union[int, slice]]) -> Any:
+        """Returns _eval_cell
+
+        :param key: Cell key for result retrieval (code if in safe mode)
 
         """
 
+        is_slice_key = self._is_slice_key(key)
+        node = self._cache_key(key)
+
+        # Record that the currently evaluated cell reads key.
+        # Cells inside a range that is read are covered by the range node.
+        if self._eval_stack:
+            reader = self._eval_stack[-1]
+            if not DependencyGraph.is_range_key(reader):
+                self.dep_graph.add(reader, node)
+
+        code = self(key)
+
+        if code is None:
+            if not is_slice_key:
+                # The cell may display a part of a spill formula result
+                return self._get_spilled(node)
+            return
+
+        # Cached cell handling
+
         try:
-            self.row_heights.pop((row, tab))
+            return self.result_cache[node]
         except KeyError:
             pass
 
-        if height is not None:
-            self.row_heights[(row, tab)] = float(height)
+        if not is_slice_key:
+            attributes = self.cell_attributes[key]
+            # Button cell handling
+            if attributes.button_cell is not False:
+                return
+            # Frozen cell handling
+            frozen_res = attributes.frozen
+            if frozen_res:
+                if node in self.frozen_cache:
+                    return self.frozen_cache[node]
+                # Frozen cache is empty.
+                # Maybe we have a reload without the frozen cache
+                result = self._eval_tracked(node, key, code)
+                self.frozen_cache[node] = result
+                return result
+
+        # Normal cell handling
+
+        result = self._eval_tracked(node, key, code)
+        self.result_cache[node] = result
+
+        if is_slice_key:
+            # Cells in the range invalidate the result even without readers
+            self.dep_graph.add_range(node)
+
+        return result
+
+    def _get_spilled(self, key: Tuple[int, int, int]) -> Any:
+        """Returns the part of a spill formula result for an empty cell
+
+        Returns None if the cell is not inside a spill area.
+
+        :param key: Key of cell without code
+
+        """
+
+        anchor = self.cell_attributes.get_spilling_cell(key)
+        if anchor is None or anchor == key:
+            return
+
+        # Readers of key are invalidated when the spill formula changes
+        self.dep_graph.add(key, anchor)
+
+        return self.spill_element(anchor, key)
+
+    def spill_element(self, anchor: Tuple[int, int, int],
+                      key: Tuple[int, int, int]) -> Any:
+        """Returns the element of the result of anchor that is shown in key
+
+        The spill formula result in cell anchor is laid out over the spill
+        area of anchor. One dimensional results fill the area along its
+        longer side. Elements that are not present are returned as None.
+
+        :param anchor: Key of spill formula cell, i.e. top left of the area
+        :param key: Key of cell inside the spill area
+
+        """
+
+        result = self[anchor]
+        rows, _ = self.cell_attributes[anchor].spill_shape
+        row_offset = key[0] - anchor[0]
+        col_offset = key[1] - anchor[1]
+
+        if isinstance(result, (str, bytes, Exception)):
+            return result if key == anchor else None
+
+        try:
+            if isinstance(result, numpy.ndarray) and result.ndim > 1:
+                return result[row_offset, col_offset]
+
+            if rows == 1:
+                line = result[0] if self._is_nested(result) else result
+                return line[col_offset]
+
+            line = result[row_offset]
+            if self._is_nested(result):
+                return line[col_offset]
+            return line if col_offset == 0 else None
+
+        except (IndexError, KeyError, TypeError):
+            return result if key == anchor else None
+
+    @staticmethod
+    def _is_nested(result: Sequence) -> bool:
+        """True if the first element of result is a sequence of cell values
+
+        :param result: Sequence, e.g. a list of lists
+
+        """
+
+        try:
+            first = result[0]
+        except (IndexError, KeyError, TypeError):
+            return False
+
+        return isinstance(first, (list, tuple, numpy.ndarray))
+
+    @staticmethod
+    def _is_slice_key(key: Tuple[Union[int, slice], Union[int, slice],
+                                 Union[int, slice]]) -> bool:
+        """True if key contains at least one slice
+
+        :param key: Cell key(s)
+
+        """
+
+        return any(isinstance(key_ele, slice) for key_ele in key)
+
+    def _cache_key(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                    Union[int, slice]]) -> tuple:
+        """Returns key of result cache and dependency graph for key
+
+        :param key: Cell key(s)
+
+        """
+
+        if self._is_slice_key(key):
+            return self._range_key(key)
+
+        return tuple(key)
+
+    def _range_key(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                    Union[int, slice]]) -> tuple:
+        """Returns hashable key, in which slices are replaced by ranges
+
+        :param key: Cell key(s)
+
+        """
+
+        return tuple(range(*key_ele.indices(self.shape[axis]))
+                     if isinstance(key_ele, slice) else key_ele
+                     for axis, key_ele in enumerate(key))
+
+    def _eval_tracked(self, node: tuple,
+                      key: Tuple[Union[int, slice], Union[int, slice],
+                                 Union[int, slice]], code: str) -> Any:
+        """Evaluates key via _eval_cell and records the cells that are read
+
+        :param node: Dependency graph node of key
+        :param key: Key of cell(s) to be evaled
+        :param code: Code to be evaled
+
+        """
+
+        self.dep_graph.discard_reader(node)
+        self._eval_stack.append(node)
+
+        try:
+            return self._eval_cell(key, code)
+        finally:
+            self._eval_stack.pop()
+
+    @staticmethod
+    @lru_cache(maxsize=code_cache_size)
+    def _writes_globals(code: str) -> bool:
+        """True if code may assign global names that other cells read, cached
+
+        Such cells are untracked by the dependency graph.
+
+        :param code: Cell code
+
+        """
+
+        if not code:
+            return False
+
+        try:
+            block = ast.parse(code, mode='exec')
+        except (SyntaxError, ValueError):
+            return False
+
+        return len(block.body) != 1 or not isinstance(block.body[0], ast.Expr)
+
+    def _invalidate(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                     Union[int, slice]],
+                    old_code: str = None, new_code: str = None):
+        """Removes results of key and of its dependents from result cache
+
+        The whole result cache is cleared if key contains slices or if old or
+        new code may assign globals.
+
+        :param key: Cell key(s) that have been changed
+        :param old_code: Code of key before the change
+        :param new_code: Code of key after the change
+
+        """
+
+        if not self.result_cache:
+            return
+
+        if self._is_slice_key(key) or self._writes_globals(old_code) \
+           or self._writes_globals(new_code):
+            self.result_cache.clear()
+            self.dep_graph.clear()
+            return
+
+        key = tuple(key)
+        self.result_cache.pop(key, None)
+
+        for node in self.dep_graph.transitive_dependents([key]):
+            self.result_cache.pop(node, None)
+            if DependencyGraph.is_range_key(node):
+                self.dep_graph.discard_range(node)
+
+    def _make_nested_list(self, gen: Union[Iterable, Iterable[Iterable],
+                                           Iterable[Iterable[Iterable]]]
+                          ) -> Union[Sequence, Sequence[Sequence],
+                                     Sequence[Sequence[Sequence]]]:
+        """Makes nested list from generator for creating numpy.array"""
+
+        res = []
+
+        for ele in gen:
+            if ele is None:
+                res.append(None)
+
+            elif not is_stringlike(ele) and isgenerator(ele):
+                # Nested generator
+                res.append(self._make_nested_list(ele))
+
+            else:
+                res.append(ele)
+
+        return res
+
+    def evaluate_range(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                        Union[int, slice]]) -> numpy.ndarray:
+        """Returns results of all cells in key as numpy array
+
+        This is used by `S[...]` for keys that contain slices. If all results
+        are numbers of one kind then a float64, int64 or bool array is
+        returned. Empty cells are masked in this case. Otherwise, an object
+        array is returned.
+
+        :param key: Cell key that contains slices
+
+        """
+
+        ranges = []
+        shape = []
+        for axis, key_ele in enumerate(key):
+            if isinstance(key_ele, slice):
+                axis_range = range(*key_ele.indices(self.shape[axis]))
+                ranges.append(axis_range)
+                shape.append(len(axis_range))
+            else:
+                ranges.append((key_ele,))
+
+        row_range, column_range, table = ranges
+        if isinstance(key[0], slice) and not isinstance(key[2], slice):
+            typed_array = self._evaluate_numeric_range(row_range,
+                                                       column_range, table[0])
+            if typed_array is not None:
+                return typed_array if len(shape) > 1 else typed_array[:, 0]
+
+        values = [self[single_key] for single_key in product(*ranges)]
+
+        typed_array = self._make_typed_array(values, shape)
+        if typed_array is not None:
+            return typed_array
+
+        return numpy.array(self._nest(values, shape), dtype="O")
+
+    def _evaluate_numeric_range(self, rows: range, columns: Sequence[int],
+                                table: int) -> Optional[numpy.ndarray]:
+        """Returns 2D typed array of a range from cached numeric results
+
+        Cells that have code but no cached result are evaluated first. The
+        other results are copied from the columns of the result cache
+        without looking up single cells. Returns None if a cell has a result
+        that is not an unboxed number, if no cell has code or if a cell may
+        be part of a spill area.
+
+        :param rows: Rows of the range
+        :param columns: Columns of the range
+        :param table: Table of the range
+
+        """
+
+        if rows.step != 1 or not rows \
+           or table in self.cell_attributes._spill_areas():
+            return
 
-    def set_col_width(self, col: int, tab: int, width: float):
-        """Sets column width
+        start, stop = rows.start, rows.stop
 
-        :param col: Column for width setting
-        :param tab: Table, in which column width is set
-        :param width: Column width to be set
+        column_values = []
+        column_masks = []
+        types = set()
 
-        """
+        for column in columns:
+            filled = numpy.array(
+                self.dict_grid.column_rows(column, table, start, stop),
+                dtype=numpy.int64) - start
 
-        try:
-            self.col_widths.pop((col, tab))
-        except KeyError:
-            pass
+            values, mask, column_types = \
+                self.result_cache.numeric_range(column, table, start, stop)
 
-        if width is not None:
-            self.col_widths[(col, tab)] = float(width)
+            pending = filled[~mask[filled]]
+            if len(pending):
+                for row in (pending + start).tolist():
+                    self[row, column, table]
+                values, mask, column_types = \
+                    self.result_cache.numeric_range(column, table, start,
+                                                    stop)
 
-    # Element access via call
+                if not mask[filled].all():
+                    return
 
-    __call__ = __getitem__
+            valid = numpy.zeros(len(rows), bool)
+            valid[filled] = True
 
-# End of class DataArray
+            column_values.append(values)
+            column_masks.append(valid)
+            types.update(column_types)
 
-# -----------------------------------------------------------------------------
+        if not types:
+            return
 
+        dtype = numpy.int64 if types == {int} else numpy.float64
+        array = numpy.stack(column_values, axis=1).astype(dtype, copy=False)
+        valid = numpy.stack(column_masks, axis=1)
 
-class CodeArray(DataArray):
-    """CodeArray provides objects when accessing cells via `__getitem__`
+        if valid.all():
+            return array
 
-    Cell code can be accessed via function call
+        array[~valid] = 0
+        return numpy.ma.masked_array(array, mask=~valid)
 
-    This class represents layer 3 of the model.
+    @staticmethod
+    def _nest(values: list, shape: Sequence[int]) -> list:
+        """Returns nested list of given shape from flat list values
 
-    """
+        :param values: Flat list in C order
+        :param shape: Target shape
 
-    # Cache for results from __getitem__ calls
-    result_cache = {}
+        """
 
-    # Cache for frozen objects
-    frozen_cache = {}
+        if len(shape) <= 1 or not values:
+            return values
 
-    # Safe mode: If True then Whether pyspread is operating in safe_mode
-    # In safe_mode, cells are not evaluated but its code is returned instead.
-    safe_mode = False
+        step = len(values) // shape[0]
+        return [CodeArray._nest(values[i * step:(i + 1) * step], shape[1:])
+                for i in range(shape[0])]
 
-    def __setitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
-                                     Union[int, slice]], value: str):
-        """Sets cell code and resets result cache
+    @staticmethod
+    def _make_typed_array(values: list, shape: Sequence[int]
+                          ) -> numpy.ndarray:
+        """Returns typed array from flat values or None if not homogeneous
 
-        :param key: Cell key(s) that shall be set
-        :param value: Code for cell(s) to be set
+        Bools, integers and floats are converted into bool, int64 and float64
+        arrays. Integers and floats together are converted into float64.
+        None values are masked. Integers that do not fit into int64 make the
+        values inhomogeneous, so that an object array is used instead.
+
+        :param values: Flat list of cell results in C order
+        :param shape: Target shape
 
         """
 
-        # Change numpy array repr function for grid cell results
-        numpy.set_string_function(lambda s: repr(s.tolist()))
+        kinds = set()
+        has_none = False
+
+        for value in values:
+            if value is None:
+                has_none = True
+            elif isinstance(value, (bool, numpy.bool_)):
+                kinds.add(bool)
+            elif isinstance(value, (int, numpy.integer)):
+                if not -2**63 <= value < 2**63:
+                    return
+                kinds.add(int)
+            elif isinstance(value, (float, numpy.floating)):
+                kinds.add(float)
+            else:
+                return
 
-        # Prevent unchanged cells from being recalculated on cursor movement
+        if kinds == {bool}:
+            dtype, fill_value = numpy.bool_, False
+        elif kinds == {int}:
+            dtype, fill_value = numpy.int64, 0
+        elif kinds in ({float}, {int, float}):
+            dtype, fill_value = numpy.float64, 0.0
+        else:
+            return
 
-        repr_key = repr(key)
+        if has_none:
+            mask = [value is None for value in values]
+            values = [fill_value if value is None else value
+                      for value in values]
 
-        unchanged = (repr_key in self.result_cache and
-                     value == self(key)) or \
-                    ((value is None or value == "") and
-                     repr_key not in self.result_cache)
+        array = numpy.array(values, dtype=dtype).reshape(shape)
 
-        super().__setitem__(key, value)
+        if has_none:
+            return numpy.ma.masked_array(array,
+                                         mask=numpy.reshape(mask, shape))
 
-        if not unchanged:
-            # Reset result cache
-            self.result_cache = {}
+        return array
 
-    def __getitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
-                                     Union[int, slice]]) -> Any:
-        """Returns _eval_cell
+    def _get_updated_environment(self, env_dict: dict = None
+                                 ) -> "CellEnvironment":
+        """Returns globals environment with 'magic' variable
 
-        :param key: Cell key for result retrieval (code if in safe mode)
+        The module globals are not copied but shared as read-only base.
+
+        :param env_dict: Maps global variable name to value, None: {'S': self}
 
         """
 
-        code = self(key)
+        if env_dict is None:
+            env_dict = {'S': self}
 
-        if code is None:
-            return
+        return CellEnvironment(globals(), env_dict)
 
-        # Cached cell handling
+    @staticmethod
+    @lru_cache(maxsize=code_cache_size)
+    def literal_value(code: str) -> Any:
+        """Returns value of code if it is an immutable literal, cached
 
-        if repr(key) in self.result_cache:
-            return self.result_cache[repr(key)]
+        Returns :attr:`no_literal` for other code, which has to be evaluated.
+        Mutable literals such as lists are not returned because each
+        evaluation has to create a new object.
 
-        if not any(isinstance(k, slice) for k in key):
-            # Button cell handling
-            if self.cell_attributes[key].button_cell is not False:
-                return
-            # Frozen cell handling
-            frozen_res = self.cell_attributes[key].frozen
-            if frozen_res:
-                if repr(key) in self.frozen_cache:
-                    return self.frozen_cache[repr(key)]
-                # Frozen cache is empty.
-                # Maybe we have a reload without the frozen cache
-                result = self._eval_cell(key, code)
-                self.frozen_cache[repr(key)] = result
-                return result
+        :param code: Code to be classified
 
-        # Normal cell handling
+        """
 
-        result = self._eval_cell(key, code)
-        self.result_cache[repr(key)] = result
+        number = ColumnStore.parse(code)
+        if number is not None:
+            return number
 
-        return result
+        if not isinstance(code, str) or code[:1] in (" ", "\t"):
+            # Leading whitespace is an IndentationError in cells
+            return CodeArray.no_literal
 
-    def _make_nested_list(self, gen: Union[Iterable, Iterable[Iterable],
-                                           Iterable[Iterable[Iterable]]]
-                          ) -> Union[Sequence, Sequence[Sequence],
-                                     Sequence[Sequence[Sequence]]]:
-        """Makes nested list from generator for creating numpy.array"""
+        try:
+            value = ast.literal_eval(code)
+        except (ValueError, TypeError, SyntaxError, MemoryError,
+                RecursionError):
+            return CodeArray.no_literal
 
-        res = []
+        if CodeArray._is_immutable_literal(value):
+            return value
 
-        for ele in gen:
-            if ele is None:
-                res.append(None)
+        return CodeArray.no_literal
 
-            elif not is_stringlike(ele) and isgenerator(ele):
-                # Nested generator
-                res.append(self._make_nested_list(ele))
+    @staticmethod
+    def _is_immutable_literal(value: Any) -> bool:
+        """True if value and all its elements are immutable literal values
 
-            else:
-                res.append(ele)
+        :param value: Value from literal evaluation
 
-        return res
+        """
 
-    def _get_updated_environment(self, env_dict: dict = None) -> dict:
-        """Returns globals environment with 'magic' variable
+        if type(value) in (tuple, frozenset):
+            return all(map(CodeArray._is_immutable_literal, value))
 
-        :param env_dict: Maps global variable name to value, None: {'S': self}
+        return type(value) in CodeArray.literal_types
+
+    @staticmethod
+    @lru_cache(maxsize=code_cache_size)
+    def compile_code(code: str) -> CompiledCode:
+        """Returns code split into exec block and eval expression, cached
+
+        Identical code strings, e.g. copied formulas, are parsed and compiled
+        only once.
+
+        :param code: Code to be compiled
 
         """
 
-        if env_dict is None:
-            env_dict = {'S': self}
+        block = ast.parse(code, mode='exec')
+
+        # assumes last node is an expression
+        last_body = block.body.pop()
+        last = ast.Expression(last_body.value)
 
-        env = globals().copy()
-        env.update(env_dict)
+        exec_code = compile(block, '<string>', mode='exec')
+        eval_code = compile(last, '<string>', mode='eval')
+        targets = getattr(last_body, "targets", [])
 
-        return env
+        return CompiledCode(exec_code, eval_code, targets)
 
     def exec_then_eval(self, code: str,
                        _globals: dict = None, _locals: dict = None):
         """execs multiline code and returns eval of last code line
 
+        Only names that are assigned in the last code line are written to the
+        module globals, where other cells and macros can access them.
+
         :param code: Code to be executed / evaled
         :param _globals: Globals dict for code execution and eval
-        :param _locals: Locals dict for code execution and eval
+        :param _locals: Locals dict for code execution and eval, None: _globals
 
         """
 
@@ -1344,22 +4963,16 @@ class CodeArray(DataArray):
             _globals = {}
 
         if _locals is None:
-            _locals = {}
-
-        block = ast.parse(code, mode='exec')
+            _locals = _globals
 
-        # assumes last node is an expression
-        last_body = block.body.pop()
-        last = ast.Expression(last_body.value)
-
-        exec(compile(block, '<string>', mode='exec'), _globals, _locals)
-        res = eval(compile(last, '<string>', mode='eval'), _globals, _locals)
+        compiled_code = self.compile_code(code)
 
-        if hasattr(last_body, "targets"):
-            for target in last_body.targets:
-                _globals[target.id] = res
+        exec(compiled_code.exec_code, _globals, _locals)
+        res = eval(compiled_code.eval_code, _globals, _locals)
 
-        globals().update(_globals)
+        for target in compiled_code.targets:
+            _globals[target.id] = res
+            globals()[target.id] = res
 
         return res
 
@@ -1384,6 +4997,11 @@ class CodeArray(DataArray):
         # Flatten helper function
         def nn(val: numpy.array) -> numpy.array:
             """Returns flat numpy array without None values"""
+
+            if isinstance(val, numpy.ma.MaskedArray):
+                # Typed range with empty cells
+                return val.compressed()
+
             try:
                 return numpy.array([_f for _f in val.flat if _f is not None],
                                    dtype="O")
@@ -1393,6 +5011,13 @@ class CodeArray(DataArray):
                 return numpy.array([_f for _f in val if _f is not None],
                                    dtype="O")
 
+        if not self.safe_mode and not self.profiler.enabled \
+           and isinstance(code, str):
+            # Constant cells need no environment and no evaluation
+            value = self.literal_value(code)
+            if value is not self.no_literal:
+                return value
+
         env_dict = {'X': key[0], 'Y': key[1], 'Z': key[2], 'bz2': bz2,
                     'base64': base64, 'nn': nn, 'help': help, 'Figure': Figure,
                     'R': key[0], 'C': key[1], 'T': key[2], 'S': self}
@@ -1408,17 +5033,37 @@ class CodeArray(DataArray):
 
         if isgenerator(code):
             # We have a generator object
-            return numpy.array(self._make_nested_list(code), dtype="O")
+            return self.evaluate_range(key)
 
-        try:
-            signal.signal(signal.SIGALRM, self.handler)
-            signal.alarm(self.settings.timeout)
-        except AttributeError:
-            # No Unix system
-            pass
+        profiler = self.profiler
+        profiling = profiler.enabled
+        if profiling:
+            profiler.start()
+
+        # Nested cell evaluations keep the deadline of the outermost cell
+        armed = self._arm_watchdog()
 
+        result = None
         try:
-            result = self.exec_then_eval(code, env, {})
+            try:
+                if profiler.cprofile_key == tuple(key):
+                    result = profiler.run_cprofile(self.exec_then_eval, code,
+                                                   env)
+                else:
+                    result = self.exec_then_eval(code, env)
+            finally:
+                if armed:
+                    self.watchdog.disarm()
+
+        except EvaluationTimeout:
+            if not armed:
+                # Let the cell that owns the deadline handle the timeout
+                raise
+            # The timeout may have interrupted the result cache or
+            # dependency graph bookkeeping of a nested cell evaluation
+            self.result_cache.clear()
+            self.dep_graph.clear()
+            result = RuntimeError(f"Timeout after {self.settings.timeout} ms.")
 
         except AttributeError as err:
             # Attribute Error includes RunTimeError
@@ -1431,11 +5076,8 @@ class CodeArray(DataArray):
             result = Exception(err)
 
         finally:
-            try:
-                signal.alarm(0)
-            except AttributeError:
-                # No POSIX system
-                pass
+            if profiling:
+                profiler.stop(key, result)
 
         # Change back cell value for evaluation from other cells
         # self.dict_grid[key] = _old_code
@@ -1449,13 +5091,47 @@ class CodeArray(DataArray):
 
         """
 
-        try:
-            self.result_cache.pop(repr(key))
+        old_code = self.dict_grid.get(key)
+        code = super().pop(key)
+        self._invalidate(key, old_code)
 
-        except KeyError:
-            pass
+        return code
+
+    def insert(self, insertion_point: int, no_to_insert: int, axis: int,
+               tab: int = None):
+        """Inserts no_to_insert rows/cols/tabs/... and clears result cache
+
+        Dependencies are not shifted. Therefore, all results are discarded.
+
+        :param insertion_point: Point on axis at which insertion takes place
+        :param no_to_insert: Number of rows/cols/tabs to be inserted (>=0)
+        :param axis: Row/Column/Table insertion if 0/1/2 must be in 0, 1, 2
+        :param tab: Table at which insertion takes place, None means all tables
+
+        """
+
+        self.result_cache.clear()
+        self.dep_graph.clear()
+
+        super().insert(insertion_point, no_to_insert, axis, tab)
+
+    def delete(self, deletion_point: int, no_to_delete: int, axis: int,
+               tab: int = None):
+        """Deletes no_to_delete rows/cols/... and clears result cache
+
+        Dependencies are not shifted. Therefore, all results are discarded.
+
+        :param deletion_point: Point on axis at which deletion takes place
+        :param no_to_delete: Number of rows/cols/tabs to be deleted (>=0)
+        :param axis: Row/Column/Table deletion if 0/1/2, must be in 0, 1, 2
+        :param tab: Table at which insertion takes place, None means all tables
 
-        return super().pop(key)
+        """
+
+        self.result_cache.clear()
+        self.dep_graph.clear()
+
+        super().delete(deletion_point, no_to_delete, axis, tab)
 
     def reload_modules(self):
         """Reloads modules that are available in cells"""
@@ -1476,9 +5152,20 @@ class CodeArray(DataArray):
                      'DefaultCellAttributeDict', 'ast', '__builtins__',
                      '__file__', 'sys', '__name__', 'QImage', 'defaultdict',
                      'copy', 'imap', 'ifilter', 'Selection', 'DictGrid',
-                     'numpy', 'CodeArray', 'DataArray', 'datetime', 'Decimal',
-                     'decimal', 'signal', 'Any', 'Dict', 'Iterable', 'List',
-                     'NamedTuple', 'Sequence', 'Tuple', 'Union']
+                     'numpy', 'CodeArray', 'DataArray', 'DependencyGraph',
+                     'CompiledCode', 'CellEnvironment', 'ResultCache',
+                     'CellProfile', 'EvaluationProfiler', 'CellAttributeIndex',
+                     'inf', 'cProfile', 'csv', 'json', 'pstats',
+                     'perf_counter', 'EvaluationTimeout', 'Watchdog',
+                     'OrderedDict', 'WorkerCodeArray', 'lru_cache', 'pickle',
+                     'ProcessPoolExecutor', 'BrokenProcessPool', 'datetime',
+                     'CancelledError', 'Future', 'multiprocessing',
+                     'Decimal', 'decimal', 'Any', 'Dict', 'Iterable', 'List',
+                     'NamedTuple', 'Callable', 'TextIO', 'Sequence', 'Tuple',
+                     'Union', 'Optional', 'MergeAreaIndex', 'count', 'groupby',
+                     'bisect_left', 'bisect_right', 'insort', 'AxisMap',
+                     'NumericColumn', 'ColumnStore', 'chain', 'isfinite',
+                     'DictGridSnapshot']
 
         try:
             from moneyed import Money
@@ -1507,9 +5194,19 @@ class CodeArray(DataArray):
         if self.safe_mode:
             return '', "Safe mode activated. Code not executed."
 
-        # We need to execute each cell so that assigned globals are updated
-        for key in self:
-            self[key]
+        # We need to execute each cell that assigns globals so that these
+        # are updated. Other cells are evaluated lazily or in the background.
+        # Cells that have not been loaded are only loaded if they may assign
+        # globals.
+        loader = self.dict_grid.loader
+        if loader is None or loader.global_keys is None:
+            keys = list(self)
+        else:
+            keys = dict.fromkeys(chain(self.dict_grid.loaded_keys(),
+                                       loader.global_keys))
+        for key in keys:
+            if self._writes_globals(self(key)):
+                self[key]
 
         # Windows exec does not like Windows newline
         self.macros = self.macros.replace('\r\n', '\n')
@@ -1531,20 +5228,14 @@ class CodeArray(DataArray):
         sys.stdout = code_out
         sys.stderr = code_err
 
-        try:
-            signal.signal(signal.SIGALRM, self.handler)
-            signal.alarm(self.settings.timeout)
-        except AttributeError:
-            # No POSIX system
-            pass
+        armed = self._arm_watchdog()
 
         try:
-            exec(self.macros, globals())
             try:
-                signal.alarm(0)
-            except AttributeError:
-                # No POSIX system
-                pass
+                exec(self.macros, globals())
+            finally:
+                if armed:
+                    self.watchdog.disarm()
 
         except Exception:
             exc_info = sys.exc_info()
@@ -1560,39 +5251,191 @@ class CodeArray(DataArray):
         code_out.close()
         code_err.close()
 
-        # Reset result cache
+        # Reset result cache, also after a timeout that interrupted its
+        # bookkeeping
         self.result_cache.clear()
+        self.dep_graph.clear()
 
         return results, errs
 
-    def _sorted_keys(self, keys: Iterable[Tuple[int, int, int]],
-                     startkey: Tuple[int, int, int],
-                     reverse: bool = False) -> Iterable[Tuple[int, int, int]]:
-        """Generator that yields sorted keys starting with startkey
+    @staticmethod
+    def _code_names(code_object: Any) -> set:
+        """Returns names that code object and nested code objects access
 
-        :param keys: Key sequence that is sorted
-        :param startkey: First key to be yielded
-        :param reverse: Sort direction reversed if True
+        :param code_object: Compiled code
 
         """
 
-        def tuple_key(tpl):
-            return tpl[::-1]
+        names = set(code_object.co_names)
 
-        if reverse:
-            def tuple_cmp(tpl):
-                return tpl[::-1] > startkey[::-1]
-        else:
-            def tuple_cmp(tpl):
-                return tpl[::-1] < startkey[::-1]
+        for const in code_object.co_consts:
+            if hasattr(const, "co_names"):
+                names.update(CodeArray._code_names(const))
 
-        searchkeys = sorted(keys, key=tuple_key, reverse=reverse)
-        searchpos = sum(1 for _ in filter(tuple_cmp, searchkeys))
+        return names
 
-        searchkeys = searchkeys[searchpos:] + searchkeys[:searchpos]
+    def _is_independent(self, key: Tuple[int, int, int]) -> bool:
+        """True if cell can be evaluated without accessing other cells
 
-        for key in searchkeys:
-            yield key
+        Such cells neither access `S` nor assign globals. Frozen cells and
+        button cells are never considered independent.
+
+        :param key: Key of cell to be checked
+
+        """
+
+        code = self(key)
+
+        if not code or self._writes_globals(code):
+            return False
+
+        attributes = self.cell_attributes[key]
+        if attributes.frozen or attributes.button_cell is not False:
+            return False
+
+        try:
+            compiled_code = self.compile_code(code)
+        except Exception:
+            return False
+
+        names = self._code_names(compiled_code.exec_code) \
+            | self._code_names(compiled_code.eval_code)
+
+        return "S" not in names
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Returns process pool, in which the current macros are executed
+
+        The pool is reused until the macros, the shape or the timeout
+        change. Workers are started with the forkserver or spawn method,
+        because forking the multi-threaded GUI process may deadlock.
+
+        """
+
+        initargs = self.shape, self.settings.timeout, self.macros
+
+        if self._pool is not None and self._pool_initargs != initargs:
+            self.shutdown_pool()
+
+        if self._pool is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+            else:
+                context = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(
+                mp_context=context, initializer=WorkerCodeArray.init_worker,
+                initargs=initargs)
+            self._pool_initargs = initargs
+
+        return self._pool
+
+    def shutdown_pool(self):
+        """Shuts down the process pool and cancels its pending cells"""
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._pool_initargs = None
+
+    def submit_parallel(self, keys: Iterable[Tuple[int, int, int]]
+                        ) -> Dict[Tuple[int, int, int], Future]:
+        """Submits independent cells to a process pool, returns futures
+
+        Only cells that pass :meth:`_is_independent` are submitted.
+        Dependent cells are not grouped by their dependencies but left for
+        the normal in-process evaluation. Literal values are stored in the
+        result cache directly. The results are stored with
+        :meth:`store_parallel_result` when the futures are done.
+
+        :param keys: Keys of cells to be evaluated
+
+        """
+
+        futures = {}
+
+        if self.safe_mode:
+            return futures
+
+        keys = [key for key in keys if key not in self.result_cache
+                and self._is_independent(key)]
+
+        pool = None
+        for key in keys:
+            code = self(key)
+            value = self.literal_value(code)
+            if value is not self.no_literal:
+                self.result_cache[key] = value
+                continue
+
+            try:
+                if pool is None:
+                    pool = self._get_pool()
+                futures[key] = pool.submit(WorkerCodeArray.eval_in_worker,
+                                           key, code)
+            except (BrokenProcessPool, OSError, RuntimeError):
+                # Remaining cells are evaluated in-process
+                self.shutdown_pool()
+                break
+
+        return futures
+
+    def store_parallel_result(self, key: Tuple[int, int, int],
+                              future: Future) -> bool:
+        """Stores result of a done future from submit_parallel
+
+        Returns False if there is no result that can be stored. Then, the
+        cell is left for the normal in-process evaluation. This is the case
+        for cells with unpicklable or exception results, for results that
+        cannot be unpickled in this process and for cells that have been
+        changed since their submission.
+
+        :param key: Key of cell, for which future has been submitted
+        :param future: Future from :meth:`submit_parallel`
+
+        """
+
+        try:
+            _, code, data = future.result()
+        except CancelledError:
+            return False
+        except (BrokenProcessPool, OSError):
+            self.shutdown_pool()
+            return False
+
+        if data is None or code != self(key):
+            return False
+
+        try:
+            result = pickle.loads(data)
+        except Exception:
+            # E.g. classes from macros that are not importable
+            return False
+
+        self.result_cache[key] = result
+
+        return True
+
+    def evaluate_parallel(self, keys: Iterable[Tuple[int, int, int]] = None
+                          ) -> int:
+        """Evaluates independent cells in a process pool and waits
+
+        See :meth:`submit_parallel`. Returns the number of results that have
+        been stored.
+
+        :param keys: Keys of cells to be evaluated, None: all cells
+
+        """
+
+        if keys is None:
+            keys = self.keys()
+
+        keys = [key for key in keys if key not in self.result_cache]
+
+        futures = self.submit_parallel(keys)
+        for key, future in futures.items():
+            self.store_parallel_result(key, future)
+
+        return sum(key in self.result_cache for key in keys)
 
     def string_match(self, datastring: str, findstring: str, word: bool,
                      case: bool, regexp: bool) -> int:
@@ -1662,10 +5505,7 @@ class CodeArray(DataArray):
 
         # List of keys in sgrid in search order
 
-        table = startkey[2]
-        keys = [key for key in self.keys() if key[2] == table]
-
-        for key in self._sorted_keys(keys, startkey, reverse=up):
+        for key in self.dict_grid.search_keys(startkey, reverse=up):
             try:
                 if is_matching(key, find_string, word, case, regexp):
                     return key
@@ -1674,14 +5514,89 @@ class CodeArray(DataArray):
                 # re errors are cryptical: sre_constants,...
                 pass
 
-    def handler(self, signum: Any, frame: Any):
-        """Signal handler for timeout
+    def _arm_watchdog(self) -> bool:
+        """Sets evaluation deadline for the current thread from settings
 
-        :param signum: Ignored
-        :param frame: Ignored
+        Returns True if a deadline has been set. Then, the caller has to
+        disarm the watchdog when evaluation has finished. No deadline is set
+        if the timeout setting is 0 or if the current thread already has one.
 
         """
 
-        raise RuntimeError("Timeout after {} s.".format(self.settings.timeout))
+        if self.settings.timeout <= 0:
+            return False
+
+        return self.watchdog.arm(self.settings.timeout / 1000)
 
 # End of class CodeArray
+
+# -----------------------------------------------------------------------------
+
+
+class WorkerCodeArray(CodeArray):
+    """CodeArray that evaluates single cells inside a pool worker process
+
+    The worker grid is empty. Cell access via `S` raises an error so that
+    the respective cell is evaluated in the main process instead.
+
+    """
+
+    # Worker instance, one per worker process
+    instance = None
+
+    def __getitem__(self, key: Tuple[Union[int, slice], Union[int, slice],
+                                     Union[int, slice]]) -> Any:
+        """Raises RuntimeError because the worker has no cell access
+
+        :param key: Cell key
+
+        """
+
+        raise RuntimeError("Cell access is unavailable in worker processes")
+
+    __call__ = __getitem__
+
+    @classmethod
+    def init_worker(cls, shape: Tuple[int, int, int], timeout: int,
+                    macros: str):
+        """Pool initializer that creates the instance and executes macros
+
+        :param shape: Shape of the grid
+        :param timeout: Cell evaluation timeout
+        :param macros: Macros of the main process
+
+        """
+
+        settings = AttrDict([("timeout", timeout),
+                             ("parallel_recalculation", False),
+                             ("result_cache_size", 1024),
+                             ("columnar_storage", False)])
+
+        cls.instance = cls(shape, settings)
+        cls.instance.macros = macros
+        cls.instance.execute_macros()
+
+    @classmethod
+    def eval_in_worker(cls, key: Tuple[int, int, int],
+                       code: str) -> Tuple[Tuple[int, int, int], str, bytes]:
+        """Evaluates cell code and returns key, code and pickled result
+
+        The pickled result is None if the result is an exception or if it
+        cannot be pickled.
+
+        :param key: Key of cell to be evaluated
+        :param code: Code of cell to be evaluated
+
+        """
+
+        result = cls.instance._eval_cell(key, code)
+
+        if isinstance(result, Exception):
+            return key, code, None
+
+        try:
+            return key, code, pickle.dumps(result)
+        except Exception:
+            return key, code, None
+
+# End of class WorkerCodeArray
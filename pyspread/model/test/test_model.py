@@ -34,8 +34,13 @@ from builtins import range
 from builtins import object
 
 import fractions  # Yes, it is required
+import io
+from itertools import count, product
+import json
 import math  # Yes, it is required
 from os.path import abspath, dirname, join
+import pickle
+import random
 import sys
 
 import pytest
@@ -45,7 +50,9 @@ pyspread_path = abspath(join(dirname(__file__) + "/../.."))
 sys.path.insert(0, pyspread_path)
 
 from model.model import (KeyValueStore, CellAttributes, DictGrid, DataArray,
-                         CodeArray, CellAttribute, DefaultCellAttributeDict)
+                         CodeArray, CellAttribute, DefaultCellAttributeDict,
+                         ResultCache, CellAttributeIndex, MergeAreaIndex,
+                         AxisMap, ColumnStore, NumericColumn)
 
 from lib.attrdict import AttrDict
 from lib.selection import Selection
@@ -56,6 +63,10 @@ class Settings:
     """Simulates settings class"""
 
     timeout = 1000
+    parallel_recalculation = False
+    result_cache_size = 1024
+    compact_attributes_on_save = True
+    columnar_storage = False
 
 
 class TestCellAttributes(object):
@@ -105,6 +116,73 @@ class TestCellAttributes(object):
 
         assert self.cell_attr[2, 53, 0].testattr == 5
 
+    def test_setitem_same_length(self):
+        """Test that replacing a layer invalidates cached lookups"""
+
+        assert self.cell_attr[32, 53, 0].testattr == 2
+
+        selection = Selection([], [], [], [], [(32, 53)])
+        self.cell_attr[1] = CellAttribute(selection, 0,
+                                          AttrDict([("testattr", 7)]))
+
+        assert self.cell_attr[32, 53, 0].testattr == 7
+
+    def test_caches_per_instance(self):
+        """Test that other instances do not touch the caches"""
+
+        self.cell_attr[32, 53, 0]
+        generation = self.cell_attr.generation
+
+        self.cell_attr.for_table(0)
+        CellAttributes().append(list(self.cell_attr)[0])
+
+        assert self.cell_attr.generation == generation
+        assert (32, 53, 0) in self.cell_attr._attr_cache
+
+    def test_append_incremental(self):
+        """Test that append only invalidates cells in its selection"""
+
+        self.cell_attr[32, 53, 0]
+        self.cell_attr[3, 3, 0]
+
+        selection = Selection([(0, 0)], [(9, 9)], [], [], [])
+        self.cell_attr.append(CellAttribute(selection, 0,
+                                            AttrDict([("testattr", 9)])))
+
+        assert (32, 53, 0) in self.cell_attr._attr_cache
+        assert (3, 3, 0) not in self.cell_attr._attr_cache
+        assert self.cell_attr[3, 3, 0].testattr == 9
+        assert self.cell_attr[32, 53, 0].testattr == 2
+
+    def test_pop(self):
+        """Test that pop invalidates cached lookups"""
+
+        assert self.cell_attr[32, 53, 0].testattr == 2
+        self.cell_attr.pop()
+        assert "testattr" not in self.cell_attr[32, 53, 0]
+
+    def test_attr_cache_size(self):
+        """Test that the attribute cache is bounded"""
+
+        self.cell_attr.attr_cache_size = 10
+
+        for row in range(20):
+            self.cell_attr[row, 0, 0]
+
+        assert len(self.cell_attr._attr_cache) == 10
+        assert (19, 0, 0) in self.cell_attr._attr_cache
+
+    def test_pickle(self):
+        """Test that pickled cell attributes have fresh caches"""
+
+        self.cell_attr[32, 53, 0]
+
+        cell_attr = pickle.loads(pickle.dumps(self.cell_attr))
+
+        assert cell_attr == self.cell_attr
+        assert not cell_attr._attr_cache
+        assert cell_attr[32, 53, 0].testattr == 2
+
     def test_len_table_cache(self):
         """Test _len_table_cache"""
 
@@ -147,6 +225,24 @@ class TestCellAttributes(object):
         # Cell 2. 2, 0 is merged to cell 2, 2, 0
         assert self.cell_attr.get_merging_cell((2, 2, 0)) == (2, 2, 0)
 
+    def test_merge_areas(self):
+        """Test merge_areas after merging and unmerging"""
+
+        selection = Selection([(2, 2)], [(5, 5)], [], [], [])
+        self.cell_attr.append(CellAttribute(
+            selection, 0, AttrDict([("merge_area", (2, 2, 5, 5))])))
+        self.cell_attr.append(CellAttribute(
+            selection, 0, AttrDict([("merge_area", (2, 2, 4, 4))])))
+
+        assert self.cell_attr.merge_areas(0) == [(2, 2, 4, 4)]
+        assert self.cell_attr.get_merging_cell((5, 5, 0)) is None
+
+        self.cell_attr.append(CellAttribute(
+            selection, 0, AttrDict([("merge_area", None)])))
+
+        assert self.cell_attr.merge_areas(0) == []
+        assert self.cell_attr.get_merging_cell((3, 3, 0)) is None
+
     def test_for_table(self):
         """Test for_table"""
 
@@ -160,6 +256,200 @@ class TestCellAttributes(object):
         result_cas.append(ca3)
         assert self.cell_attr.for_table(2) == result_cas
 
+    def test_compacted(self):
+        """Test compacted"""
+
+        for row in range(3):
+            for column in range(4):
+                selection = Selection([], [], [], [], [(row, column)])
+                self.cell_attr.append(
+                    CellAttribute(selection, 1, AttrDict([("bgcolor", 1)])))
+        selection = Selection([(0, 0)], [(1, 9)], [], [], [])
+        self.cell_attr.append(
+            CellAttribute(selection, 1, AttrDict([("bgcolor", 2)])))
+
+        compacted = self.cell_attr.compacted()
+
+        assert isinstance(compacted, CellAttributes)
+        assert len(compacted.for_table(1)) == 2
+        coalesced = list(compacted.for_table(1))[0]
+        assert coalesced.selection == Selection([(2, 0)], [(2, 3)], [], [],
+                                                [])
+        assert compacted.for_table(0) == self.cell_attr.for_table(0)
+
+    def test_compacted_merge_adjacent(self):
+        """Test compacted merging equal selections and equal attributes"""
+
+        selection = Selection([], [], [4], [], [])
+        for attr in ("bold", "italic"):
+            self.cell_attr.append(
+                CellAttribute(selection, 1, AttrDict([(attr, True)])))
+        selection = Selection([], [], [5], [], [])
+        self.cell_attr.append(
+            CellAttribute(selection, 1, AttrDict([("bold", True),
+                                                  ("italic", True)])))
+
+        layers = list(self.cell_attr.compacted().for_table(1))
+
+        assert len(layers) == 1
+        assert layers[0].selection.rows == [4, 5]
+
+    def test_compacted_keeps_merge_areas(self):
+        """Test that compacted does not touch merge areas"""
+
+        selection = Selection([(2, 2)], [(5, 5)], [], [], [])
+        attr = AttrDict([("merge_area", (2, 2, 5, 5))])
+        self.cell_attr.append(CellAttribute(selection, 1, attr))
+        self.cell_attr.append(
+            CellAttribute(Selection([], [], [], [3], []), 1, AttrDict()))
+
+        assert list(self.cell_attr.compacted().for_table(1)) == \
+            list(self.cell_attr.for_table(1))[:1]
+
+    def test_compacted_keeps_spill_areas(self):
+        """Test that compacted does not coalesce spill anchors"""
+
+        for column in range(2):
+            selection = Selection([], [], [], [], [(0, column)])
+            attr = AttrDict([("spill_shape", (5, 1))])
+            self.cell_attr.append(CellAttribute(selection, 1, attr))
+
+        expected = self.cell_attr._spill_areas()[1]
+        compacted = self.cell_attr.compacted()
+
+        assert list(compacted.for_table(1)) == \
+            list(self.cell_attr.for_table(1))
+        assert compacted._spill_areas()[1] == expected
+
+    def test_compacted_equivalent(self):
+        """Test that compacted cell attributes yield the same formats"""
+
+        rng = random.Random(42)
+        for _ in range(300):
+            kind = rng.randrange(4)
+            row, column = rng.randrange(12), rng.randrange(12)
+            if kind == 0:
+                selection = Selection([], [], [], [], [(row, column)])
+            elif kind == 1:
+                selection = Selection([(row, column)],
+                                      [(row + rng.randrange(4),
+                                        column + rng.randrange(4))],
+                                      [], [], [])
+            elif kind == 2:
+                selection = Selection([], [], [row], [], [])
+            else:
+                selection = Selection([], [], [], [column], [])
+            attr = AttrDict([(rng.choice("abc"), rng.randrange(3))])
+            self.cell_attr.append(
+                CellAttribute(selection, rng.randrange(2), attr))
+
+        compacted = self.cell_attr.compacted()
+
+        assert len(compacted) < len(self.cell_attr)
+
+        keys = list(product(range(18), range(18), range(2)))
+        expected = [dict(self.cell_attr[key]) for key in keys]
+        self.cell_attr.set_layers(compacted)
+        assert [dict(self.cell_attr[key]) for key in keys] == expected
+
+    def test_set_layers(self):
+        """Test set_layers"""
+
+        self.cell_attr[2, 2, 0]
+        selection = Selection([], [], [], [], [(2, 2)])
+        ca = CellAttribute(selection, 0, AttrDict([("testattr", 7)]))
+
+        self.cell_attr.set_layers([ca])
+
+        assert not self.cell_attr._attr_cache
+        assert list(self.cell_attr) == [ca]
+        assert self.cell_attr[2, 2, 0].testattr == 7
+
+
+class TestCellAttributeIndex(object):
+    """Unit tests for CellAttributeIndex"""
+
+    selections = [
+        Selection([(2, 2)], [(4, 5)], [55], [55, 66], [(34, 56)]),
+        Selection([], [], [], [], [(32, 53), (34, 56)]),
+        Selection([(None, 3)], [(None, 3)], [], [], []),
+        Selection([(100, None)], [(None, None)], [], [], []),
+        Selection([(0, 0)], [(999, 99)], [], [], []),
+        Selection([(60, 60)], [(70, 70)], [3], [], []),
+    ]
+
+    param_test_layers = [
+        ((0, 0), [4]),
+        ((3, 3), [0, 2, 4, 5]),
+        ((34, 56), [0, 1, 4]),
+        ((55, 3), [0, 2, 4]),
+        ((64, 64), [4, 5]),
+        ((5000, 3), [2, 3]),
+        ((1000, 100), [3]),
+    ]
+
+    @pytest.mark.parametrize("cell, layers", param_test_layers)
+    def test_layers(self, cell, layers):
+        """Unit test for layers"""
+
+        index = CellAttributeIndex(self.selections)
+
+        assert index.layers(*cell) == layers
+        assert layers == [i for i, selection in enumerate(self.selections)
+                          if cell in selection]
+
+
+class TestMergeAreaIndex(object):
+    """Unit tests for MergeAreaIndex"""
+
+    def setup_method(self, method):
+        """Creates MergeAreaIndex with small and large merge areas"""
+
+        self.index = MergeAreaIndex()
+        self.index.add(0, (2, 2, 5, 5))
+        self.index.add(0, (60, 60, 70, 70))
+        self.index.add(0, (100, 0, 100000, 3))
+        self.index.add(1, (2, 2, 9, 9))
+
+    param_test_get = [
+        ((1, 1, 0), None),
+        ((3, 3, 0), (2, 2, 5, 5)),
+        ((64, 66, 0), (60, 60, 70, 70)),
+        ((5000, 3, 0), (100, 0, 100000, 3)),
+        ((5000, 4, 0), None),
+        ((8, 8, 1), (2, 2, 9, 9)),
+        ((8, 8, 2), None),
+    ]
+
+    @pytest.mark.parametrize("key, merge_area", param_test_get)
+    def test_get(self, key, merge_area):
+        """Unit test for get"""
+
+        assert self.index.get(*key) == merge_area
+
+    def test_remove(self):
+        """Unit test for remove"""
+
+        self.index.remove(0, (100, 0, 100000, 3))
+        self.index.remove(0, (60, 60, 70, 70))
+
+        assert self.index.get(5000, 3, 0) is None
+        assert self.index.get(64, 66, 0) is None
+        assert self.index.merge_areas(0) == [(2, 2, 5, 5)]
+
+    def test_first_added_wins(self):
+        """Overlapping merge areas resolve to the first one added"""
+
+        self.index.add(0, (0, 0, 3, 3))
+
+        assert self.index.get(3, 3, 0) == (2, 2, 5, 5)
+
+    def test_merge_areas(self):
+        """Unit test for merge_areas"""
+
+        assert self.index.merge_areas(1) == [(2, 2, 9, 9)]
+        assert self.index.merge_areas(3) == []
+
 
 class TestKeyValueStore(object):
     """Unit tests for KeyValueStore"""
@@ -180,6 +470,101 @@ class TestKeyValueStore(object):
         assert self.k_v_store[key] == 7
 
 
+class TestAxisMap(object):
+    """Unit tests for AxisMap"""
+
+    def setup_method(self, method):
+        """Creates identity AxisMap"""
+
+        self.axis_map = AxisMap()
+
+    def test_identity(self):
+        """New map is the identity"""
+
+        assert self.axis_map.is_identity
+        assert [self.axis_map.to_physical(i) for i in range(5)] == \
+            list(range(5))
+        assert self.axis_map.to_logical(3) == 3
+        assert self.axis_map.to_physical(-2) == -2
+
+    def test_insert(self):
+        """Inserted indices are fresh, later indices are shifted"""
+
+        self.axis_map.insert(2, 3)
+
+        assert not self.axis_map.is_identity
+        assert [self.axis_map.to_physical(i) for i in (0, 1, 5, 6)] == \
+            [0, 1, 2, 3]
+        fresh = [self.axis_map.to_physical(i) for i in range(2, 5)]
+        assert fresh == list(range(AxisMap.fresh_start,
+                                   AxisMap.fresh_start + 3))
+        assert self.axis_map.to_logical(2) == 5
+        assert self.axis_map.to_logical(AxisMap.fresh_start + 1) == 3
+
+    def test_delete(self):
+        """Deleted indices become unmapped, later indices are shifted"""
+
+        self.axis_map.delete(2, 3)
+
+        assert [self.axis_map.to_physical(i) for i in range(4)] == \
+            [0, 1, 5, 6]
+        assert self.axis_map.to_logical(3) is None
+        assert self.axis_map.to_logical(5) == 2
+
+    def test_insert_delete_join(self):
+        """Deleting inserted indices restores the identity"""
+
+        self.axis_map.insert(4, 10)
+        self.axis_map.delete(4, 10)
+
+        assert self.axis_map.is_identity
+        assert len(self.axis_map) == 1
+
+    def test_segments(self):
+        """Segments are clipped to the logical range"""
+
+        self.axis_map.insert(2, 3)
+
+        assert list(self.axis_map.segments(1, 6)) == \
+            [(1, 2, 0), (2, 5, AxisMap.fresh_start - 2), (5, 6, -3)]
+
+    def test_fresh_not_in_last_segment(self):
+        """Fresh indices are not mapped through the last segment"""
+
+        self.axis_map.insert(2, 3)
+        self.axis_map.delete(2, 1)
+
+        assert self.axis_map.to_logical(AxisMap.fresh_start) is None
+        assert self.axis_map.to_logical(AxisMap.fresh_start + 1) == 2
+        assert list(self.axis_map.segments(3)) == \
+            [(3, 4, AxisMap.fresh_start - 1), (4, AxisMap.fresh_start + 2, -2)]
+
+    def test_random(self):
+        """Map equals a list that is edited in the same way"""
+
+        rng = random.Random(3)
+        indices = list(range(50))
+        fresh = count(-1, -1)
+
+        for _ in range(200):
+            point = rng.randrange(len(indices) + 1)
+            number = rng.randrange(1, 5)
+            if rng.random() < .5:
+                self.axis_map.insert(point, number)
+                indices[point:point] = [next(fresh) for _ in range(number)]
+            else:
+                self.axis_map.delete(point, number)
+                del indices[point:point + number]
+
+            physical = [self.axis_map.to_physical(i)
+                        for i in range(len(indices))]
+            assert [i for i, j in zip(physical, indices) if j >= 0] == \
+                [j for j in indices if j >= 0]
+            assert len(set(physical)) == len(physical)
+            assert [self.axis_map.to_logical(i) for i in physical] == \
+                list(range(len(indices)))
+
+
 class TestDictGrid(object):
     """Unit tests for DictGrid"""
 
@@ -207,6 +592,377 @@ class TestDictGrid(object):
 
         assert self.dict_grid[key] == 7
 
+    @staticmethod
+    def _code(key):
+        """Returns cell code for random filling"""
+
+        return str(key)
+
+    def _fill_randomly(self):
+        """Fills dict_grid with random keys and removes some of them"""
+
+        rng = random.Random(7)
+        for _ in range(400):
+            key = rng.randrange(30), rng.randrange(30), rng.randrange(3)
+            self.dict_grid[key] = self._code(key)
+        for key in rng.sample(sorted(self.dict_grid), 100):
+            if rng.random() < .5:
+                del self.dict_grid[key]
+            else:
+                self.dict_grid.pop(key)
+        self.dict_grid.update({(99, 99, 2): "1", (0, 0, 0): "2"})
+
+    def test_index(self):
+        """Key index is consistent after dict operations"""
+
+        self._fill_randomly()
+
+        for table in range(3):
+            keys = [key for key in self.dict_grid if key[2] == table]
+            rows = [key[0] for key in keys]
+            columns = [key[1] for key in keys]
+
+            assert sorted(self.dict_grid.table_keys(table)) == sorted(keys)
+            assert list(self.dict_grid.table_keys(table)) == \
+                sorted(keys, key=lambda key: key[::-1])
+            assert self.dict_grid.bbox(table) == \
+                (min(rows), min(columns), max(rows), max(columns))
+
+        self.dict_grid.clear()
+
+        assert self.dict_grid.bbox(0) is None
+        assert self.dict_grid.tables() == []
+
+    def test_column_rows(self):
+        """Unit test for column_rows"""
+
+        self._fill_randomly()
+
+        for column, table, start, stop in (3, 0, 0, 100), (5, 2, 10, 20):
+            expected = sorted(key[0] for key in self.dict_grid
+                              if key[1:] == (column, table)
+                              and start <= key[0] < stop)
+
+            assert self.dict_grid.column_rows(column, table, start, stop) \
+                == expected
+
+    @pytest.mark.parametrize("axis, point, table",
+                             [(0, 10, None), (1, 5, 1), (2, 1, None),
+                              (0, 0, 2), (1, 31, None)])
+    def test_keys_from(self, axis, point, table):
+        """Unit test for keys_from"""
+
+        self._fill_randomly()
+
+        expected = [key for key in self.dict_grid if key[axis] >= point
+                    and (table is None or key[2] == table)]
+
+        assert sorted(self.dict_grid.keys_from(axis, point, table)) == \
+            sorted(expected)
+
+    def test_keys_beyond(self):
+        """Unit test for keys_beyond"""
+
+        self._fill_randomly()
+
+        shape = 20, 25, 2
+        expected = [key for key in self.dict_grid
+                    if any(ele >= size for ele, size in zip(key, shape))]
+
+        assert sorted(self.dict_grid.keys_beyond(shape)) == sorted(expected)
+
+    @pytest.mark.parametrize("startkey, reverse",
+                             [((4, 7, 0), False), ((4, 7, 0), True),
+                              ((0, 0, 1), False), ((29, 29, 1), True),
+                              ((3, 3, 9), False)])
+    def test_search_keys(self, startkey, reverse):
+        """search_keys yields keys in the order of a sorted key list"""
+
+        self._fill_randomly()
+
+        keys = [key for key in self.dict_grid if key[2] == startkey[2]]
+        expected = self._search_order(keys, startkey, reverse)
+
+        assert list(self.dict_grid.search_keys(startkey, reverse)) == expected
+
+    @staticmethod
+    def _search_order(keys, startkey, reverse):
+        """Returns keys sorted by column and row, starting with startkey"""
+
+        keys = sorted(keys, key=lambda key: key[::-1], reverse=reverse)
+        if reverse:
+            before = [key for key in keys if key[::-1] > startkey[::-1]]
+        else:
+            before = [key for key in keys if key[::-1] < startkey[::-1]]
+
+        return keys[len(before):] + before
+
+    def test_pickle(self):
+        """Pickled DictGrid has a rebuilt key index"""
+
+        self._fill_randomly()
+
+        dict_grid = pickle.loads(pickle.dumps(self.dict_grid))
+
+        assert dict_grid == self.dict_grid
+        assert dict_grid.shape == self.dict_grid.shape
+        assert dict_grid.bbox(1) == self.dict_grid.bbox(1)
+
+    @staticmethod
+    def _edit_brute_force(data, shape, point, number, axis, table):
+        """Returns data after insertion (number > 0) or deletion by rekeying"""
+
+        result = {}
+        for key, value in data.items():
+            if table is not None and axis < 2 and key[2] != table \
+               or key[axis] < point:
+                result[key] = value
+            elif number < 0 and key[axis] < point - number:
+                continue
+            else:
+                new_key = list(key)
+                new_key[axis] += number
+                if new_key[axis] < shape[axis]:
+                    result[tuple(new_key)] = value
+        return result
+
+    @pytest.mark.parametrize("max_segments", [1024, 8])
+    def test_insert_delete(self, max_segments):
+        """Insertion and deletion equal rekeying all cells"""
+
+        self._fill_randomly()
+        self.dict_grid.max_segments = max_segments
+        shape = self.dict_grid.shape
+        expected = dict(self.dict_grid.items())
+
+        rng = random.Random(5)
+        for _ in range(60):
+            axis = rng.choice([0, 0, 1, 1, 2])
+            point = rng.randrange(shape[axis])
+            number = rng.randrange(1, 5)
+            table = rng.choice([None, rng.randrange(3)])
+            if rng.random() < .5:
+                self.dict_grid.insert(point, number, axis, table)
+            else:
+                self.dict_grid.delete(point, number, axis, table)
+                number = -number
+            expected = self._edit_brute_force(expected, shape, point,
+                                              number, axis, table)
+
+            assert self.dict_grid == expected
+            key = rng.choice(sorted(expected))
+            assert self.dict_grid[key] == expected[key]
+            assert key in self.dict_grid
+
+        for table in range(3):
+            keys = [key for key in expected if key[2] == table]
+            assert list(self.dict_grid.table_keys(table)) == \
+                sorted(keys, key=lambda key: key[::-1])
+            if keys:
+                rows = [key[0] for key in keys]
+                columns = [key[1] for key in keys]
+                assert self.dict_grid.bbox(table) == \
+                    (min(rows), min(columns), max(rows), max(columns))
+
+        assert self.dict_grid.tables() == \
+            sorted(set(key[2] for key in expected))
+        assert sorted(self.dict_grid.keys_from(1, 20)) == \
+            sorted(key for key in expected if key[1] >= 20)
+
+        startkey = 5, 5, 0
+        keys = [key for key in expected if key[2] == 0]
+        assert list(self.dict_grid.search_keys(startkey, True)) == \
+            self._search_order(keys, startkey, True)
+
+        dict_grid = pickle.loads(pickle.dumps(self.dict_grid))
+        assert dict_grid == expected
+        assert not dict_grid._mapped
+
+    def test_insert_beyond_shape(self):
+        """Cells that are moved beyond the grid shape are deleted"""
+
+        self.dict_grid[(98, 0, 0)] = "1"
+        self.dict_grid[(97, 0, 0)] = "2"
+        self.dict_grid.insert(10, 2, 0)
+
+        assert self.dict_grid == {(99, 0, 0): "2"}
+
+    def test_insert_above_point(self):
+        """Cells above the insertion point are kept"""
+
+        self.dict_grid = DictGrid((10, 10, 1))
+        self.dict_grid[(7, 0, 0)] = "1"
+        self.dict_grid.insert(9, 3, 0)
+
+        assert self.dict_grid == {(7, 0, 0): "1"}
+
+    def test_fill_inserted(self):
+        """Key queries return filled inserted lines with logical keys"""
+
+        self.dict_grid = DictGrid((10, 6, 2))
+        self.dict_grid[(5, 2, 1)] = "1"
+        self.dict_grid.insert(1, 1, 1, 1)
+        self.dict_grid.insert(2, 2, 0)
+        self.dict_grid[(0, 1, 1)] = "2"
+        self.dict_grid[(3, 0, 1)] = "3"
+        expected = {(7, 3, 1): "1", (0, 1, 1): "2", (3, 0, 1): "3"}
+
+        assert self.dict_grid == expected
+        assert self.dict_grid.bbox(1) == (0, 0, 7, 3)
+        assert sorted(self.dict_grid.keys_from(1, 1)) == \
+            [(0, 1, 1), (7, 3, 1)]
+        assert sorted(self.dict_grid.keys_from(0, 2, 1)) == \
+            [(3, 0, 1), (7, 3, 1)]
+        assert self.dict_grid.keys_beyond((8, 6, 2)) == []
+        assert sorted(self.dict_grid.keys_beyond((7, 2, 2))) == [(7, 3, 1)]
+        assert list(self.dict_grid.table_keys(1)) == \
+            [(3, 0, 1), (0, 1, 1), (7, 3, 1)]
+
+        self.dict_grid.delete(1, 1, 2)
+
+        assert self.dict_grid == {}
+
+    def test_snapshot(self):
+        """Snapshots are not affected by later changes"""
+
+        self._fill_randomly()
+        self.dict_grid.insert(3, 2, 0, 1)
+        self.dict_grid.delete(1, 1, 2)
+        self.dict_grid.row_heights[(2, 0)] = 40.0
+        self.dict_grid.macros = "a = 1\n"
+        expected = list(self.dict_grid.items())
+
+        snapshot = self.dict_grid.snapshot()
+
+        self.dict_grid.pop(expected[-1][0])
+        self.dict_grid.insert(0, 4, 1)
+        self.dict_grid[(0, 0, 0)] = self._code((0, 0, 0))
+        self.dict_grid.row_heights[(3, 0)] = 20.0
+        self.dict_grid.cell_attributes.append(
+            CellAttribute(Selection([], [], [], [], [(1, 1)]), 0,
+                          AttrDict([("bgcolor", (0, 0, 0))])))
+        self.dict_grid.macros = ""
+
+        assert list(snapshot.items()) == expected
+        assert list(snapshot) == [key for key, _ in expected]
+        assert len(snapshot) == len(expected)
+        assert snapshot.row_heights == {(2, 0): 40.0}
+        assert not snapshot.cell_attributes
+        assert snapshot.macros == "a = 1\n"
+
+    def test_journal(self):
+        """Changes are recorded with logical keys"""
+
+        self.dict_grid.insert(0, 2, 0, 0)
+        self.dict_grid.journal = []
+
+        self.dict_grid[(1, 1, 0)] = "1"
+        self.dict_grid[(2, 1, 0)] = "2"
+        del self.dict_grid[(1, 1, 0)]
+        self.dict_grid.pop((2, 1, 0))
+        self.dict_grid.insert(1, 1, 1, None)
+        self.dict_grid.delete(0, 1, 0, 0)
+        self.dict_grid.clear()
+
+        assert self.dict_grid.journal == [
+            ("set", (1, 1, 0), "1"), ("set", (2, 1, 0), "2"),
+            ("del", (1, 1, 0)), ("del", (2, 1, 0)),
+            ("insert", 1, 1, 1, None), ("delete", 0, 1, 0, 0), ("clear",)]
+
+
+class TestColumnarDictGrid(TestDictGrid):
+    """Unit tests for DictGrid with columnar storage of literal numbers"""
+
+    def setup_method(self, method):
+        """Creates empty columnar DictGrid"""
+
+        self.dict_grid = DictGrid((100, 100, 100), columnar=True)
+
+    @staticmethod
+    def _code(key):
+        """Returns number literals for most keys"""
+
+        row, column, table = key
+        if column % 3 == 0:
+            return str(row - 10 * table)
+        if column % 3 == 1:
+            return repr(row / 8)
+        return str(key)
+
+    param_parse = [
+        ("42", 42), ("-7", -7), ("0", 0), ("1.5", 1.5), ("-0.25", -0.25),
+        ("1e+100", 1e100), ("007", None), ("-0", None), ("+1", None),
+        ("1.50", None), ("1_000", None), ("inf", None), ("nan", None),
+        ("9223372036854775808", None), ("2 + 3", None), (" 1", None),
+        ("'1'", None), (1, None), (None, None),
+    ]
+
+    @pytest.mark.parametrize("code, res", param_parse)
+    def test_parse(self, code, res):
+        """Only canonical int64 and finite float literals are stored"""
+
+        value = ColumnStore.parse(code)
+
+        assert value == res
+        assert type(value) is type(res)
+
+    def test_storage(self):
+        """Number literals are stored in arrays, other code in the dict"""
+
+        self.dict_grid[(1, 2, 0)] = "42"
+        self.dict_grid[(2, 2, 0)] = "1.5"
+        self.dict_grid[(3, 2, 0)] = "x + 1"
+        self.dict_grid[(4, 2, 0)] = "5"
+
+        assert len(self.dict_grid) == 4
+        assert len(self.dict_grid._columns) == 2
+        assert dict.__len__(self.dict_grid) == 2
+        assert self.dict_grid[(1, 2, 0)] == "42"
+        assert self.dict_grid[(2, 2, 0)] == "1.5"
+        assert self.dict_grid.get((4, 2, 0)) == "5"
+        assert self.dict_grid[(5, 2, 0)] is None
+        assert (4, 2, 0) in self.dict_grid
+
+        self.dict_grid[(1, 2, 0)] = "'42'"
+        self.dict_grid[(3, 2, 0)] = "3"
+
+        assert len(self.dict_grid._columns) == 2
+        assert self.dict_grid[(1, 2, 0)] == "'42'"
+        assert self.dict_grid[(3, 2, 0)] == "3"
+        assert sorted(self.dict_grid) == \
+            [(1, 2, 0), (2, 2, 0), (3, 2, 0), (4, 2, 0)]
+
+        assert self.dict_grid.pop((3, 2, 0)) == "3"
+        del self.dict_grid[(4, 2, 0)]
+
+        assert self.dict_grid._columns.tables == {}
+        assert self.dict_grid == {(1, 2, 0): "'42'", (2, 2, 0): "1.5"}
+
+        with pytest.raises(KeyError):
+            del self.dict_grid[(4, 2, 0)]
+
+    def test_numeric_column(self):
+        """numeric_column yields views of the column arrays"""
+
+        block_size = NumericColumn.block_size
+        for row in range(0, 2 * block_size, 100):
+            self.dict_grid[(row, 3, 1)] = str(row)
+        self.dict_grid.shape = 3 * block_size, 100, 100
+        self.dict_grid.insert(1, 2, 0, 1)
+
+        values = numpy.zeros(3 * block_size, numpy.int64)
+        mask = numpy.zeros(3 * block_size, bool)
+        for row, chunk_values, chunk_mask in \
+                self.dict_grid.numeric_column(3, 1, 0):
+            values[row:row + len(chunk_values)] = chunk_values
+            mask[row:row + len(chunk_mask)] = chunk_mask
+
+        rows = [row for row, _, _ in self.dict_grid.table_keys(1)]
+        assert numpy.flatnonzero(mask).tolist() == rows
+        assert values[mask].tolist() == [0] + list(range(100, 2 * block_size,
+                                                         100))
+        assert list(self.dict_grid.numeric_column(2, 1)) == []
+
 
 class TestDataArray(object):
     """Unit tests for DataArray"""
@@ -257,6 +1013,22 @@ class TestDataArray(object):
         self.data_array.shape = (10000, 100, 100)
         assert self.data_array.shape == (10000, 100, 100)
 
+    def test_shrink_shape_inserted(self):
+        """Shrinking keeps filled inserted cells that are within the shape"""
+
+        self.data_array = DataArray((10, 6, 1), Settings())
+        self.data_array[(5, 2, 0)] = "1"
+        self.data_array.insert(1, 1, 1)
+        self.data_array[(0, 1, 0)] = "2"
+        self.data_array.shape = (8, 6, 1)
+
+        assert dict(self.data_array.dict_grid.items()) == \
+            {(5, 3, 0): "1", (0, 1, 0): "2"}
+
+        self.data_array.shape = (8, 2, 1)
+
+        assert dict(self.data_array.dict_grid.items()) == {(0, 1, 0): "2"}
+
     param_get_last_filled_cell = [
         ({(0, 0, 0): "2"}, 0, (0, 0)),
         ({(2, 0, 2): "2"}, 0, (0, 0)),
@@ -279,6 +1051,20 @@ class TestDataArray(object):
 
         assert "dict_grid" in self.data_array.__getstate__()
 
+    def test_snapshot(self):
+        """Unit test for snapshot"""
+
+        self.data_array[1, 2, 3] = "Test"
+        self.data_array.set_col_width(2, 3, 60.0)
+
+        snapshot = self.data_array.snapshot()
+        self.data_array.shape = (5, 5, 5)
+
+        assert snapshot.shape == (100, 100, 100)
+        assert list(snapshot) == [(1, 2, 3)]
+        assert snapshot.col_widths == {(2, 3): 60.0}
+        assert snapshot.settings is self.data_array.settings
+
     def test_slicing(self):
         """Unit test for __getitem__ and __setitem__"""
 
@@ -438,6 +1224,247 @@ class TestDataArray(object):
         assert self.data_array.col_widths[7, 1] == 22.345
 
 
+class TestResultCache(object):
+    """Unit tests for ResultCache"""
+
+    def setup_method(self, method):
+        """Creates empty ResultCache with a budget of 1 MB"""
+
+        settings = Settings()
+        settings.result_cache_size = 1
+        self.result_cache = ResultCache(settings)
+
+    param_test_estimate_size = [
+        (numpy.zeros(1000, dtype=numpy.int64), 8000),
+        (b"x" * 1234, 1234),
+        (bytearray(10), 10),
+    ]
+
+    @pytest.mark.parametrize("value, size", param_test_estimate_size)
+    def test_estimate_size(self, value, size):
+        """Unit test for estimate_size"""
+
+        assert ResultCache.estimate_size(value) == size
+
+    def test_getitem(self):
+        """Unit test for __getitem__ hit and miss counting"""
+
+        self.result_cache[(0, 0, 0)] = 1
+
+        assert self.result_cache[(0, 0, 0)] == 1
+        with pytest.raises(KeyError):
+            self.result_cache[(1, 0, 0)]
+
+        assert self.result_cache.hits == 1
+        assert self.result_cache.misses == 1
+
+    def test_eviction(self):
+        """Unit test for least recently used eviction"""
+
+        chunk = bytes(400 * 1024)
+
+        self.result_cache[(0, 0, 0)] = chunk
+        self.result_cache[(1, 0, 0)] = chunk
+        self.result_cache[(0, 0, 0)]  # (1, 0, 0) is least recently used now
+        self.result_cache[(2, 0, 0)] = chunk
+
+        assert list(self.result_cache) == [(0, 0, 0), (2, 0, 0)]
+        assert self.result_cache.evictions == 1
+        assert self.result_cache.size == 2 * len(chunk)
+
+    def test_size_accounting(self):
+        """Unit test for size tracking on pop, del and clear"""
+
+        self.result_cache[(0, 0, 0)] = b"x" * 100
+        self.result_cache[(1, 0, 0)] = b"x" * 50
+        self.result_cache[(0, 0, 0)] = b"x" * 10
+
+        assert self.result_cache.size == 60
+
+        self.result_cache.pop((0, 0, 0))
+        assert self.result_cache.size == 50
+
+        del self.result_cache[(1, 0, 0)]
+        assert self.result_cache.size == 0
+
+        self.result_cache[(0, 0, 0)] = b"x" * 100
+        self.result_cache.clear()
+        assert self.result_cache.size == 0
+        assert not self.result_cache.sizes
+
+    def test_numbers(self):
+        """Int and float results of cells are stored unboxed"""
+
+        self.result_cache[(0, 0, 0)] = 1
+        self.result_cache[(1, 0, 0)] = 2.5
+        self.result_cache[(2, 0, 0)] = True
+        self.result_cache[(3, 0, 0)] = 2**70
+        self.result_cache[(range(2), 0, 0)] = 3
+
+        assert self.result_cache.number_count == 2
+        assert super(ResultCache, self.result_cache).__len__() == 3
+        assert len(self.result_cache) == 5
+        assert (1, 0, 0) in self.result_cache
+        assert type(self.result_cache[(0, 0, 0)]) is int
+        assert self.result_cache[(1, 0, 0)] == 2.5
+        assert self.result_cache[(2, 0, 0)] is True
+        assert self.result_cache[(3, 0, 0)] == 2**70
+
+        self.result_cache[(0, 0, 0)] = "a"
+        self.result_cache[(2, 0, 0)] = 7
+
+        assert self.result_cache[(0, 0, 0)] == "a"
+        assert self.result_cache[(2, 0, 0)] == 7
+        assert self.result_cache.pop((1, 0, 0)) == 2.5
+        del self.result_cache[(2, 0, 0)]
+
+        assert self.result_cache.numbers == {}
+        assert self.result_cache.size == \
+            sum(self.result_cache.sizes.values())
+
+    def test_numeric_range(self):
+        """numeric_range returns typed values and validity mask"""
+
+        for row in range(0, 10, 2):
+            self.result_cache[(row, 1, 0)] = row
+
+        values, mask, types = self.result_cache.numeric_range(1, 0, 2, 7)
+
+        assert values.dtype == numpy.int64
+        assert values.tolist() == [2, 0, 4, 0, 6]
+        assert mask.tolist() == [True, False, True, False, True]
+        assert types == {int}
+
+        self.result_cache[(3, 1, 0)] = 0.5
+        values, mask, types = self.result_cache.numeric_range(1, 0, 2, 7)
+
+        assert values.dtype == numpy.float64
+        assert values.tolist() == [2, .5, 4, 0, 6]
+        assert mask.tolist() == [True, True, True, False, True]
+        assert types == {int, float}
+
+    def test_numbers_budget(self):
+        """Unboxed results are dropped if they exceed the budget alone"""
+
+        block_size = NumericColumn.block_size
+        for column in range(1024 * 1024 // (9 * block_size) + 1):
+            self.result_cache[(0, column, 0)] = 1
+
+        assert self.result_cache.size <= self.result_cache.max_size
+        assert self.result_cache.evictions
+
+
+class TestEvaluationProfiler(object):
+    """Unit tests for EvaluationProfiler"""
+
+    def setup_method(self, method):
+        """Creates empty CodeArray with enabled profiler"""
+
+        self.code_array = CodeArray((100, 10, 3), Settings())
+        self.profiler = self.code_array.profiler
+        self.profiler.enabled = True
+
+    def test_disabled(self):
+        """Unit test for profiler being off by default"""
+
+        code_array = CodeArray((100, 10, 3), Settings())
+        code_array[0, 0, 0] = "1 + 1"
+        assert code_array[0, 0, 0] == 2
+        assert not code_array.profiler.profiles
+
+    def test_stop(self):
+        """Unit test for recording of calls, self time and errors"""
+
+        self.code_array[0, 0, 0] = "sum(range(1000))"
+        self.code_array[1, 0, 0] = "S[0, 0, 0] + 1"
+        self.code_array[2, 0, 1] = "1 / 0"
+
+        assert self.code_array[1, 0, 0] == 499501
+        self.code_array[2, 0, 1]
+
+        profile_0 = self.profiler.profiles[(0, 0, 0)]
+        profile_1 = self.profiler.profiles[(1, 0, 0)]
+        profile_2 = self.profiler.profiles[(2, 0, 1)]
+
+        assert profile_0.calls == profile_1.calls == 1
+        assert profile_1.time >= profile_0.time
+        assert profile_1.self_time <= profile_1.time - profile_0.time + 1e-9
+        assert profile_0.errors == 0 and profile_0.error is None
+        assert profile_2.errors == 1
+        assert "division" in profile_2.error
+
+        totals = self.profiler.table_totals()
+        assert list(totals) == [0, 1]
+        assert totals[0].calls == 2
+
+    def test_most_evaluated(self):
+        """Unit test for most_evaluated"""
+
+        self.code_array[0, 0, 0] = "1"
+        self.code_array[1, 0, 0] = "S[0, 0, 0] + 1"
+        self.code_array[1, 0, 0]
+
+        for i in range(3):
+            self.code_array[0, 0, 0] = str(i + 2)
+            self.code_array[1, 0, 0]
+
+        keys = [key for key, _ in self.profiler.most_evaluated(1)]
+        assert keys == [(0, 0, 0)] or keys == [(1, 0, 0)]
+        assert self.profiler.profiles[(1, 0, 0)].calls == 4
+
+    def test_run_cprofile(self):
+        """Unit test for cProfile of single cell"""
+
+        self.code_array[0, 0, 0] = "sorted(range(100))[-1]"
+        self.profiler.cprofile_key = (0, 0, 0)
+
+        assert self.code_array[0, 0, 0] == 99
+        assert "sorted" in self.profiler.cprofile_stats
+
+    def test_run_cprofile_after_timeout(self):
+        """Unit test for cProfile of a cell after a timeout"""
+
+        self.code_array.settings = Settings()
+        self.code_array.settings.timeout = 100
+        self.code_array[0, 0, 0] = "[0 for _ in iter(int, 1)]"
+        self.code_array[1, 0, 0] = "sorted(range(100))[-1]"
+
+        assert isinstance(self.code_array[0, 0, 0], RuntimeError)
+
+        self.profiler.cprofile_key = (1, 0, 0)
+
+        assert self.code_array[1, 0, 0] == 99
+        assert "sorted" in self.profiler.cprofile_stats
+
+    def test_write_report(self):
+        """Unit test for csv and json reports"""
+
+        self.code_array[0, 0, 0] = "1"
+        self.code_array[0, 0, 0]
+
+        csv_file = io.StringIO()
+        self.profiler.write_csv(csv_file)
+        lines = csv_file.getvalue().splitlines()
+        assert lines[0].startswith("section,row,column,table,calls")
+        assert lines[1].startswith("slowest,0,0,0,1,")
+        assert lines[3].startswith("table,,,0,1,")
+
+        json_file = io.StringIO()
+        self.profiler.write_json(json_file)
+        report = json.loads(json_file.getvalue())
+        assert report["most_evaluated"][0]["calls"] == 1
+        assert report["tables"][0]["table"] == 0
+
+    def test_reset(self):
+        """Unit test for reset"""
+
+        self.code_array[0, 0, 0] = "1"
+        self.code_array[0, 0, 0]
+        self.profiler.reset()
+
+        assert not self.profiler.profiles
+
+
 class TestCodeArray(object):
     """Unit tests for CodeArray"""
 
@@ -516,6 +1543,130 @@ class TestCodeArray(object):
 
         assert filled_grid[1, 0, 0] == sum(numpy.arange(0, 10, 0.1))
 
+    def test_dependency_invalidation(self):
+        """Unit test for selective result cache invalidation"""
+
+        code_array = self.code_array
+
+        code_array[0, 0, 0] = "1"
+        code_array[1, 0, 0] = "S[0, 0, 0] + 1"
+        code_array[2, 0, 0] = "S[1, 0, 0] + 1"
+        code_array[3, 0, 0] = "sum(S[:2, 0, 0])"
+        code_array[0, 1, 0] = "42"
+
+        assert code_array[2, 0, 0] == 3
+        assert code_array[3, 0, 0] == 3
+        assert code_array[0, 1, 0] == 42
+
+        code_array[0, 0, 0] = "5"
+
+        # Independent cells keep their results
+        assert (0, 1, 0) in code_array.result_cache
+        assert (1, 0, 0) not in code_array.result_cache
+        assert (2, 0, 0) not in code_array.result_cache
+        assert (3, 0, 0) not in code_array.result_cache
+
+        assert code_array[2, 0, 0] == 7
+        assert code_array[3, 0, 0] == 11
+
+    def test_dependency_invalidation_slice(self):
+        """Slice reads outside of cells are invalidated by edits in range"""
+
+        code_array = self.code_array
+
+        for row in range(3):
+            code_array[row, 0, 0] = str(row + 1)
+
+        assert list(code_array[0:3, 0, 0]) == [1, 2, 3]
+
+        code_array[1, 0, 0] = "20"
+
+        assert list(code_array[0:3, 0, 0]) == [1, 20, 3]
+
+        code_array[3, 0, 0] = "4"
+        code_array[2, 0, 0] = "30"
+
+        assert list(code_array[0:3, 0, 0]) == [1, 20, 30]
+        assert not code_array.dep_graph.dependents
+
+    def test_dependency_invalidation_globals(self):
+        """Cells that assign globals flush the whole result cache"""
+
+        code_array = self.code_array
+
+        code_array[0, 0, 0] = "dep_test_var = 2"
+        code_array[0, 0, 0]
+        code_array[1, 0, 0] = "dep_test_var * 3"
+
+        assert code_array[1, 0, 0] == 6
+
+        code_array[0, 0, 0] = "dep_test_var = 4"
+
+        assert not code_array.result_cache
+
+        code_array[0, 0, 0]
+        assert code_array[1, 0, 0] == 12
+
+    param_test_evaluate_range = [
+        (["1", "2", "3"], numpy.int64, False, 6),
+        (["1", "2.5", "3"], numpy.float64, False, 6.5),
+        (["True", "False", "True"], numpy.bool_, False, 2),
+        (["1", None, "3"], numpy.int64, True, 4),
+        (["1", "'a'", "3"], object, False, None),
+        (["2**99", "1", "3"], object, False, 2**99 + 4),
+        (["2**63", "1.5", "3"], object, False, 2**63 + 4.5),
+        (["-2**63", "2**63 - 1", None], numpy.int64, True, -1),
+    ]
+
+    @pytest.mark.parametrize("codes, dtype, masked, res",
+                             param_test_evaluate_range)
+    def test_evaluate_range(self, codes, dtype, masked, res):
+        """Unit test for evaluate_range"""
+
+        for row, code in enumerate(codes):
+            self.code_array[row, 0, 0] = code
+
+        array = self.code_array[0:3, 0, 0]
+
+        assert array.dtype == dtype
+        assert array.shape == (3,)
+        assert isinstance(array, numpy.ma.MaskedArray) == masked
+        if res is not None:
+            assert numpy.sum(array) == res
+
+        self.code_array[0, 1, 0] = "4"
+        assert self.code_array[0:2, 0:2, 0].shape == (2, 2)
+
+    @pytest.mark.parametrize("codes", [
+        ["1", "2", None, "4"], ["1", "2.5", None, "-3"], ["1", "2", "3", "4"],
+        ["1", "'a'", None, "3"], ["1", "True", "2", "3"], [None] * 4,
+        ["1", "2**99", "3", None], ["1", "None", "2", "3"],
+    ])
+    def test_evaluate_numeric_range(self, codes):
+        """Numeric range reads equal reads of single cells"""
+
+        for column in range(2):
+            for row, code in enumerate(codes):
+                self.code_array[row + 2 * column, column, 1] = code
+
+        for key in [(slice(0, 6), 0, 1), (slice(0, 6), slice(0, 2), 1)]:
+            array = self.code_array[key]
+            self.code_array.result_cache.clear()
+            range_key = self.code_array._range_key(key)
+            values = [self.code_array[single_key]
+                      for single_key in product(*[
+                          ele if isinstance(ele, range) else (ele,)
+                          for ele in range_key])]
+            shape = array.shape
+            expected = self.code_array._make_typed_array(values, shape)
+            if expected is None:
+                expected = numpy.array(self.code_array._nest(values, shape),
+                                       dtype="O")
+
+            assert array.dtype == expected.dtype
+            assert type(array) is type(expected)
+            assert array.tolist() == expected.tolist()
+
     def test_make_nested_list(self):
         """Unit test for _make_nested_list"""
 
@@ -541,6 +1692,275 @@ class TestCodeArray(object):
         self.code_array[key] = code
         assert self.code_array._eval_cell(key, code) == res
 
+    param_test_literal_value = [
+        ("3.14", 3.14), ("-7", -7), ("'abc'", "abc"), ('"abc"', "abc"),
+        ("None", None), ("True", True), ("b'x'", b"x"), ("1j", 1j),
+        ("(1, 'a', (None,))", (1, "a", (None,))), ("1 # comment", 1),
+        ("2**99", CodeArray.no_literal), ("[1, 2]", CodeArray.no_literal),
+        ("{1: 2}", CodeArray.no_literal), ("{1}", CodeArray.no_literal),
+        ("(1, [2])", CodeArray.no_literal), (" 1", CodeArray.no_literal),
+        ("x", CodeArray.no_literal), ("1\n2", CodeArray.no_literal),
+        ("f'{1}'", CodeArray.no_literal), ("1 +", CodeArray.no_literal),
+    ]
+
+    @pytest.mark.parametrize("code, res", param_test_literal_value)
+    def test_literal_value(self, code, res):
+        """Unit test for literal_value"""
+
+        value = self.code_array.literal_value(code)
+
+        if res is CodeArray.no_literal:
+            assert value is res
+        else:
+            assert value == res
+            assert type(value) is type(res)
+            assert self.code_array.exec_then_eval(code) == value
+
+    def test_literal_fallback(self):
+        """Cells switch between literal and normal evaluation"""
+
+        self.code_array[0, 0, 0] = "2"
+        self.code_array[1, 0, 0] = "S[0, 0, 0] * 2"
+        assert self.code_array[1, 0, 0] == 4
+
+        self.code_array[0, 0, 0] = "1 + 2"
+        assert self.code_array[1, 0, 0] == 6
+
+        self.code_array[0, 0, 0] = "'ab'"
+        assert self.code_array[1, 0, 0] == "abab"
+
+        self.code_array[0, 0, 0] = " 1"
+        assert isinstance(self.code_array[0, 0, 0], Exception)
+
+        self.code_array[2, 0, 0] = "[1]"
+        assert self.code_array[2, 0, 0] is not \
+            self.code_array._eval_cell((2, 0, 0), "[1]")
+
+    @pytest.mark.parametrize("code, res",
+                             [(None, False), ("1 + S[0, 0, 0]", False),
+                              ("a = 1", True), ("1\n2", True),
+                              ("1 +", False)])
+    def test_writes_globals(self, code, res):
+        """Unit test for _writes_globals and its cache"""
+
+        self.code_array._writes_globals.cache_clear()
+
+        assert self.code_array._writes_globals(code) == res
+        assert self.code_array._writes_globals(code) == res
+        assert self.code_array._writes_globals.cache_info().hits == 1
+
+    def test_compile_code(self):
+        """Unit test for compile_code cache"""
+
+        code = "a_compile_test = S[X-1, Y, Z] * 2\nb = 1"
+        self.code_array.compile_code.cache_clear()
+
+        compiled_code = self.code_array.compile_code(code)
+        assert self.code_array.compile_code(code) is compiled_code
+        assert self.code_array.compile_code.cache_info().hits == 1
+        assert compiled_code.targets[0].id == "b"
+
+        assert self.code_array.exec_then_eval("x = 2\nx * 3") == 6
+        assert self.code_array.exec_then_eval("x = 2\nx * 3") == 6
+
+    def test_get_updated_environment(self):
+        """Unit test for _get_updated_environment"""
+
+        env = self.code_array._get_updated_environment({"X": 2})
+
+        assert dict(env) == {"X": 2}
+        assert env["numpy"] is numpy
+
+        env = self.code_array._get_updated_environment()
+
+        assert env["S"] is self.code_array
+
+    def test_eval_cell_globals(self):
+        """Cell assignments reach other cells, per-cell variables do not"""
+
+        self.code_array[0, 0, 0] = "env_test_var = 3"
+        self.code_array[0, 0, 0]
+        self.code_array[1, 0, 0] = "def f(x): return x * env_test_var\nf(Y)"
+        self.code_array[1, 1, 0] = "[X + i for i in range(2)]"
+
+        assert self.code_array[1, 0, 0] == 0
+        assert self.code_array[1, 1, 0] == [1, 2]
+        assert "env_test_var" in self.code_array.get_globals()
+        assert "X" not in self.code_array.get_globals()
+
+    param_test_spill = [
+        ("list(range(5))", (5, 1), (3, 0, 0), 3),
+        ("list(range(5))", (5, 1), (6, 0, 0), None),
+        ("[1, 2, 3, 4]", (1, 4), (0, 2, 0), 3),
+        ("numpy.arange(6).reshape(2, 3)", (2, 3), (1, 2, 0), 5),
+        ("[[1, 2], [3, 4]]", (2, 2), (1, 0, 0), 3),
+        ("42", (3, 1), (1, 0, 0), None),
+    ]
+
+    @pytest.mark.parametrize("code, spill_shape, key, res", param_test_spill)
+    def test_spill(self, code, spill_shape, key, res):
+        """Unit test for spill formula results in empty cells"""
+
+        self.code_array[0, 0, 0] = code
+        selection = Selection([], [], [], [], [(0, 0)])
+        attr = CellAttribute(selection, 0, AttrDict(spill_shape=spill_shape))
+        self.code_array.cell_attributes.append(attr)
+
+        assert self.code_array[key] == res
+        in_area = key[0] < spill_shape[0] and key[1] < spill_shape[1]
+        assert self.code_array.cell_attributes.get_spilling_cell(key) \
+            == ((0, 0, 0) if in_area else None)
+
+    def test_spill_dependencies(self):
+        """Unit test for invalidation and insertion with spill areas"""
+
+        self.code_array[0, 0, 0] = "list(range(5))"
+        selection = Selection([], [], [], [], [(0, 0)])
+        attr = CellAttribute(selection, 0, AttrDict(spill_shape=(5, 1)))
+        self.code_array.cell_attributes.append(attr)
+        self.code_array[0, 1, 0] = "S[3, 0, 0] * 2"
+        self.code_array[0, 2, 0] = "sum(S[1:5, 0, 0])"
+
+        assert self.code_array[0, 1, 0] == 6
+        assert self.code_array[0, 2, 0] == 10
+        assert self.code_array.spill_element((0, 0, 0), (0, 0, 0)) == 0
+
+        self.code_array[0, 0, 0] = "list(range(10, 15))"
+
+        assert self.code_array[0, 1, 0] == 26
+        assert self.code_array[0, 2, 0] == 50
+
+        self.code_array.insert(2, 1, axis=0)
+
+        assert self.code_array.cell_attributes[0, 0, 0].spill_shape == (6, 1)
+
+        self.code_array.insert(0, 1, axis=0)
+
+        assert self.code_array.cell_attributes[1, 0, 0].spill_shape == (6, 1)
+        assert self.code_array[4, 0, 0] == 13
+
+    def test_eval_cell_timeout(self):
+        """Unit test for cell evaluation timeout"""
+
+        settings = Settings()
+        settings.timeout = 100
+        code_array = CodeArray((100, 10, 3), settings)
+
+        code_array[0, 0, 0] = "[0 for _ in iter(int, 1)]"
+        code_array[1, 0, 0] = "S[0, 0, 0]"
+        code_array[2, 0, 0] = "1 + 1"
+
+        result = code_array[1, 0, 0]
+        assert isinstance(result, RuntimeError)
+        assert "Timeout after 100 ms" in str(result)
+        assert (0, 0, 0) not in code_array.result_cache
+
+        assert code_array[2, 0, 0] == 2
+        assert not code_array.watchdog.deadlines
+
+    def test_eval_cell_timeout_bookkeeping(self):
+        """Caches are consistent after a timeout in nested evaluations"""
+
+        settings = Settings()
+        settings.timeout = 100
+        code_array = CodeArray((100, 10, 3), settings)
+
+        for row in range(50):
+            code_array[row, 1, 0] = str(row)
+        code_array[0, 0, 0] = \
+            "[S[i % 50, 1, 0] for i in __import__('itertools').count()]"
+        code_array[0, 2, 0] = "S[3, 1, 0] + 1"
+
+        assert code_array[0, 2, 0] == 4
+        assert isinstance(code_array[0, 0, 0], RuntimeError)
+
+        result_cache = code_array.result_cache
+        assert result_cache.size == sum(result_cache.sizes.values())
+
+        assert code_array[0, 2, 0] == 4
+        code_array[3, 1, 0] = "30"
+        assert code_array[0, 2, 0] == 31
+
+    def test_evaluate_parallel(self):
+        """Unit test for evaluate_parallel"""
+
+        code_array = self.code_array
+
+        code_array.macros = "def square(x): return x ** 2"
+        code_array.execute_macros()
+
+        code_array[0, 0, 0] = "square(X + 2)"
+        code_array[1, 0, 0] = "X * 2"
+        code_array[2, 0, 0] = "S[1, 0, 0] + 1"
+        code_array[3, 0, 0] = "lambda: 1"
+
+        assert code_array.evaluate_parallel() == 2
+
+        assert code_array.result_cache[(0, 0, 0)] == 4
+        assert code_array.result_cache[(1, 0, 0)] == 2
+        assert (2, 0, 0) not in code_array.result_cache
+        assert (3, 0, 0) not in code_array.result_cache
+
+        assert code_array[2, 0, 0] == 3
+        assert code_array[3, 0, 0]() == 1
+
+        code_array.shutdown_pool()
+
+    def test_submit_parallel(self):
+        """Unit test for reusing the pool and storing results later"""
+
+        code_array = self.code_array
+
+        code_array.macros = "a = 3"
+        code_array[0, 0, 0] = "a * 2"
+        code_array[1, 0, 0] = "a * 3"
+        code_array[2, 0, 0] = "7"
+
+        futures = code_array.submit_parallel(code_array.keys())
+        pool = code_array._pool
+
+        assert sorted(futures) == [(0, 0, 0), (1, 0, 0)]
+        assert code_array.result_cache[(2, 0, 0)] == 7
+
+        # Changed cells are not stored
+        code_array[1, 0, 0] = "a * 4"
+        assert code_array.store_parallel_result((0, 0, 0),
+                                                futures[(0, 0, 0)])
+        assert not code_array.store_parallel_result((1, 0, 0),
+                                                    futures[(1, 0, 0)])
+        assert code_array.result_cache[(0, 0, 0)] == 6
+        assert (1, 0, 0) not in code_array.result_cache
+
+        assert code_array.evaluate_parallel() == 1
+        assert code_array._pool is pool
+
+        # New macros need a new pool
+        code_array.macros = "a = 4"
+        code_array.result_cache.clear()
+        assert code_array.evaluate_parallel() == 3
+        assert code_array._pool is not pool
+        assert code_array.result_cache[(1, 0, 0)] == 16
+
+        code_array.shutdown_pool()
+        assert code_array._pool is None
+
+    def test_evaluate_parallel_unpickling_error(self):
+        """Unit test for results that cannot be unpickled in-process"""
+
+        code_array = self.code_array
+
+        # Macros are executed in the workers but not in this process
+        code_array.macros = "class Point:\n    pass"
+        code_array[0, 0, 0] = "Point()"
+        code_array[1, 0, 0] = "X + 1"
+
+        assert code_array.evaluate_parallel() == 1
+
+        assert (0, 0, 0) not in code_array.result_cache
+        assert code_array.result_cache[(1, 0, 0)] == 2
+
+        code_array.shutdown_pool()
+
     def test_execute_macros(self):
         """Unit test for execute_macros"""
 
@@ -549,25 +1969,20 @@ class TestCodeArray(object):
         assert self.code_array._eval_cell((0, 0, 0), "a") == 5
         assert self.code_array._eval_cell((0, 0, 0), "f(2)") == 4
 
-    def test_sorted_keys(self):
-        """Unit test for _sorted_keys"""
+    def test_clear_globals(self):
+        """Clearing globals keeps the names that the model module uses"""
 
-        code_array = self.code_array
-
-        keys = [(1, 0, 0), (2, 0, 0), (0, 1, 0), (0, 99, 0), (0, 0, 0),
-                (0, 0, 99), (1, 2, 3)]
-        sorted_keys = [(0, 1, 0), (0, 99, 0), (1, 2, 3), (0, 0, 99), (0, 0, 0),
-                       (1, 0, 0), (2, 0, 0)]
-        rev_sorted_keys = [(0, 1, 0), (2, 0, 0), (1, 0, 0), (0, 0, 0),
-                           (0, 0, 99), (1, 2, 3), (0, 99, 0)]
-
-        sort_gen = code_array._sorted_keys(keys, (0, 1, 0))
-        for result, expected_result in zip(sort_gen, sorted_keys):
-            assert result == expected_result
-
-        rev_sort_gen = code_array._sorted_keys(keys, (0, 3, 0), reverse=True)
-        for result, expected_result in zip(rev_sort_gen, rev_sorted_keys):
-            assert result == expected_result
+        self.code_array.macros = "a = 5"
+        self.code_array.execute_macros()
+        self.code_array.clear_globals()
+
+        assert "a" not in self.code_array.get_globals()
+        selection = Selection([], [], [], [], [(0, 0), (0, 1)])
+        self.code_array.cell_attributes.append(
+            CellAttribute(selection, 0, AttrDict([("bold", True)])))
+        compacted = list(self.code_array.cell_attributes.compacted())
+        assert compacted[0].selection == Selection([(0, 0)], [(0, 1)],
+                                                   [], [], [])
 
     def test_string_match(self):
         """Tests creation of string_match"""
@@ -23,18 +23,22 @@
 **Provides**
 
  * :class:`MacroPanel`
+ * :class:`ProfilerPanel`
 
 """
 
 import ast
 from io import StringIO
+from pathlib import Path
 from sys import exc_info
 from traceback import print_exception
 
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QColor
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QDialogButtonBox, QSplitter
-from PyQt6.QtWidgets import QTextEdit
+from PyQt6.QtWidgets import (QTextEdit, QTableWidget, QTableWidgetItem,
+                             QComboBox, QCheckBox, QHBoxLayout, QFileDialog,
+                             QHeaderView)
 
 try:
     from pyspread.lib.spelltextedit import SpellTextEdit
@@ -123,6 +127,7 @@ class MacroPanel(QDialog):
         else:
             self.update_result_viewer(*self.code_array.execute_macros())
 
+        self.parent.grid.model.recalculation.start()
         self.parent.grid.gui_update()
 
     def update(self):
@@ -147,3 +152,187 @@ class MacroPanel(QDialog):
             self.result_viewer.setTextColor(self.error_text_color)
             self.result_viewer.append(err)
             self.result_viewer.setTextColor(self.default_text_color)
+
+
+class ProfilerPanel(QDialog):
+    """The evaluation profiler panel
+
+    Shows the slowest cells, the most often evaluated cells and the time that
+    is spent in each table while recording is switched on.
+
+    """
+
+    sections = ["Slowest cells", "Most evaluated cells", "Tables"]
+    headers = ["Cell", "Calls", "Time [ms]", "Self time [ms]",
+               "Max time [ms]", "Result size [B]", "Errors"]
+    max_rows = 100
+
+    def __init__(self, parent, code_array):
+        super().__init__()
+
+        self.parent = parent
+        self.code_array = code_array
+
+        self._init_widgets()
+        self._layout()
+
+        self.record_checkbox.toggled.connect(self.on_record)
+        self.section_combo.currentIndexChanged.connect(self.update)
+        self.button_box.clicked.connect(self.on_button)
+
+    @property
+    def profiler(self):
+        """Evaluation profiler of the code array"""
+
+        return self.code_array.profiler
+
+    def _init_widgets(self):
+        """Inititialize widgets"""
+
+        self.record_checkbox = QCheckBox("Record", self)
+        self.record_checkbox.setToolTip("Record cell evaluation statistics")
+
+        self.section_combo = QComboBox(self)
+        self.section_combo.addItems(self.sections)
+
+        self.table = QTableWidget(0, len(self.headers), self)
+        self.table.setHorizontalHeaderLabels(self.headers)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(
+            QHeaderView.ResizeMode.ResizeToContents)
+
+        self.cprofile_viewer = QTextEdit(self)
+        self.cprofile_viewer.setReadOnly(True)
+        self.cprofile_viewer.setLineWrapMode(QTextEdit.LineWrapMode.NoWrap)
+
+        self.splitter = QSplitter(Qt.Orientation.Vertical, self)
+
+        self.splitter.addWidget(self.table)
+        self.splitter.addWidget(self.cprofile_viewer)
+
+        self.button_box = QDialogButtonBox(self)
+        self.refresh_button = self.button_box.addButton(
+            "Refresh", QDialogButtonBox.ButtonRole.ActionRole)
+        self.reset_button = self.button_box.addButton(
+            "Reset", QDialogButtonBox.ButtonRole.ResetRole)
+        self.cprofile_button = self.button_box.addButton(
+            "Profile cell", QDialogButtonBox.ButtonRole.ActionRole)
+        self.cprofile_button.setToolTip(
+            "Evaluate the current cell with cProfile")
+        self.export_button = self.button_box.addButton(
+            "Export", QDialogButtonBox.ButtonRole.ActionRole)
+
+    def _layout(self):
+        """Layout dialog widgets"""
+
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(self.record_checkbox)
+        top_layout.addWidget(self.section_combo)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(top_layout)
+        layout.addWidget(self.splitter)
+        layout.addWidget(self.button_box)
+
+        self.setLayout(layout)
+
+    def _section_rows(self) -> list:
+        """Returns (label, profile) list for the chosen section"""
+
+        section = self.section_combo.currentIndex()
+
+        if section == 0:
+            items = self.profiler.slowest(self.max_rows)
+        elif section == 1:
+            items = self.profiler.most_evaluated(self.max_rows)
+        else:
+            return [(f"Table {table}", profile) for table, profile
+                    in self.profiler.table_totals().items()]
+
+        return [(str(key), profile) for key, profile in items]
+
+    def update(self):
+        """Update table with current statistics"""
+
+        rows = self._section_rows()
+
+        self.table.setRowCount(len(rows))
+
+        for row, (label, profile) in enumerate(rows):
+            texts = [label, str(profile.calls), f"{profile.time * 1000:.3f}",
+                     f"{profile.self_time * 1000:.3f}",
+                     f"{profile.max_time * 1000:.3f}", str(profile.size),
+                     str(profile.errors)]
+            for column, text in enumerate(texts):
+                item = QTableWidgetItem(text)
+                if column:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight
+                                          | Qt.AlignmentFlag.AlignVCenter)
+                if profile.error is not None:
+                    item.setToolTip(profile.error)
+                self.table.setItem(row, column, item)
+
+        self.cprofile_viewer.setPlainText(self.profiler.cprofile_stats)
+
+    def on_record(self, toggled: bool):
+        """Event handler for record checkbox
+
+        :param toggled: Toggle state
+
+        """
+
+        self.profiler.enabled = toggled
+
+    def on_button(self, button):
+        """Event handler for buttons
+
+        :param button: Clicked button
+
+        """
+
+        if button == self.reset_button:
+            self.profiler.reset()
+        elif button == self.cprofile_button:
+            self.profile_current_cell()
+        elif button == self.export_button:
+            self.export()
+
+        self.update()
+
+    def profile_current_cell(self):
+        """Evaluates the current cell with cProfile"""
+
+        key = self.parent.grid.current
+
+        self.profiler.cprofile_key = key
+        self.code_array.result_cache.pop(key, None)
+        try:
+            self.code_array[key]
+        finally:
+            self.profiler.cprofile_key = None
+
+    def export(self):
+        """Exports report to a csv or json file"""
+
+        filters = "CSV file (*.csv);;JSON file (*.json)"
+        path = self.parent.settings.last_file_output_path
+        filepath, selected_filter = QFileDialog.getSaveFileName(
+            self, "Export profile", str(path), filters)
+
+        if not filepath:
+            return
+
+        filepath = Path(filepath)
+        if "json" in selected_filter:
+            filepath = filepath.with_suffix(".json")
+            write = self.profiler.write_json
+        else:
+            filepath = filepath.with_suffix(".csv")
+            write = self.profiler.write_csv
+
+        try:
+            with open(filepath, "w", newline="", encoding="utf-8") as outfile:
+                write(outfile)
+        except OSError as err:
+            msg = f"Error exporting profile to {filepath}: {err}"
+            self.parent.statusBar().showMessage(msg)
@@ -30,11 +30,14 @@ pyspread
 **Provides**
 
 * MainApplication: Initial command line operations and application launch
+* :func:`write_profile_report`: Command line cell evaluation profiling
 * :class:`MainWindow`: Main windows class
 
 """
 
+import bz2
 import os
+from pathlib import Path
 import sys
 import traceback
 
@@ -44,10 +47,20 @@ from PyQt6.QtWidgets import QApplication
 try:
     from pyspread.cli import PyspreadArgumentParser
     from pyspread.main_window import MainWindow
+    from pyspread.model.model import CodeArray
+    from pyspread.interfaces.pys import PysReader
+    from pyspread.interfaces.pysb import PysbReader
+    from pyspread.lib.hashing import verify
+    from pyspread.settings import Settings
 
 except ImportError:
     from cli import PyspreadArgumentParser
     from main_window import MainWindow
+    from model.model import CodeArray
+    from interfaces.pys import PysReader
+    from interfaces.pysb import PysbReader
+    from lib.hashing import verify
+    from settings import Settings
 
 
 LICENSE = "GNU GENERAL PUBLIC LICENSE Version 3"
@@ -64,6 +77,76 @@ def excepthook(exception_type, exception_value, exception_traceback):
     print(f"Error: {traceback_msg}\n")
 
 
+def write_profile_report(filepath: Path, report_path: Path) -> int:
+    """Evaluates all cells of a pyspread file and writes a profile report
+
+    The report is written in json format if report_path ends with `.json`
+    and in csv format otherwise. As in the GUI, cell code is only executed
+    for files that are signed with the signature key from the settings.
+
+    :param filepath: Path of pys, pysu or pysb file to be profiled
+    :param report_path: Path of report file
+    :return: Exit status
+
+    """
+
+    if filepath is None:
+        print("Error: A file is required for profiling.")
+        return 1
+
+    settings = Settings(None)
+    settings.restore()
+
+    signature_path = filepath.with_suffix(filepath.suffix + '.sig')
+    try:
+        with open(filepath, "rb") as infile:
+            with open(signature_path, "rb") as sigfile:
+                trusted = bool(settings.signature_key) \
+                    and verify(infile.read(), sigfile.read(),
+                               settings.signature_key)
+    except OSError:
+        trusted = False
+
+    if not trusted:
+        print(f"Error: {filepath} is not signed with the signature key from "
+              "the settings. Open and approve it in pyspread first.")
+        return 1
+
+    code_array = CodeArray(settings.shape, settings)
+
+    fopen = open if filepath.suffix in (".pysu", ".pysb") else bz2.open
+    reader = PysbReader if filepath.suffix == ".pysb" else PysReader
+    filepath = filepath.absolute()
+    report_path = report_path.absolute()
+
+    # Cells may access files relative to the pyspread file
+    os.chdir(filepath.parent)
+
+    try:
+        with fopen(filepath, "rb") as infile:
+            for _ in reader(infile, code_array):
+                pass
+    except Exception as err:
+        print(f"Error opening file {filepath}: {err}.")
+        return 1
+
+    profiler = code_array.profiler
+    profiler.enabled = True
+
+    code_array.execute_macros()
+    with code_array.watchdog.batch():
+        for key in list(code_array.keys()):
+            code_array[key]
+
+    with open(report_path, "w", newline="", encoding="utf-8") as outfile:
+        if report_path.suffix == ".json":
+            profiler.write_json(outfile)
+        else:
+            profiler.write_csv(outfile)
+
+    return 0
+
+
 def main():
     """Pyspread main"""
 
@@ -72,6 +155,9 @@ def main():
     parser = PyspreadArgumentParser()
     args, _ = parser.parse_known_args()
 
+    if args.profile is not None:
+        sys.exit(write_profile_report(args.file, args.profile))
+
     app = QApplication(sys.argv)
     app.setDesktopFileName("io.gitlab.pyspread.pyspread")
     main_window = MainWindow(args.file, default_settings=args.default_settings)
@@ -111,12 +111,33 @@ class Settings:
     border_choice = "All borders"
     """The state of the border choice button"""
 
-    timeout = 1000
+    timeout = 1000000
     """Timeout for cell calculations in milliseconds"""
 
     refresh_timeout = 1000
     """Timeout for frozen cell updates in milliseconds"""
 
+    parallel_recalculation = False
+    """If `True` then cells without `S` are evaluated in a process pool"""
+
+    result_cache_size = 1024
+    """Memory budget for cached cell results in MB"""
+
+    compact_attributes_on_save = True
+    """If `True` then cell formats are compacted when saving"""
+
+    columnar_storage = False
+    """If `True` then literal numbers are stored in typed column arrays"""
+
+    parallel_save_compression = False
+    """If `True` then pys files are compressed in parallel when saving"""
+
+    autosave_journal = True
+    """If `True` then changes to saved files are journaled for recovery"""
+
+    journal_max_size = 64
+    """Journal size in MB, above which the journal is compacted"""
+
     signature_key = None
     """Key for signing save files"""
 
@@ -238,10 +259,20 @@ class Settings:
         settings.value("file_history", [], 'QStringList')
         if self.file_history:
             settings.setValue("file_history", self.file_history)
-        settings.setValue("timeout", self.timeout)
+        settings.setValue("timeout_ms", self.timeout)
         settings.setValue("refresh_timeout", self.refresh_timeout)
         settings.setValue("signature_key", self.signature_key)
         settings.setValue("show_statusbar_sum", self.show_statusbar_sum)
+        settings.setValue("parallel_recalculation",
+                          self.parallel_recalculation)
+        settings.setValue("result_cache_size", self.result_cache_size)
+        settings.setValue("compact_attributes_on_save",
+                          self.compact_attributes_on_save)
+        settings.setValue("columnar_storage", self.columnar_storage)
+        settings.setValue("parallel_save_compression",
+                          self.parallel_save_compression)
+        settings.setValue("autosave_journal", self.autosave_journal)
+        settings.setValue("journal_max_size", self.journal_max_size)
 
         # GUI state
         for widget_name in self.widget_names:
@@ -314,10 +345,23 @@ class Settings:
         setting2attr("last_file_export_path")
         setting2attr("max_file_history", mapper=int)
         setting2attr("file_history")
-        setting2attr("timeout", mapper=int)
+        # Older versions stored the timeout as `timeout` in seconds
+        setting2attr("timeout", mapper=lambda value: int(value) * 1000)
+        setting2attr("timeout_ms", attr="timeout", mapper=int)
         setting2attr("refresh_timeout", mapper=int)
         setting2attr("signature_key")
         setting2attr("show_statusbar_sum", mapper=qt_bool)
+        setting2attr("parallel_recalculation", mapper=qt_bool)
+        setting2attr("result_cache_size", mapper=int)
+        setting2attr("compact_attributes_on_save", mapper=qt_bool)
+        setting2attr("columnar_storage", mapper=qt_bool)
+        setting2attr("parallel_save_compression", mapper=qt_bool)
+        setting2attr("autosave_journal", mapper=qt_bool)
+        setting2attr("journal_max_size", mapper=int)
+
+        if self.parent is None:
+            # No GUI, e.g. for command line profiling
+            return
 
         # GUI state
 
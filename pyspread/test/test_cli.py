@@ -52,15 +52,19 @@ with insert_path(PYSPREADPATH):
 
 param_test_cli = [
     (['pyspread'],
-     Namespace(file=None, default_settings=False)),
+     Namespace(file=None, default_settings=False, profile=None)),
     (['pyspread', 'test.pys'],
-     Namespace(file=PosixPath("test.pys"), default_settings=False)),
+     Namespace(file=PosixPath("test.pys"), default_settings=False,
+               profile=None)),
     (['pyspread', '--help'],
      None),
     (['pyspread', '--version'],
      None),
     (['pyspread', '--default-settings'],
-     Namespace(file=None, default_settings=True)),
+     Namespace(file=None, default_settings=True, profile=None)),
+    (['pyspread', '--profile', 'report.csv', 'test.pys'],
+     Namespace(file=PosixPath("test.pys"), default_settings=False,
+               profile=PosixPath("report.csv"))),
 ]
 
 
@@ -28,6 +28,7 @@ Unit tests for grid.py
 """
 
 from contextlib import contextmanager
+from io import BytesIO
 from os.path import abspath, dirname, join
 import sys
 
@@ -63,6 +64,7 @@ with insert_path(PYSPREADPATH):
     from ..commands import MakeButtonCell, RemoveButtonCell
     from ..lib.selection import Selection
     from ..interfaces.pys import qt62qt5_fontweights
+    from ..interfaces.pysb import PysbReader, PysbWriter
 
 
 app = QApplication.instance()
@@ -448,7 +450,7 @@ class TestGrid:
         self.grid.model.code_array[1, 0, 0] = "23"
         self.grid.on_freeze_pressed(True)
         self.grid.model.code_array[1, 0, 0] = "'Test'"
-        assert self.grid.model.code_array.frozen_cache == {'(1, 0, 0)': 23}
+        assert self.grid.model.code_array.frozen_cache == {(1, 0, 0): 23}
         assert self.grid.model.code_array[1, 0, 0] == 23
 
         self.grid._refresh_frozen_cell((1, 0, 0))
@@ -1189,6 +1191,78 @@ class TestGridTableModel:
         assert not self.model.code_array.result_cache
 
 
+class TestRecalculationScheduler:
+    """Unit tests for RecalculationScheduler in grid.py"""
+
+    model = main_window.grid.model
+    recalculation = model.recalculation
+
+    def test_start(self):
+        """Unit test for start and on_batch_timer"""
+
+        code_array = self.model.code_array
+
+        code_array[0, 0, 0] = "1 + 1"
+        code_array[999, 0, 0] = "2 + 2"
+        code_array.result_cache.clear()
+
+        self.recalculation.start()
+
+        assert self.recalculation.pending[0] == (0, 0, 0)
+        assert self.recalculation.is_pending((999, 0, 0))
+
+        while self.recalculation.pending:
+            self.recalculation.on_batch_timer()
+
+        assert not self.recalculation.is_pending((999, 0, 0))
+        assert code_array.result_cache[(999, 0, 0)] == 4
+
+    def test_restart(self):
+        """Unit test for restart"""
+
+        self.model.code_array[0, 0, 0] = "1 + 1"
+        self.model.code_array.result_cache.clear()
+
+        self.recalculation.start()
+        self.recalculation.restart()
+
+        assert not self.recalculation.pending
+        assert self.recalculation.restart_timer.isActive()
+
+        self.recalculation.cancel()
+
+    def test_start_lazy_loading(self):
+        """Unit test for start after opening a pysb file"""
+
+        code_array = self.model.code_array
+
+        code_array[0, 0, 0] = "1 + 1"
+        code_array[999, 0, 0] = "2 + 2"
+        writer = PysbWriter(code_array)
+        writer.chunk_size = 1
+        data = b"".join(writer)
+
+        code_array.dict_grid.clear()
+        for _ in PysbReader(BytesIO(data), code_array):
+            pass
+        main_window.macro_panel.update()
+
+        dict_grid = code_array.dict_grid
+        assert dict_grid.loader.pending
+        assert not self.recalculation.is_pending((999, 0, 0))
+
+        assert (999, 0, 0) in dict_grid
+        assert self.recalculation.is_pending((999, 0, 0))
+
+        while self.recalculation.pending:
+            self.recalculation.on_batch_timer()
+
+        assert code_array.result_cache[(999, 0, 0)] == 4
+
+        self.recalculation.cancel()
+        dict_grid.clear()
+
+
 class TestGridCellDelegate:
     """Unit tests for GridCellDelegate in grid.py"""
 
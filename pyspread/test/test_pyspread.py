@@ -90,6 +90,6 @@ class TestMainWindow:
     def test_on_clear_globals(self):
         """Unit test for on_clear_globals"""
 
-        self.grid.model.code_array.result_cache["test"] = "Testres"
+        self.grid.model.code_array.result_cache[(0, 0, 0)] = "Testres"
         main_window.on_clear_globals()
         assert not self.grid.model.code_array.result_cache
@@ -794,7 +794,7 @@ class CellButton(QPushButton):
 
         code = self.grid.model.code_array(self.key)
         result = self.grid.model.code_array._eval_cell(self.key, code)
-        self.grid.model.code_array.frozen_cache[repr(self.key)] = result
+        self.grid.model.code_array.frozen_cache[tuple(self.key)] = result
         self.grid.model.code_array.result_cache.clear()
         self.grid.model.dataChanged.emit(QModelIndex(), QModelIndex())
 
@@ -27,7 +27,8 @@ Workflows for pyspread
 from ast import literal_eval
 from base64 import b85encode
 import bz2
-from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
 from copy import copy
 import csv
 import io
@@ -37,13 +38,13 @@ import os.path
 from pathlib import Path
 from shutil import move
 from tempfile import NamedTemporaryFile
-from typing import Iterable, Tuple
+from typing import Iterable, Optional, Tuple
 
 from PyQt6.QtCore import (Qt, QMimeData, QModelIndex, QBuffer, QRect, QRectF,
-                          QItemSelectionModel, QSize)
+                          QItemSelectionModel, QSize, QTimer)
 from PyQt6.QtGui import QTextDocument, QImage, QPainter, QUndoCommand
 from PyQt6.QtWidgets import (QApplication, QMessageBox, QInputDialog,
-                             QStyleOptionViewItem, QTableView)
+                             QProgressBar, QStyleOptionViewItem, QTableView)
 try:
     from PyQt6.QtSvg import QSvgGenerator
 except ImportError:
@@ -64,8 +65,11 @@ try:
                 CellKeyDialog, FindDialog, ReplaceDialog, CsvFileImportDialog,
                 CsvImportDialog, CsvExportDialog, CsvExportAreaDialog,
                 FileExportDialog, SvgExportAreaDialog, SinglePageArea)
+    from pyspread.interfaces.journal import Journal
     from pyspread.interfaces.pys import PysReader, PysWriter
+    from pyspread.interfaces.pysb import PysbReader, PysbWriter
     from pyspread.lib.attrdict import AttrDict
+    from pyspread.lib.compression import Bz2Writer
     from pyspread.lib.hashing import sign, verify
     from pyspread.lib.selection import Selection
     from pyspread.lib.typechecks import is_svg, check_shape_validity
@@ -81,8 +85,11 @@ except ImportError:
                 CellKeyDialog, FindDialog, ReplaceDialog, CsvFileImportDialog,
                 CsvImportDialog, CsvExportDialog, CsvExportAreaDialog,
                 FileExportDialog, SvgExportAreaDialog, SinglePageArea)
+    from interfaces.journal import Journal
     from interfaces.pys import PysReader, PysWriter
+    from interfaces.pysb import PysbReader, PysbWriter
     from lib.attrdict import AttrDict
+    from lib.compression import Bz2Writer
     from lib.hashing import sign, verify
     from lib.selection import Selection
     from lib.typechecks import is_svg, check_shape_validity
@@ -106,6 +113,23 @@ class Workflows:
     def __init__(self, main_window):
         self.main_window = main_window
 
+        # Background save
+        self._save_executor = ThreadPoolExecutor(1)
+        self._save_future = None  # Future of the running save
+        self._save_filepath = None  # Path of the running save
+        self._save_progress = 0  # Lines written by the running save
+        self._save_progress_bar = None
+        self._save_timer = QTimer(main_window)
+        self._save_timer.setInterval(100)
+        self._save_timer.timeout.connect(self._on_save_timer)
+
+        # Autosave journal
+        self.journal = None
+        self._checkpoint_future = None  # Future of the running compaction
+        self._journal_timer = QTimer(main_window)
+        self._journal_timer.setInterval(Journal.flush_interval)
+        self._journal_timer.timeout.connect(self._on_journal_timer)
+
 # Ajout de notre part
     def new_window(self, figs:list = None,bool = False):
         parser = PyspreadArgumentParser()
@@ -168,7 +192,8 @@ class Workflows:
                     return
                 if not choice:
                     # We try to save to a file
-                    if self.file_save() is False:
+                    if self.file_save() is False \
+                       or not self.wait_for_save():
                         # File could not be saved --> Abort
                         return
             try:
@@ -181,10 +206,15 @@ class Workflows:
         return function_wrapper
 
     def reset_changed_since_save(self):
-        """Sets changed_since_save to False and updates the window title"""
+        """Sets changed_since_save to False and updates the window title
+
+        Recovered changes that have not been saved are kept as changes.
+
+        """
 
         # Change the main window filepath state
-        self.main_window.settings.changed_since_save = False
+        self.main_window.settings.changed_since_save = \
+            self.journal is not None and self.journal.recovered
 
     def update_main_window_title(self):
         """Change the main window title to reflect the current file name"""
@@ -195,6 +225,8 @@ class Workflows:
             title = "pyspread"
         else:
             title = f"{filepath.name} - pyspread"
+        if self.main_window.settings.changed_since_save:
+            title = "* " + title
         self.main_window.setWindowTitle(title)
 
     @handle_changed_since_save
@@ -222,6 +254,9 @@ class Workflows:
             # Select upper left cell because initial selection behaves strange
             grid.reset_selection()
 
+        # A new file is not journaled before it is saved
+        self._stop_journal()
+
         # Reset grid
         self.main_window.grid.model.reset()
 
@@ -281,11 +316,17 @@ class Workflows:
         grid = self.main_window.grid
         code_array = grid.model.code_array
 
-        # Get number of lines for progress dialog
-        filelines = self.count_file_lines(filepath)
-        if not filelines:  # May not be None or 0
+        # Check that the file can be opened before resetting the grid
+        try:
+            if not filepath.stat().st_size:
+                return
+        except OSError as error:
+            self.main_window.statusBar().showMessage(str(error))
             return
 
+        # Remove the journal of the previous file
+        self._stop_journal()
+
         # Reset grid
         grid.model.reset()
 
@@ -308,12 +349,6 @@ class Workflows:
         except OSError:
             self.main_window.safe_mode = True
 
-        # File format handling
-        if filepath.suffix == ".pysu":
-            fopen = open
-        else:
-            fopen = bz2.open
-
         # Process events before showing the modal progress dialog
         QApplication.instance().processEvents()
 
@@ -325,23 +360,36 @@ class Workflows:
         label = f"Opening {filepath.name}..."
 
         try:
-            with fopen(filepath, "rb") as infile:
-                reader = PysReader(infile, code_array)
-                try:
-                    for i, _ in file_progress_gen(self.main_window, reader,
-                                                  title, label, filelines):
+            with open(filepath, "rb") as rawfile:
+                if filepath.suffix == ".pysb":
+                    # Reads meta data, cells are loaded on access
+                    for _ in PysbReader(rawfile, code_array):
                         pass
-                except Exception as error:
-                    grid.model.reset()
-                    self.main_window.statusBar().showMessage(str(error))
-                    self.main_window.safe_mode = False
-                    return
-                except ProgressDialogCanceled:
-                    msg = f"File open stopped by user at line {i}."
-                    self.main_window.statusBar().showMessage(msg)
-                    grid.model.reset()
-                    self.main_window.safe_mode = False
-                    return
+                else:
+                    # File format handling
+                    if filepath.suffix == ".pysu":
+                        infile = rawfile
+                    else:
+                        infile = bz2.open(rawfile)
+                    reader = PysReader(infile, code_array)
+                    # Progress is shown for the position in rawfile, so
+                    # that the file is decompressed only once
+                    try:
+                        for i, _ in file_progress_gen(self.main_window,
+                                                      reader, title, label,
+                                                      rawfile):
+                            pass
+                    except Exception as error:
+                        grid.model.reset()
+                        self.main_window.statusBar().showMessage(str(error))
+                        self.main_window.safe_mode = False
+                        return
+                    except ProgressDialogCanceled:
+                        msg = f"File open stopped by user at line {i}."
+                        self.main_window.statusBar().showMessage(msg)
+                        grid.model.reset()
+                        self.main_window.safe_mode = False
+                        return
 
         except Exception as err:
             # A lot may got wrong with a malformed pys file, includes OSError
@@ -352,6 +400,28 @@ class Workflows:
             grid.model.reset()
             self.main_window.safe_mode = False
             return
+
+        # Recover unsaved changes from a journal that has been left over
+        journal = Journal(filepath, signature_key)
+        if journal.recoverable():
+            msg = f"Unsaved changes of {filepath.name} have been found " \
+                  "in its journal. Do you want to recover them?"
+            choice = QMessageBox.question(self.main_window,
+                                          "Recover changes", msg)
+            if choice == QMessageBox.StandardButton.Yes:
+                try:
+                    with self.busy_cursor():
+                        valid = journal.recover(code_array)
+                except Exception as err:
+                    msg = f"Error recovering changes of {filepath}: {err}."
+                    self.main_window.statusBar().showMessage(msg)
+                    grid.model.reset()
+                    self.main_window.safe_mode = False
+                    return
+                # Changes with invalid signatures are not trusted
+                self.main_window.safe_mode |= not valid
+                self.journal = journal
+
         # Explicitly set the grid shape
         shape = code_array.shape
         grid.model.shape = shape
@@ -376,7 +446,7 @@ class Workflows:
         self.main_window.settings.last_file_output_path = filepath
 
         # Change the main window filepath state
-        self.main_window.settings.changed_since_save = False
+        self.reset_changed_since_save()
 
         # Update macro editor
         self.main_window.macro_panel.update()
@@ -387,6 +457,18 @@ class Workflows:
         # Update recent files in the file menu
         self.main_window.menuBar().file_menu.history_submenu.update()
 
+        # Journal further changes
+        if self.journal is None:
+            self._start_journal(filepath)
+        else:
+            self.journal.attach(code_array)
+            try:
+                self.journal.resume()
+            except OSError as error:
+                self._drop_journal(error)
+            else:
+                self._journal_timer.start()
+
         return filepath
 
     @handle_changed_since_save
@@ -420,22 +502,31 @@ class Workflows:
 
         if self.main_window.safe_mode:
             msg = "File saved but not signed because it is unapproved."
-            self.main_window.statusBar().showMessage(msg)
-            return
+        else:
+            msg = self._sign_file(filepath,
+                                  self.main_window.settings.signature_key)
+
+        self.main_window.statusBar().showMessage(msg)
+
+    @staticmethod
+    def _sign_file(filepath: Path, signature_key: bytes) -> str:
+        """Signs filepath and returns a status message
+
+        Does not access the GUI, so that it can run in a worker thread.
+
+        :param filepath: Path of file to be signed
+        :param signature_key: Key for signing
+
+        """
 
-        signature_key = self.main_window.settings.signature_key
         try:
             with open(filepath, "rb") as infile:
                 signature = sign(infile.read(), signature_key)
         except OSError as err:
-            msg = f"Error signing file: {err}"
-            self.main_window.statusBar().showMessage(msg)
-            return
+            return f"Error signing file: {err}"
 
         if signature is None or not signature:
-            msg = 'Error signing file.'
-            self.main_window.statusBar().showMessage(msg)
-            return
+            return 'Error signing file.'
 
         signature_path = filepath.with_suffix(filepath.suffix + '.sig')
         try:
@@ -446,78 +537,311 @@ class Workflows:
             msg_tpl = "Error signing file {filepath}: {err}."
             msg = msg_tpl.format(filepath=filepath, err=err)
 
-        self.main_window.statusBar().showMessage(msg)
+        return msg
 
     def _save(self, filepath: Path):
-        """Save filepath using chosen_filter
+        """Save filepath using chosen_filter in the background
+
+        Compresses save file if filepath.suffix is `.pys`.
+        Writes the binary pysb format if filepath.suffix is `.pysb`.
 
-        Compresses save file if filepath.suffix is `.pys`
+        A snapshot of the grid is written and signed in a worker thread,
+        while a progress bar in the statusbar shows the progress. The grid
+        can be edited during the save. These edits are not saved and mark
+        the file as changed. A running save is finished before a new save
+        starts. :meth:`wait_for_save` returns if the save has succeeded.
 
         :param filepath: Path of file to be saved
 
         """
 
+        self.wait_for_save()
+
+        settings = self.main_window.settings
         code_array = self.main_window.grid.model.code_array
 
-        # Process events before showing the modal progress dialog
-        QApplication.instance().processEvents()
+        # Changes after the snapshot are journaled for the saved file
+        if self.journal is not None:
+            self._flush_journal()
+        if self.journal is None and settings.autosave_journal:
+            self.journal = Journal(filepath, settings.signature_key)
+            self.journal.attach(code_array)
 
-        # Save grid to temporary file
+        if filepath.suffix == ".pysb":
+            pys_writer = PysbWriter(code_array.snapshot())
+        else:
+            pys_writer = PysWriter(code_array.snapshot())
 
-        title = "File save progress"
-        label = f"Saving {filepath.name}..."
+        if settings.parallel_save_compression:
+            threads = os.cpu_count() or 1
+        else:
+            threads = 1
 
-        with NamedTemporaryFile(delete=False) as tempfile:
-            filename = tempfile.name
-            try:
-                pys_writer = PysWriter(code_array)
-                try:
-                    for _, line in file_progress_gen(
-                            self.main_window, pys_writer, title, label,
-                            len(pys_writer)):
-                        line = bytes(line, "utf-8")
-                        if filepath.suffix == ".pys":
-                            line = bz2.compress(line)
-                        tempfile.write(line)
+        if self.main_window.safe_mode:
+            signature_key = None
+        else:
+            signature_key = settings.signature_key
 
-                except ProgressDialogCanceled:
-                    msg = "File save stopped by user."
-                    self.main_window.statusBar().showMessage(msg)
-                    tempfile.delete = True  # Delete incomplete tmpfile
-                    return False
-
-            except (OSError, ValueError) as err:
-                tempfile.delete = True
-                QMessageBox.critical(self.main_window, "Error saving file",
-                                     str(err))
-                return False
+        # Edits from now on go into the next save
+        settings.changed_since_save = False
+        self.main_window.setWindowTitle(f"{filepath.name} - pyspread")
+
+        self._save_progress_bar = QProgressBar(self.main_window.statusBar())
+        self._save_progress_bar.setMaximum(len(pys_writer))
+        self._save_progress_bar.setFormat(f"Saving {filepath.name}... %p%")
+        self.main_window.statusBar().addPermanentWidget(
+            self._save_progress_bar)
+
+        self._save_progress = 0
+        self._save_filepath = filepath
+        self._save_future = self._save_executor.submit(
+            self._write_file, pys_writer, filepath, threads, signature_key)
+        self._save_timer.start()
+
+    def _write_file(self, pys_writer: PysWriter, filepath: Path,
+                    threads: int, signature_key: Optional[bytes]) -> str:
+        """Writes and signs file, returns status message
+
+        Runs in a worker thread and does not access the GUI.
+
+        :param pys_writer: Writer for the grid snapshot
+        :param filepath: Path of file to be saved
+        :param threads: Number of compression threads
+        :param signature_key: Key for signing, None: Do not sign
+
+        """
+
+        # Save grid to temporary file
+
+        filename = None
         try:
+            with NamedTemporaryFile(delete=False) as tempfile:
+                filename = tempfile.name
+                if filepath.suffix == ".pysb":
+                    for block in pys_writer:
+                        tempfile.write(block)
+                        self._save_progress = pys_writer.progress
+                else:
+                    if filepath.suffix == ".pys":
+                        writer = Bz2Writer(tempfile, threads)
+                    else:
+                        writer = nullcontext(tempfile)
+                    # Compression threads are stopped if writing fails
+                    with writer as outfile:
+                        for i, line in enumerate(pys_writer):
+                            outfile.write(bytes(line, "utf-8"))
+                            self._save_progress = i
+
             if filepath.exists() and not os.access(filepath, os.W_OK):
                 raise PermissionError(f"No write access to {filepath}")
             move(filename, filepath)
 
-        except OSError as err:
-            # No tmp file present
+        except BaseException:
+            if filename is not None and os.path.exists(filename):
+                os.remove(filename)  # Delete incomplete tmpfile
+            raise
+
+        if signature_key is None:
+            return "File saved but not signed because it is unapproved."
+
+        return self._sign_file(filepath, signature_key)
+
+    def _on_save_timer(self):
+        """Updates the save progress bar and finishes a completed save"""
+
+        if self._save_future.done():
+            self._finish_save()
+        else:
+            self._save_progress_bar.setValue(self._save_progress)
+
+    def wait_for_save(self) -> bool:
+        """Waits for a running background save and finishes it
+
+        Returns False if the save has failed.
+
+        """
+
+        if self._save_future is None:
+            return True
+
+        with self.busy_cursor():
+            wait([self._save_future])
+
+        return self._finish_save()
+
+    def _finish_save(self) -> bool:
+        """Updates the GUI after a completed background save
+
+        Returns False if the save has failed.
+
+        """
+
+        future = self._save_future
+        filepath = self._save_filepath
+        self._save_future = None
+        self._save_filepath = None
+
+        self._save_timer.stop()
+        self.main_window.statusBar().removeWidget(self._save_progress_bar)
+        self._save_progress_bar.deleteLater()
+        self._save_progress_bar = None
+
+        settings = self.main_window.settings
+
+        error = future.exception()
+        if error is not None:
+            # The grid has not been saved
+            if not settings.changed_since_save:
+                settings.changed_since_save = True
+                main_window_title = "* " + self.main_window.windowTitle()
+                self.main_window.setWindowTitle(main_window_title)
+
+            # A journal without a saved file cannot be recovered
+            if self.journal is not None and not self.journal.started:
+                self.journal.detach()
+                self.journal = None
+
+            if not isinstance(error, (OSError, ValueError)):
+                raise error
+
             QMessageBox.critical(self.main_window, "Error saving file",
-                                 str(err))
+                                 str(error))
             return False
 
-        # Change the main window filepath state
-        self.main_window.settings.changed_since_save = False
-
         # Set the current filepath
-        self.main_window.settings.last_file_output_path = filepath
-
-        # Change the main window title
-        self.main_window.setWindowTitle(f"{filepath.name} - pyspread")
+        settings.last_file_output_path = filepath
 
         # Add to file history
-        self.main_window.settings.add_to_file_history(filepath.as_posix())
+        settings.add_to_file_history(filepath.as_posix())
 
         # Update recent files in the file menu
         self.main_window.menuBar().file_menu.history_submenu.update()
 
-        self.sign_file(filepath)
+        self.main_window.statusBar().showMessage(future.result())
+
+        self._start_journal(filepath)
+
+        return True
+
+    def _start_journal(self, filepath: Path):
+        """Starts a journal of the changes to the grid saved in filepath
+
+        Unflushed changes go into the new journal.
+
+        :param filepath: Path of the save file
+
+        """
+
+        settings = self.main_window.settings
+
+        if not settings.autosave_journal:
+            self._stop_journal()
+            return
+
+        if self.journal is None:
+            self.journal = Journal(filepath, settings.signature_key)
+            self.journal.attach(self.main_window.grid.model.code_array)
+
+        try:
+            if self.journal.filepath != filepath:
+                self.journal.move(filepath)
+            self.journal.start()
+        except OSError as error:
+            self._drop_journal(error)
+            return
+
+        self._journal_timer.start()
+
+    def _stop_journal(self):
+        """Stops journaling and removes the journal files"""
+
+        self._journal_timer.stop()
+
+        if self.journal is None:
+            return
+
+        if self._checkpoint_future is not None:
+            self._finish_checkpoint(discard=True)
+
+        self.journal.discard()
+        self.journal = None
+
+    def _drop_journal(self, error: OSError):
+        """Stops journaling after a journal error
+
+        :param error: Error that has occurred while writing the journal
+
+        """
+
+        self._journal_timer.stop()
+        self.journal.discard()
+        self.journal = None
+
+        msg = f"Journal stopped: {error}"
+        self.main_window.statusBar().showMessage(msg)
+
+    def _flush_journal(self):
+        """Writes pending changes to the journal
+
+        A running compaction is finished first.
+
+        """
+
+        if self._checkpoint_future is not None:
+            self._finish_checkpoint()
+            if self.journal is None:
+                return
+
+        try:
+            self.journal.flush()
+        except OSError as error:
+            self._drop_journal(error)
+
+    def _finish_checkpoint(self, discard: bool = False):
+        """Waits for a running compaction and makes its checkpoint the base
+
+        :param discard: Remove the checkpoint instead
+
+        """
+
+        future = self._checkpoint_future
+        self._checkpoint_future = None
+
+        with self.busy_cursor():
+            wait([future])
+
+        try:
+            filename, signature = future.result()
+            if discard:
+                os.remove(filename)
+            else:
+                self.journal.finish_checkpoint(filename, signature)
+        except OSError as error:
+            if not discard:
+                self._drop_journal(error)
+
+    def _on_journal_timer(self):
+        """Flushes the journal and compacts it if it has grown too large"""
+
+        if self._save_future is not None:
+            return  # The journal is restarted after saving
+
+        if self._checkpoint_future is not None:
+            if self._checkpoint_future.done():
+                self._finish_checkpoint()
+            return
+
+        try:
+            size = self.journal.flush()
+        except OSError as error:
+            self._drop_journal(error)
+            return
+
+        if size > self.main_window.settings.journal_max_size * 2**20:
+            code_array = self.main_window.grid.model.code_array
+            self._checkpoint_future = self._save_executor.submit(
+                self.journal.write_checkpoint,
+                PysWriter(code_array.snapshot()))
 
     def file_save(self):
         """File save workflow"""
@@ -565,8 +889,13 @@ class Workflows:
 
         """
 
-        filelines = self.count_file_lines(filepath)
-        if not filelines:  # May not be None or 0
+        try:
+            empty = not filepath.stat().st_size
+        except OSError as error:
+            self.main_window.statusBar().showMessage(str(error))
+            return
+
+        if empty:
             title = "CSV Import Error"
             text = f"File {filepath} seems to be empty."
             QMessageBox.warning(self.main_window, title, text)
@@ -595,57 +924,16 @@ class Workflows:
         model = grid.model
         rows, columns, tables = model.shape
 
-        # Dialog accepted, now check if grid is large enough
-        csv_rows = filelines
-        if dialect.hasheader and not dialect.keepheader:
-            csv_rows -= 1
+        # Dialog accepted, now check if grid is wide enough
+        # Rows are only counted if the csv file does not fit
         csv_columns = csv_dlg.csv_table.model.columnCount()
-        max_rows, max_columns = self.main_window.settings.maxshape[:2]
-
-        if csv_rows > rows - row or csv_columns > columns - column:
-            if csv_rows + row > max_rows or csv_columns + column > max_columns:
-                # Required grid size is too large
-                text_tpl = "The csv file {} does not fit into the grid.\n " +\
-                           "\nIt has {} rows and {} columns. Counting from " +\
-                           "the current cell, {} rows and {} columns would " +\
-                           "be needed, which exeeds the maximum shape of " +\
-                           "{} rows and {} columns. Data that does not fit " +\
-                           "inside the grid is discarded.\n \nDo you want " +\
-                           "to increase the grid size so that as much data " +\
-                           "from the csv file as possible fits in?"
-                text = text_tpl.format(filepath, csv_rows, csv_columns,
-                                       rows-row, columns-column, max_rows,
-                                       max_columns)
-            else:
-                # Shall we resize the grid?
-                text_tpl = \
-                    "The csv file {} does not fit into the grid.\n \n" +\
-                    "It has {} rows and {} columns. Counting from the " +\
-                    "current cell, only {} rows and {} columns remain for " +\
-                    "CSV data.\n \nData that does not fit inside the grid " +\
-                    "is discarded.\n \nDo you want to increase the grid " +\
-                    "size so that all csv file data fits in?"
-                text = text_tpl.format(filepath, csv_rows, csv_columns,
-                                       rows-row, columns-column)
-
-            title = "CSV Content Exceeds Grid Shape"
-            choices = QMessageBox.StandardButton.No \
-                | QMessageBox.StandardButton.Yes \
-                | QMessageBox.StandardButton.Cancel
-            default_choice = QMessageBox.StandardButton.No
-            choice = QMessageBox.question(self.main_window, title, text,
-                                          choices, default_choice)
-            if choice == QMessageBox.StandardButton.Yes:
-                # Resize grid
-                target_rows = min(max_rows, max(csv_rows + row, rows))
-                target_columns = min(max_columns,
-                                     max(csv_columns + column, columns))
-                self._resize_grid((target_rows, target_columns, tables))
-                rows = target_rows
-                columns = target_columns
-
-            elif choice == QMessageBox.StandardButton.Cancel:
+        fitted = csv_columns > columns - column
+        if fitted:
+            shape = self._csv_fit_grid(filepath, dialect, csv_columns, row,
+                                       column)
+            if shape is None:
                 return
+            rows, columns = shape
 
         # Now fill the grid
 
@@ -666,7 +954,17 @@ class Workflows:
                 try:
                     reader = csv_reader(csvfile, dialect)
                     for i, line in file_progress_gen(self.main_window, reader,
-                                                     title, label, filelines):
+                                                     title, label,
+                                                     csvfile.buffer):
+                        if row + i >= rows and not fitted:
+                            fitted = True
+                            shape = self._csv_fit_grid(filepath, dialect,
+                                                       csv_columns, row,
+                                                       column)
+                            if shape is None:
+                                return
+                            rows, columns = shape
+
                         if row + i >= rows:
                             break
 
@@ -720,6 +1018,77 @@ class Workflows:
                     if command is not None:
                         self.main_window.undo_stack.push(command)
 
+    def _csv_fit_grid(self, filepath: Path, dialect: csv.Dialect,
+                      csv_columns: int, row: int, column: int
+                      ) -> Optional[Tuple[int, int]]:
+        """Offers to resize the grid for a csv file that does not fit
+
+        Returns the number of rows and columns of the grid or None if the
+        import is canceled.
+
+        :param filepath: Path of csv file
+        :param dialect: Csv dialect
+        :param csv_columns: Number of columns of the csv file
+        :param row: Grid row of the first csv row
+        :param column: Grid column of the first csv column
+
+        """
+
+        rows, columns, tables = self.main_window.focused_grid.model.shape
+
+        csv_rows = self.count_file_lines(filepath) or 0
+        if dialect.hasheader and not dialect.keepheader:
+            csv_rows -= 1
+        max_rows, max_columns = self.main_window.settings.maxshape[:2]
+
+        if csv_rows <= rows - row and csv_columns <= columns - column:
+            return rows, columns
+
+        if csv_rows + row > max_rows or csv_columns + column > max_columns:
+            # Required grid size is too large
+            text_tpl = "The csv file {} does not fit into the grid.\n " +\
+                       "\nIt has {} rows and {} columns. Counting from " +\
+                       "the current cell, {} rows and {} columns would " +\
+                       "be needed, which exeeds the maximum shape of " +\
+                       "{} rows and {} columns. Data that does not fit " +\
+                       "inside the grid is discarded.\n \nDo you want " +\
+                       "to increase the grid size so that as much data " +\
+                       "from the csv file as possible fits in?"
+            text = text_tpl.format(filepath, csv_rows, csv_columns,
+                                   rows-row, columns-column, max_rows,
+                                   max_columns)
+        else:
+            # Shall we resize the grid?
+            text_tpl = \
+                "The csv file {} does not fit into the grid.\n \n" +\
+                "It has {} rows and {} columns. Counting from the " +\
+                "current cell, only {} rows and {} columns remain for " +\
+                "CSV data.\n \nData that does not fit inside the grid " +\
+                "is discarded.\n \nDo you want to increase the grid " +\
+                "size so that all csv file data fits in?"
+            text = text_tpl.format(filepath, csv_rows, csv_columns,
+                                   rows-row, columns-column)
+
+        title = "CSV Content Exceeds Grid Shape"
+        choices = QMessageBox.StandardButton.No \
+            | QMessageBox.StandardButton.Yes \
+            | QMessageBox.StandardButton.Cancel
+        default_choice = QMessageBox.StandardButton.No
+        choice = QMessageBox.question(self.main_window, title, text,
+                                      choices, default_choice)
+        if choice == QMessageBox.StandardButton.Yes:
+            # Resize grid
+            target_rows = min(max_rows, max(csv_rows + row, rows))
+            target_columns = min(max_columns,
+                                 max(csv_columns + column, columns))
+            self._resize_grid((target_rows, target_columns, tables))
+            return target_rows, target_columns
+
+        elif choice == QMessageBox.StandardButton.Cancel:
+            return
+
+        return rows, columns
+
     def file_export(self):
         """Export csv and svg files"""
 
@@ -797,8 +1166,14 @@ class Workflows:
 
         code_array = grid.model.code_array
         table = grid.table
-        csv_data = code_array[area.top: area.bottom + 1,
-                              area.left: area.right + 1, table]
+        # The range result is not cached, so that edits need no invalidation
+        csv_data = code_array.evaluate_range((slice(area.top, area.bottom + 1),
+                                              slice(area.left, area.right + 1),
+                                              table))
+
+        if isinstance(csv_data, numpy.ndarray):
+            # Typed ranges are converted in one go, masked cells become None
+            csv_data = csv_data.tolist()
 
         csv_dlg = CsvExportDialog(self.main_window, area)
 
@@ -1052,6 +1427,14 @@ class Workflows:
     def file_quit(self):
         """Program exit workflow"""
 
+        if not self.wait_for_save():
+            return
+
+        self._stop_journal()
+
+        self.main_window.grid.model.recalculation.cancel()
+        self.main_window.grid.model.code_array.shutdown_pool()
+
         self.main_window.settings.save()
         QApplication.instance().quit()
 
@@ -1088,8 +1471,8 @@ class Workflows:
 
         grid = self.main_window.focused_grid
         table = grid.table
-        selection = grid.selection
-        bbox = selection.get_grid_bbox(grid.model.shape)
+        selection = grid.selection.compile()
+        bbox = grid.selection.get_grid_bbox(grid.model.shape)
         (top, left), (bottom, right) = bbox
 
         data = []
@@ -1883,6 +2266,38 @@ class Workflows:
                                                  selected_idx, description)
                 self.main_window.undo_stack.push(command)
 
+    def format_compact_attributes(self):
+        """Compacts cell formats and reports the effect in the statusbar"""
+
+        grid = self.main_window.focused_grid
+        model = grid.model
+        cell_attributes = model.code_array.cell_attributes
+
+        rows, columns, _ = model.shape
+        sample_keys = [(row, column, grid.table)
+                       for row in range(0, rows, max(1, rows // 32))
+                       for column in range(0, columns, max(1, columns // 32))]
+
+        old_len = len(cell_attributes)
+        old_time = cell_attributes.lookup_time(sample_keys)
+
+        command = commands.CompactCellAttributes(model,
+                                                 "Compact cell formats")
+        removed = old_len - len(command.new_cell_attributes)
+        if removed <= 0:
+            msg = f"Cell formats are compact ({old_len} layers)"
+            self.main_window.statusBar().showMessage(msg)
+            return
+
+        self.main_window.undo_stack.push(command)
+
+        new_time = cell_attributes.lookup_time(sample_keys)
+        speedup = old_time / new_time if new_time else 1.0
+
+        msg = (f"Removed {removed} of {old_len} cell format layers, "
+               f"lookups {speedup:.1f}x faster")
+        self.main_window.statusBar().showMessage(msg)
+
     # Macro menufilepath
 
     def _read_svg_str(self, filepath, encoding):